@@ -0,0 +1,120 @@
+"""
+Resident memory per device of the in-memory Device store: pydantic models held by
+reference (`MemoryStore`) against typed column arrays (`CompactDeviceStore`).
+
+Usage:
+    python -m benchmarks.compact_devices [--devices N [N ...]]
+
+Memory is the growth traced by tracemalloc while the store is filled, so it covers
+everything the store keeps alive: ids, models, states and index entries.
+"""
+import argparse
+import itertools
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterator, List
+
+from src.models.device import (
+    Device,
+    DeviceType,
+    DimmerState,
+    LockState,
+    Mode,
+    SwitchState,
+    ThermostatState,
+)
+from src.repository.memory_store import CompactDeviceStore, MemoryStore
+from src.services.ids import uuid7
+
+ROOMS = ["Living Room", "Kitchen", "Bedroom", "Hallway", "Garage", "Office"]
+
+# devices paired to each hub
+DEVICES_PER_HUB = 10
+
+
+def _devices(count: int, hub_ids: List[str]) -> Iterator[Device]:
+    states = [
+        (DeviceType.SWITCH, "Light", lambda: SwitchState(is_on=random.random() < 0.5)),
+        (
+            DeviceType.DIMMER,
+            "Dimmer",
+            lambda: DimmerState(brightness=random.randrange(101), is_on=True),
+        ),
+        (
+            DeviceType.LOCK,
+            "Door Lock",
+            lambda: LockState(pin_code=f"{random.randrange(10000):04d}"),
+        ),
+        (
+            DeviceType.THERMOSTAT,
+            "Thermostat",
+            lambda: ThermostatState(
+                mode=random.choice(list(Mode)),
+                current_temperature=round(random.uniform(60, 85), 1),
+                target_temperature=float(random.randrange(60, 80)),
+            ),
+        ),
+    ]
+
+    for index, (device_type, label, state) in zip(
+        range(count), itertools.cycle(states)
+    ):
+        yield Device(
+            id=uuid7(),
+            name=f"{ROOMS[index % len(ROOMS)]} {label}",
+            type=device_type,
+            state=state(),
+            paired_hub_id=hub_ids[index // DEVICES_PER_HUB],
+        )
+
+
+def _measure(store_factory: Callable[[], MemoryStore], count: int) -> Dict[str, float]:
+    random.seed(count)
+    hub_ids = [uuid7() for _ in range(count // DEVICES_PER_HUB + 1)]
+
+    tracemalloc.start()
+    store = store_factory()
+    ids = []
+
+    for device in _devices(count, hub_ids):
+        store.create(device.id, device)
+
+        if len(ids) < 10_000:
+            ids.append(device.id)
+
+    resident = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+
+    for id in ids:
+        store.get(id)
+
+    return {
+        "bytes": resident / count,
+        "get": (time.perf_counter() - started) / len(ids) * 1e6,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument(
+        "--devices", type=int, nargs="+", default=[100_000, 1_000_000]
+    )
+    arguments = parser.parse_args()
+
+    print(f"{'devices':>10}{'store':>12}{'bytes/device':>15}{'get µs':>10}")
+
+    for count in arguments.devices:
+        models = _measure(MemoryStore[Device], count)
+        compact = _measure(CompactDeviceStore, count)
+
+        for label, row in (("models", models), ("compact", compact)):
+            print(f"{count:>10}{label:>12}{row['bytes']:>15.0f}{row['get']:>10.2f}")
+
+        print(f"{'':>10}{'reduction':>12}{models['bytes'] / compact['bytes']:>14.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+CPU cost per repository call: statements built per call through the ORM query API
+(the previous implementation) against the cached by-id statements of `DB`.
+
+Usage:
+    python -m benchmarks.repository_calls [--calls N] [--database-url URL]
+
+Defaults to a throwaway SQLite database; pass a PostgreSQL URL to include driver
+and network costs of a real deployment.
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+from src.models.device import Device, DeviceType, SwitchState
+from src.repository import base
+from src.repository.device import DeviceRepo
+from src.services.ids import uuid7
+
+
+class QueryPerCallDB(base.DB[Device]):
+    """
+    By-id operations building an ORM query on every call.
+    """
+
+    def get(self, id):
+        with base.get_session() as session:
+            db_item = session.query(self.orm_model).filter_by(id=id).first()
+            return self._to_entity(db_item) if db_item else None
+
+    def update(self, id, item):
+        with base.get_session() as session:
+            db_item = session.query(self.orm_model).filter_by(id=id).first()
+
+            for key, value in self._to_row(item).items():
+                setattr(db_item, key, value)
+
+            session.commit()
+            session.refresh(db_item)
+
+            return item
+
+    def delete(self, id):
+        with base.get_session() as session:
+            db_item = session.query(self.orm_model).filter_by(id=id).first()
+            session.delete(db_item)
+            session.commit()
+
+
+def _cpu_per_call(operation: Callable[[Device], None], devices: List[Device]) -> float:
+    started = time.process_time()
+
+    for device in devices:
+        operation(device)
+
+    return (time.process_time() - started) / len(devices) * 1e6
+
+
+def _measure(store: base.DB[Device], calls: int) -> Dict[str, float]:
+    devices = [
+        Device(
+            id=uuid7(), name="Switch", type=DeviceType.SWITCH, state=SwitchState()
+        )
+        for _ in range(calls)
+    ]
+    store.create_many(devices)
+
+    def update(device: Device) -> None:
+        device.state = SwitchState(is_on=not device.state.is_on)
+        store.update(device.id, device)
+
+    return {
+        "get": _cpu_per_call(lambda device: store.get(device.id), devices),
+        "update": _cpu_per_call(update, devices),
+        "delete": _cpu_per_call(lambda device: store.delete(device.id), devices),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n\n")[0])
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--database-url")
+    arguments = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        base.configure_engine(
+            arguments.database_url or f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        )
+        base.init_schema()
+
+        cached = base.DB[Device](DeviceRepo, Device)
+        cached.warm_up()
+        legacy = QueryPerCallDB(DeviceRepo, Device)
+        rows = {
+            "query per call": _measure(legacy, arguments.calls),
+            "cached statement": _measure(cached, arguments.calls),
+        }
+        cache = base.statement_cache_status()
+        base.dispose_engine()
+
+    print(f"CPU microseconds per call over {arguments.calls} calls")
+    print(f"{'':<18}{'get':>10}{'update':>10}{'delete':>10}")
+
+    for label, timings in rows.items():
+        print(f"{label:<18}" + "".join(f"{timings[op]:>10.1f}" for op in timings))
+
+    before, after = rows["query per call"], rows["cached statement"]
+    saved = {op: before[op] - after[op] for op in before}
+    print(f"{'saved':<18}" + "".join(f"{saved[op]:>10.1f}" for op in saved))
+    print(
+        f"statement cache: hit rate {cache['hit_rate']:.3f}, "
+        f"{cache['entries']} of {cache['capacity']} entries"
+    )
+
+
+if __name__ == "__main__":
+    main()
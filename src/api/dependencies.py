@@ -0,0 +1,47 @@
+from typing import AsyncIterator
+
+from fastapi import Request
+
+from src.repository.base import admission_controller
+from src.services.bulk_service import BulkService
+from src.services.device_service import DeviceService
+from src.services.dwelling_service import DwellingService
+from src.services.hub_service import HubService
+from src.services.search_service import SearchService
+
+
+def get_device_service(request: Request) -> DeviceService:
+    return request.app.state.services.device_service
+
+
+def get_hub_service(request: Request) -> HubService:
+    return request.app.state.services.hub_service
+
+
+def get_dwelling_service(request: Request) -> DwellingService:
+    return request.app.state.services.dwelling_service
+
+
+def get_bulk_service(request: Request) -> BulkService:
+    return request.app.state.services.bulk_service
+
+
+def get_search_service(request: Request) -> SearchService:
+    return request.app.state.services.search_service
+
+
+async def admit_request() -> AsyncIterator[None]:
+    """
+    Hold one admission slot for the whole request.
+
+    Runs on the event loop, so queued requests wait without tying up a worker
+    thread; the route's sessions then reuse the slot.
+    """
+    admission = admission_controller()
+
+    if admission is None:
+        yield
+        return
+
+    async with admission.admit_request():
+        yield
@@ -1,28 +1,297 @@
-from fastapi import APIRouter, status, HTTPException, Depends
+from dataclasses import asdict
+from typing import AsyncIterator, List, Optional
 
+from fastapi import (
+    APIRouter,
+    status,
+    HTTPException,
+    Depends,
+    Header,
+    Query,
+    Request,
+)
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from src.api.dependencies import (
+    admit_request,
+    get_bulk_service,
+    get_device_service,
+    get_dwelling_service,
+    get_hub_service,
+    get_search_service,
+)
 from src.models.device import Device
+from src.models.dwelling import DwellingTree
+from src.models.rollup import StatusRollup
+from src.models.search import EntityKind, SearchResults
+from src.repository.base import pool_status, statement_cache_status
+from src.repository.idempotency import IdempotencyConflict
+from src.repository.pool import PoolSaturatedError
+from src.services.bulk_service import BulkService, FleetImporter
 from src.services.device_service import DeviceService
+from src.services.dwelling_service import DwellingService
+from src.services.hub_service import HubService
+from src.services.search_service import SearchService
 
 router = APIRouter()
 
 
-@router.post("/devices", response_model=Device, status_code=status.HTTP_201_CREATED)
-async def create_device(device: Device, service: DeviceService = Depends(DeviceService)) -> Device:
+@router.post(
+    "/devices",
+    response_model=Device,
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(admit_request)],
+)
+def create_device(
+    device: Device,
+    request: Request,
+    service: DeviceService = Depends(get_device_service),
+    idempotency_key: Optional[str] = Header(None),
+    x_client_id: Optional[str] = Header(None),
+) -> Device:
     """
     Create a new device.
 
     Arguments:
         device: the Device to be created
+        request: incoming request, identifying the client if no X-Client-Id is sent
         service: dependency injection
+        idempotency_key: optional Idempotency-Key header making client retries safe
+        x_client_id: optional X-Client-Id header scoping idempotency keys
 
     Returns:
         device: newly created Device
 
     Raises:
-        HTTPException: if Device creation fails
+        HTTPException: 422 if the idempotency key was used with a different payload,
+            400 if Device creation fails
     """
     try:
-        return service.create_device(device.name, device.type, device.state)
+        return service.create_device(
+            device.name,
+            device.type,
+            device.state,
+            idempotency_key=idempotency_key,
+            client_id=x_client_id or (request.client.host if request.client else None),
+        )
+
+    except PoolSaturatedError:
+        # surfaced as 503 by the application's exception handler
+        raise
+
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
 
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get(
+    "/dwellings/{dwelling_id}/tree",
+    response_model=DwellingTree,
+    dependencies=[Depends(admit_request)],
+)
+def get_dwelling_tree(
+    dwelling_id: str, service: DwellingService = Depends(get_dwelling_service)
+) -> DwellingTree:
+    """
+    Get a dwelling with its hubs and their devices.
+
+    Arguments:
+        dwelling_id: identifier of the Dwelling
+        service: dependency injection
+
+    Returns:
+        dwelling tree
+
+    Raises:
+        HTTPException: if Dwelling not found
+    """
+    try:
+        return service.get_dwelling_tree(dwelling_id)
+
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@router.get(
+    "/dwellings/{dwelling_id}/status",
+    response_model=StatusRollup,
+    dependencies=[Depends(admit_request)],
+)
+def get_dwelling_status(
+    dwelling_id: str, service: DwellingService = Depends(get_dwelling_service)
+) -> StatusRollup:
+    """
+    Get the device status rollup of a dwelling.
+
+    Arguments:
+        dwelling_id: identifier of the Dwelling
+        service: dependency injection
+
+    Returns:
+        status rollup
+    """
+    return service.get_dwelling_status(dwelling_id)
+
+
+@router.get(
+    "/hubs/{hub_id}/status",
+    response_model=StatusRollup,
+    dependencies=[Depends(admit_request)],
+)
+def get_hub_status(
+    hub_id: str, service: HubService = Depends(get_hub_service)
+) -> StatusRollup:
+    """
+    Get the device status rollup of a hub.
+
+    Arguments:
+        hub_id: identifier of the Hub
+        service: dependency injection
+
+    Returns:
+        status rollup
+    """
+    return service.get_hub_status(hub_id)
+
+
+@router.get(
+    "/search",
+    response_model=SearchResults,
+    dependencies=[Depends(admit_request)],
+)
+def search(
+    q: str,
+    kind: Optional[List[EntityKind]] = Query(None),
+    dwelling_id: Optional[str] = None,
+    hub_id: Optional[str] = None,
+    limit: int = 20,
+    offset: int = 0,
+    service: SearchService = Depends(get_search_service),
+) -> SearchResults:
+    """
+    Search dwellings, hubs and devices by name.
+
+    Arguments:
+        q: text to search for
+        kind: kinds of entities to search, repeatable; all kinds if omitted
+        dwelling_id: optional Dwelling to search within
+        hub_id: optional Hub to search within
+        limit: page size
+        offset: number of best hits to skip
+        service: dependency injection
+
+    Returns:
+        page of hits, best match first
+
+    Raises:
+        HTTPException: if the query is blank or the page is out of range
+    """
+    try:
+        return service.search(
+            q,
+            kinds=kind,
+            dwelling_id=dwelling_id,
+            hub_id=hub_id,
+            limit=limit,
+            offset=offset,
+        )
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/bulk/export")
+def export_fleet(
+    service: BulkService = Depends(get_bulk_service),
+) -> StreamingResponse:
+    """
+    Stream all dwellings, hubs and devices as NDJSON in dependency order.
+
+    Arguments:
+        service: dependency injection
+
+    Returns:
+        streaming NDJSON response
+    """
+    return StreamingResponse(service.export(), media_type="application/x-ndjson")
+
+
+@router.post("/bulk/import")
+async def import_fleet(
+    request: Request, service: BulkService = Depends(get_bulk_service)
+) -> dict:
+    """
+    Import dwellings, hubs and devices from a streamed NDJSON request body.
+
+    Arguments:
+        request: request whose body is NDJSON in dependency order
+        service: dependency injection
+
+    Returns:
+        import report with created and skipped counts per kind
+
+    Raises:
+        HTTPException: if a record is malformed or out of dependency order
+    """
+    importer = service.importer()
+    chunk: List[str] = []
+
+    try:
+        async for line in _ndjson_lines(request.stream()):
+            chunk.append(line)
+
+            if len(chunk) >= 1000:
+                await run_in_threadpool(_feed, importer, chunk)
+                chunk = []
+
+        await run_in_threadpool(_feed, importer, chunk)
+
+        return asdict(await run_in_threadpool(importer.finish))
+
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _feed(importer: FleetImporter, lines: List[str]) -> None:
+    for line in lines:
+        importer.feed(line)
+
+
+async def _ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    remainder = b""
+
+    async for chunk in chunks:
+        lines = (remainder + chunk).split(b"\n")
+        remainder = lines.pop()
+
+        for line in lines:
+            yield line.decode()
+
+    if remainder:
+        yield remainder.decode()
+
+
+@router.get("/health/pool")
+def get_pool_status() -> dict:
+    """
+    Report connection pool saturation.
+
+    Returns:
+        pool gauges (size, checked out, overflow) and admission gauges (in-flight,
+        queued, shed, wait times)
+    """
+    return pool_status()
+
+
+@router.get("/health/statements")
+def get_statement_cache_status() -> dict:
+    """
+    Report compiled statement cache effectiveness.
+
+    Returns:
+        cache hits, misses, uncached executions, hit rate and cache occupancy
+    """
+    return statement_cache_status()
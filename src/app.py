@@ -0,0 +1,346 @@
+import asyncio
+import contextlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Union
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse
+
+from src.api.routes import router
+from src.config import Settings
+from src.models.device import Device
+from src.models.dwelling import Dwelling
+from src.models.hub import Hub
+from src.repository import base
+from src.repository.device import DeviceRepo
+from src.repository.dwelling import DwellingRepo, DwellingTreeLoader
+from src.repository.hub import HubRepo
+from src.repository.invalidation import (
+    InvalidationBus,
+    PostgresTransport,
+    UnixSocketTransport,
+)
+from src.repository.memory_store import (
+    CompactDeviceStore,
+    MemoryDwellingTreeLoader,
+    MemoryNameSearch,
+    MemoryStore,
+)
+from src.repository.pool import AdmissionController, PoolSaturatedError
+from src.repository.search import NameSearch
+from src.services.bulk_service import BulkService
+from src.services.device_service import DeviceService
+from src.services.dwelling_service import DwellingService
+from src.services.hub_service import HubService
+from src.services.rate_limit import RateLimit, RateLimiter, RateLimitExceeded
+from src.services.rollups import StatusRollups
+from src.services.search_service import SearchService
+from src.services.topology_cache import TopologyCache
+
+
+@dataclass
+class Stores:
+    """
+    Entity stores for the configured backend.
+    """
+
+    devices: Union[base.DB[Device], MemoryStore[Device]]
+    hubs: Union[base.DB[Hub], MemoryStore[Hub]]
+    dwellings: Union[base.DB[Dwelling], MemoryStore[Dwelling]]
+    dwelling_trees: Union[DwellingTreeLoader, MemoryDwellingTreeLoader]
+    name_search: Union[NameSearch, MemoryNameSearch]
+    bus: InvalidationBus
+
+
+@dataclass
+class Services:
+    """
+    Service instances shared by all requests of an application.
+    """
+
+    device_service: DeviceService
+    hub_service: HubService
+    dwelling_service: DwellingService
+    bulk_service: BulkService
+    search_service: SearchService
+    rollups: StatusRollups
+
+
+def create_invalidation_bus(settings: Settings) -> InvalidationBus:
+    """
+    Create the cache invalidation bus for the configured transport.
+
+    Arguments:
+        settings: application settings
+
+    Returns:
+        invalidation bus, not started
+
+    Raises:
+        ValueError: if the transport setting is not recognized
+    """
+    transport = settings.invalidation_transport
+
+    if transport == "local":
+        return InvalidationBus()
+
+    if transport == "postgres":
+        return InvalidationBus(PostgresTransport(base.get_engine))
+
+    if transport.startswith("unix:"):
+        return InvalidationBus(UnixSocketTransport(transport[len("unix:"):]))
+
+    raise ValueError(f"Unknown invalidation transport {transport}")
+
+
+def create_stores(settings: Settings) -> Stores:
+    """
+    Create entity stores for the configured backend.
+
+    Database-backed stores do not connect; the engine is created on first use.
+
+    Arguments:
+        settings: application settings
+
+    Returns:
+        entity stores
+    """
+    if not settings.uses_database:
+        devices = (
+            CompactDeviceStore() if settings.compact_devices else MemoryStore[Device]()
+        )
+        hubs = MemoryStore[Hub]()
+        dwellings = MemoryStore[Dwelling]()
+
+        return Stores(
+            devices=devices,
+            hubs=hubs,
+            dwellings=dwellings,
+            dwelling_trees=MemoryDwellingTreeLoader(dwellings, hubs, devices),
+            name_search=MemoryNameSearch(dwellings, hubs, devices),
+            bus=create_invalidation_bus(settings),
+        )
+
+    base.configure_engine(
+        settings.database_url,
+        admission=AdmissionController(
+            settings.pool_capacity, settings.admission_timeout
+        ),
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_recycle=settings.pool_recycle,
+        pool_pre_ping=settings.pool_pre_ping,
+        pool_timeout=settings.pool_timeout,
+    )
+
+    bus = create_invalidation_bus(settings)
+
+    return Stores(
+        devices=base.DB[Device](DeviceRepo, Device, bus=bus),
+        hubs=base.DB[Hub](HubRepo, Hub, bus=bus),
+        dwellings=base.DB[Dwelling](DwellingRepo, Dwelling, bus=bus),
+        dwelling_trees=DwellingTreeLoader(),
+        name_search=NameSearch(),
+        bus=bus,
+    )
+
+
+def create_rate_limiter(settings: Settings, stores: Stores) -> Optional[RateLimiter]:
+    """
+    Create the device state write limiter, if enabled.
+
+    Arguments:
+        settings: application settings
+        stores: entity stores, used to resolve a hub's dwelling
+
+    Returns:
+        rate limiter, or None if rate limiting is disabled
+    """
+    if not settings.rate_limit_enabled:
+        return None
+
+    def resolve_dwelling(hub_id: str) -> Optional[str]:
+        hub = stores.hubs.get(hub_id)
+
+        return hub.dwelling_id if hub else None
+
+    # each worker keeps its own buckets, so it enforces its share of the limits
+    return RateLimiter(
+        hub_limit=RateLimit(settings.hub_write_rate, settings.hub_write_burst).split(
+            settings.workers
+        ),
+        dwelling_limit=RateLimit(
+            settings.dwelling_write_rate, settings.dwelling_write_burst
+        ).split(settings.workers),
+        resolve_dwelling=resolve_dwelling,
+    )
+
+
+def create_services(
+    stores: Stores,
+    rate_limiter: Optional[RateLimiter] = None,
+    compact_devices: bool = False,
+    shared_invalidations: bool = False,
+) -> Services:
+    """
+    Wire services onto entity stores.
+
+    Arguments:
+        stores: entity stores
+        rate_limiter: optional limiter for device state writes
+        compact_devices: keep the devices of cached dwelling trees compactly
+        shared_invalidations: whether the bus carries writes of other workers, whose
+            hubs the status rollups then recompute
+
+    Returns:
+        wired services
+    """
+    topology_cache = TopologyCache(compact=compact_devices)
+    # writes made by other workers evict trees this worker cached
+    stores.bus.subscribe(topology_cache.invalidate, topology_cache.clear)
+    rollups = StatusRollups(stores.devices, stores.hubs)
+
+    if shared_invalidations:
+        # this worker's own writes arrive as deltas; recomputing also covers theirs
+        stores.bus.subscribe(rollups.invalidate)
+
+    return Services(
+        device_service=DeviceService(
+            stores.devices,
+            rate_limiter=rate_limiter,
+            topology_cache=topology_cache,
+            rollups=rollups,
+        ),
+        hub_service=HubService(
+            stores.hubs,
+            stores.devices,
+            topology_cache=topology_cache,
+            rollups=rollups,
+        ),
+        dwelling_service=DwellingService(
+            stores.dwellings,
+            stores.hubs,
+            tree_loader=stores.dwelling_trees,
+            topology_cache=topology_cache,
+            rollups=rollups,
+        ),
+        bulk_service=BulkService(stores.dwellings, stores.hubs, stores.devices),
+        search_service=SearchService(stores.name_search),
+        rollups=rollups,
+    )
+
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """
+    Create the FastAPI application.
+
+    Nothing touches the database until startup, where the schema is created and the
+    connection pool and hot statements are warmed if configured.
+
+    Arguments:
+        settings: application settings, read from the environment if omitted
+
+    Returns:
+        configured application
+    """
+    settings = settings or Settings.from_env()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        stores = create_stores(settings)
+        services = create_services(
+            stores,
+            create_rate_limiter(settings, stores),
+            settings.compact_devices,
+            shared_invalidations=settings.invalidation_transport != "local",
+        )
+        app.state.services = services
+
+        if settings.uses_database:
+            if settings.create_schema:
+                base.init_schema()
+
+            if settings.warm_up:
+                base.warm_up(
+                    [stores.devices, stores.hubs, stores.dwellings],
+                    connections=settings.pool_size,
+                )
+
+        stores.bus.start()
+
+        tasks = [
+            asyncio.create_task(
+                _flush_coalesced(services.device_service, settings.coalesce_interval)
+            ),
+            asyncio.create_task(
+                _verify_rollups(
+                    services.rollups, stores, settings.rollup_verify_interval
+                )
+            ),
+        ]
+
+        yield
+
+        for task in tasks:
+            task.cancel()
+
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+        stores.bus.close()
+
+        if settings.uses_database:
+            base.dispose_engine()
+
+    app = FastAPI(lifespan=lifespan)
+    app.state.settings = settings
+    app.include_router(router)
+    app.add_exception_handler(PoolSaturatedError, _pool_saturated_handler)
+    app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+
+    return app
+
+
+async def _pool_saturated_handler(
+    request: Request, exc: PoolSaturatedError
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": str(exc)},
+        headers={"Retry-After": "1"},
+    )
+
+
+async def _rate_limit_exceeded_handler(
+    request: Request, exc: RateLimitExceeded
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))},
+    )
+
+
+async def _flush_coalesced(device_service: DeviceService, interval: float) -> None:
+    # smooths telemetry bursts: coalesced states drain as rate limits refill
+    while True:
+        await asyncio.sleep(interval)
+
+        # states stay queued for the next flush if the database is saturated
+        with contextlib.suppress(PoolSaturatedError):
+            await asyncio.to_thread(device_service.flush_coalesced)
+
+
+async def _verify_rollups(
+    rollups: StatusRollups, stores: Stores, interval: float
+) -> None:
+    # the first pass builds the rollups for existing data, later ones correct drift;
+    # the stores are streamed so the fleet is never loaded into memory at once
+    while True:
+        with contextlib.suppress(PoolSaturatedError):
+            await asyncio.to_thread(
+                lambda: rollups.verify(stores.devices.iterate(), stores.hubs.iterate())
+            )
+
+        await asyncio.sleep(interval)
@@ -0,0 +1,115 @@
+import argparse
+import sys
+from typing import List, Optional
+
+from src.app import create_stores
+from src.config import Settings
+from src.repository import base, migrations
+from src.repository.invalidation import InvalidationBroker
+from src.services.bulk_service import BulkService, FileCheckpoint
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="python -m src.cli", description="Device fleet administration."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="export the fleet as NDJSON")
+    export.add_argument("path", help="output file, - for stdout")
+
+    load = commands.add_parser("import", help="import a fleet from NDJSON")
+    load.add_argument("path", help="input file, - for stdin")
+    load.add_argument("--checkpoint", help="checkpoint file to resume from and update")
+    load.add_argument("--batch-size", type=int, default=5000)
+
+    commands.add_parser(
+        "migrate", help="upgrade a database created by an earlier version"
+    )
+
+    broker = commands.add_parser(
+        "broker", help="relay cache invalidations between workers on one host"
+    )
+    broker.add_argument("path", help="Unix socket to listen on")
+
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Run the command line interface.
+
+    Arguments:
+        argv: command line arguments, defaults to sys.argv
+
+    Returns:
+        process exit code
+    """
+    arguments = build_parser().parse_args(argv)
+
+    if arguments.command == "broker":
+        InvalidationBroker(arguments.path).serve_forever()
+
+        return 0
+
+    settings = Settings.from_env()
+    stores = create_stores(settings)
+
+    if arguments.command == "migrate":
+        return _migrate(settings)
+
+    if settings.uses_database:
+        base.init_schema()
+
+    service = BulkService(
+        stores.dwellings,
+        stores.hubs,
+        stores.devices,
+        batch_size=getattr(arguments, "batch_size", 5000),
+    )
+
+    if arguments.command == "export":
+        output = sys.stdout if arguments.path == "-" else open(arguments.path, "w")
+
+        with output:
+            output.writelines(service.export())
+
+        return 0
+
+    checkpoint = FileCheckpoint(arguments.checkpoint) if arguments.checkpoint else None
+    source = sys.stdin if arguments.path == "-" else open(arguments.path)
+
+    with source:
+        report = service.import_lines(source, checkpoint)
+
+    print(
+        f"imported {report.lines - report.resumed_from} lines "
+        f"(resumed after line {report.resumed_from}): "
+        f"created {report.created}, skipped {report.skipped}",
+        file=sys.stderr,
+    )
+
+    return 0
+
+
+def _migrate(settings: Settings) -> int:
+    if not settings.uses_database:
+        print("nothing to migrate: DATABASE_URL is not a database", file=sys.stderr)
+        return 1
+
+    try:
+        # one transaction, so a failing step leaves the database as it was
+        with base.get_engine().begin() as connection:
+            applied = migrations.migrate(connection)
+    except ValueError as exc:
+        print(f"migration failed: {exc}", file=sys.stderr)
+        return 1
+
+    base.init_schema()
+    print(f"applied: {', '.join(applied) or 'nothing'}", file=sys.stderr)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
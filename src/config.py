@@ -0,0 +1,81 @@
+import os
+
+from dotenv import load_dotenv
+from pydantic import BaseModel
+
+from src.repository.base import DATABASE_URL
+
+# selects the in-memory store instead of a database
+MEMORY_URL = "memory://"
+
+
+class Settings(BaseModel):
+    """
+    Application configuration, read from the environment (and a `.env` file).
+    """
+
+    database_url: str = DATABASE_URL
+    create_schema: bool = True
+    warm_up: bool = True
+
+    # connection pool
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    pool_timeout: float = 30.0
+
+    # seconds a request may queue for a pooled connection before it is shed with 503
+    admission_timeout: float = 0.5
+
+    # worker processes serving the application; per-process limits are split between
+    # them so that together they enforce the configured rates
+    workers: int = 1
+
+    # device state write limits across all workers: sustained writes per second and
+    # burst size
+    rate_limit_enabled: bool = True
+    hub_write_rate: float = 10.0
+    hub_write_burst: float = 20.0
+    dwelling_write_rate: float = 50.0
+    dwelling_write_burst: float = 100.0
+    # seconds between flushes of coalesced telemetry
+    coalesce_interval: float = 1.0
+
+    # seconds between full scans that correct drift in status rollups
+    rollup_verify_interval: float = 300.0
+
+    # how cache invalidations reach other workers: "local" (this process only),
+    # "postgres" (LISTEN/NOTIFY) or "unix:<path>" (an invalidation broker socket)
+    invalidation_transport: str = "local"
+
+    # keep in-memory devices, and the devices of cached dwelling trees, in typed
+    # column arrays rather than as models: several times less memory, but every
+    # read builds a new Device, so it pays off for large fleets only
+    compact_devices: bool = False
+
+    @property
+    def uses_database(self) -> bool:
+        return self.database_url != MEMORY_URL
+
+    @property
+    def pool_capacity(self) -> int:
+        return self.pool_size + self.max_overflow
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """
+        Build settings from environment variables named after each field in upper case.
+
+        Returns:
+            settings with environment overrides applied
+        """
+        load_dotenv()
+
+        overrides = {
+            name: os.environ[name.upper()]
+            for name in cls.model_fields
+            if name.upper() in os.environ
+        }
+
+        return cls.model_validate(overrides)
@@ -1,5 +1,5 @@
 from enum import Enum
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 from pydantic import BaseModel, ConfigDict
 
@@ -58,3 +58,27 @@ class Device(BaseModel):
     paired_hub_id: Optional[str] = None
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class StateWrite(BaseModel):
+    """
+    Outcome of a state write.
+
+    A coalesced write is queued for `flush_coalesced`, so `device` is still the
+    stored Device, without the new state.
+    """
+
+    device: Device
+    coalesced: bool = False
+
+
+class StateWrites(BaseModel):
+    """
+    Outcome of a batch of state writes: the written Devices, and the ids of those
+    coalesced, rejected by the rate limiter or not applicable.
+    """
+
+    written: List[Device] = []
+    coalesced: List[str] = []
+    rejected: List[str] = []
+    failed: List[str] = []
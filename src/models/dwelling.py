@@ -2,6 +2,9 @@ from typing import List
 
 from pydantic import BaseModel, ConfigDict
 
+from src.models.device import Device
+from src.models.hub import Hub
+
 
 class Dwelling(BaseModel):
     id: str
@@ -10,3 +13,15 @@ class Dwelling(BaseModel):
     hub_ids: List[str] = []
 
     model_config = ConfigDict(from_attributes=True)
+
+
+class HubTree(Hub):
+    devices: List[Device] = []
+
+
+class DwellingTree(Dwelling):
+    """
+    Dwelling with its installed Hubs and their paired Devices, as rendered for a home.
+    """
+
+    hubs: List[HubTree] = []
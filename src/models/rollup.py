@@ -0,0 +1,26 @@
+from typing import Optional
+
+from pydantic import BaseModel, computed_field
+
+
+class StatusRollup(BaseModel):
+    """
+    Aggregated device status for a hub, a dwelling or the whole fleet.
+    """
+
+    devices: int = 0
+    lights_on: int = 0
+    locks: int = 0
+    unlocked_locks: int = 0
+    thermostats: int = 0
+    thermostats_heating: int = 0
+    thermostats_cooling: int = 0
+    target_temperature_sum: float = 0.0
+
+    @computed_field
+    @property
+    def average_target_temperature(self) -> Optional[float]:
+        if not self.thermostats:
+            return None
+
+        return self.target_temperature_sum / self.thermostats
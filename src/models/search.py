@@ -0,0 +1,32 @@
+from enum import Enum
+from typing import List
+
+from pydantic import BaseModel
+
+
+class EntityKind(Enum):
+    DWELLING = "dwelling"
+    HUB = "hub"
+    DEVICE = "device"
+
+
+class SearchHit(BaseModel):
+    kind: EntityKind
+    id: str
+    name: str
+    score: float
+
+
+class SearchResults(BaseModel):
+    """
+    One page of name search hits, best match first.
+
+    `truncated` is set when an index stopped gathering candidates at its limit; the
+    hits are then the best among those gathered and `total` is a lower bound.
+    """
+
+    hits: List[SearchHit] = []
+    total: int = 0
+    offset: int = 0
+    limit: int = 20
+    truncated: bool = False
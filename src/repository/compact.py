@@ -0,0 +1,347 @@
+from array import array
+from enum import Enum
+from threading import Lock
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    MutableMapping,
+    Optional,
+    Tuple,
+    Type,
+    Union,
+)
+
+from src.models.device import (
+    CameraState,
+    Device,
+    DeviceState,
+    DeviceType,
+    DimmerState,
+    LockState,
+    SwitchState,
+    ThermostatState,
+)
+
+# state layouts known up front; other DeviceState subclasses get one on first use
+STATE_CLASSES: List[Type[DeviceState]] = [
+    SwitchState,
+    DimmerState,
+    LockState,
+    ThermostatState,
+    CameraState,
+]
+
+# string state fields stored as given rather than interned: values that change
+# often, or that must not outlive the state holding them
+UNINTERNED_FIELDS = frozenset({"pin_code"})
+
+# tables are addressed by the low bits of a device's slot
+_TABLE_BITS = 4
+_TABLE_MASK = (1 << _TABLE_BITS) - 1
+
+_DEVICE_TYPES = list(DeviceType)
+_DEVICE_TYPE_CODES = {
+    device_type: code for code, device_type in enumerate(_DEVICE_TYPES)
+}
+
+# a device id: the 128-bit value of a canonical UUID string, or the string itself
+Key = Union[int, str]
+
+
+class StringTable:
+    """
+    Interned strings addressed by integer code; code 0 stands for None.
+
+    Strings are never dropped, so the table suits values repeated across devices
+    (names, hub ids, resolutions) rather than ever-changing ones.
+    """
+
+    def __init__(self) -> None:
+        self._strings: List[Optional[str]] = [None]
+        self._codes: Dict[str, int] = {}
+
+    def code(self, value: Optional[str]) -> int:
+        if value is None:
+            return 0
+
+        code = self._codes.get(value)
+
+        if code is None:
+            code = self._codes[value] = len(self._strings)
+            self._strings.append(value)
+
+        return code
+
+    def value(self, code: int) -> Optional[str]:
+        return self._strings[code]
+
+    def __len__(self) -> int:
+        return len(self._strings) - 1
+
+
+# a column of unboxed values, or a list where values do not fit one
+Column = Union[array, List[Any]]
+
+# (field name, column, encode into the column, decode out of it)
+_Field = Tuple[str, Column, Callable[[Any], Any], Callable[[Any], Any]]
+
+
+def _same(value: Any) -> Any:
+    return value
+
+
+def _field(name: str, annotation: Any, strings: StringTable) -> _Field:
+    if name in UNINTERNED_FIELDS:
+        return name, [], _same, _same
+
+    if annotation is bool:
+        return name, array("b"), int, bool
+
+    if annotation is int:
+        return name, array("q"), int, int
+
+    if annotation is float:
+        return name, array("d"), float, float
+
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        members = list(annotation)
+        codes = {member: code for code, member in enumerate(members)}
+
+        return name, array("B"), codes.__getitem__, members.__getitem__
+
+    if annotation in (str, Optional[str]):
+        return name, array("I"), strings.code, strings.value
+
+    raise TypeError(f"Cannot store {name}: {annotation} in a compact state column")
+
+
+class _StateTable:
+    """
+    Column arrays holding every device whose state is of one class, a row each.
+
+    An integer column holds 64-bit values; the first value outside that range
+    turns it into a list, so arbitrarily large integers still round trip.
+    """
+
+    def __init__(self, state_class: Type[DeviceState], strings: StringTable) -> None:
+        self.state_class = state_class
+        self.strings = strings
+        self.keys: List[Key] = []
+        self.names = array("I")
+        self.types = array("B")
+        self.hubs = array("I")
+        self.fields = [
+            _field(name, field.annotation, strings)
+            for name, field in state_class.model_fields.items()
+        ]
+
+    def append(self, key: Key, device: Device) -> int:
+        self.keys.append(key)
+        self.names.append(self.strings.code(device.name))
+        self.types.append(_DEVICE_TYPE_CODES[device.type])
+        self.hubs.append(self.strings.code(device.paired_hub_id))
+
+        for index, (name, column, encode, _) in enumerate(self.fields):
+            value = encode(getattr(device.state, name))
+
+            try:
+                column.append(value)
+            except OverflowError:
+                self._widen(index).append(value)
+
+        return len(self.keys) - 1
+
+    def write(self, row: int, device: Device) -> None:
+        self.names[row] = self.strings.code(device.name)
+        self.types[row] = _DEVICE_TYPE_CODES[device.type]
+        self.hubs[row] = self.strings.code(device.paired_hub_id)
+
+        for index, (name, column, encode, _) in enumerate(self.fields):
+            value = encode(getattr(device.state, name))
+
+            try:
+                column[row] = value
+            except OverflowError:
+                self._widen(index)[row] = value
+
+    def _widen(self, index: int) -> List[Any]:
+        name, column, encode, decode = self.fields[index]
+        widened = list(column)
+        self.fields[index] = name, widened, encode, decode
+
+        return widened
+
+    def read(self, row: int, id: str) -> Device:
+        # fields were validated when stored, so construct without revalidating
+        state = self.state_class.model_construct(
+            **{name: decode(column[row]) for name, column, _, decode in self.fields}
+        )
+
+        return Device.model_construct(
+            id=id,
+            name=self.strings.value(self.names[row]),
+            type=_DEVICE_TYPES[self.types[row]],
+            state=state,
+            paired_hub_id=self.strings.value(self.hubs[row]),
+        )
+
+    def remove(self, row: int) -> Optional[Key]:
+        """
+        Remove a row by moving the last row into its place.
+
+        Returns:
+            key of the moved row, None if the removed row was the last
+        """
+        last = len(self.keys) - 1
+        columns = [self.names, self.types, self.hubs]
+        columns.extend(column for _, column, _, _ in self.fields)
+        moved = self.keys.pop()
+
+        for column in columns:
+            value = column.pop()
+
+            if row != last:
+                column[row] = value
+
+        if row == last:
+            return None
+
+        self.keys[row] = moved
+
+        return moved
+
+
+_HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+def _key(id: str) -> Key:
+    # only canonical (lower-case, hyphenated) UUIDs are packed, so every id reads
+    # back exactly as given
+    digits = id.replace("-", "")
+
+    if (
+        len(id) == 36
+        and len(digits) == 32
+        and id[8] == id[13] == id[18] == id[23] == "-"
+        and _HEX_DIGITS.issuperset(digits)
+    ):
+        return int(digits, 16)
+
+    return id
+
+
+def _id(key: Key) -> str:
+    if isinstance(key, str):
+        return key
+
+    digits = f"{key:032x}"
+
+    return (
+        f"{digits[:8]}-{digits[8:12]}-{digits[12:16]}-{digits[16:20]}-{digits[20:]}"
+    )
+
+
+class CompactDevices(MutableMapping[str, Device]):
+    """
+    Devices by id, stored column-wise in typed arrays instead of as models.
+
+    Each state class gets a table of arrays, one per state field plus name, device
+    type and paired hub. Booleans, numbers and enum codes are stored unboxed,
+    strings are interned (except `UNINTERNED_FIELDS`, kept per row), and canonical
+    UUID ids are kept as 128-bit integers.
+    Reading a device builds a new `Device` equal to the one stored, so devices are
+    held by value: changing a returned device does not change the stored one.
+    """
+
+    def __init__(self) -> None:
+        self._strings = StringTable()
+        self._tables: List[_StateTable] = []
+        self._table_indexes: Dict[Type[DeviceState], int] = {}
+        # (row << _TABLE_BITS) | table index, per key
+        self._slots: Dict[Key, int] = {}
+        self._lock = Lock()
+
+        for state_class in STATE_CLASSES:
+            self._table(state_class)
+
+    def _table(self, state_class: Type[DeviceState]) -> int:
+        index = self._table_indexes.get(state_class)
+
+        if index is None:
+            if len(self._tables) == 1 << _TABLE_BITS:
+                raise TypeError(f"Too many state classes to store {state_class}")
+
+            index = self._table_indexes[state_class] = len(self._tables)
+            self._tables.append(_StateTable(state_class, self._strings))
+
+        return index
+
+    def get(self, id: str, default: Optional[Device] = None) -> Optional[Device]:
+        with self._lock:
+            slot = self._slots.get(_key(id))
+
+            if slot is None:
+                return default
+
+            table = self._tables[slot & _TABLE_MASK]
+
+            return table.read(slot >> _TABLE_BITS, id)
+
+    def __getitem__(self, id: str) -> Device:
+        device = self.get(id)
+
+        if device is None:
+            raise KeyError(id)
+
+        return device
+
+    def __setitem__(self, id: str, device: Device) -> None:
+        key = _key(id)
+
+        with self._lock:
+            index = self._table(type(device.state))
+            slot = self._slots.get(key)
+
+            if slot is not None and slot & _TABLE_MASK == index:
+                self._tables[index].write(slot >> _TABLE_BITS, device)
+                return
+
+            if slot is not None:
+                # the state changed class, so the device moves to another table
+                self._remove(slot)
+
+            row = self._tables[index].append(key, device)
+            self._slots[key] = (row << _TABLE_BITS) | index
+
+    def __delitem__(self, id: str) -> None:
+        key = _key(id)
+
+        with self._lock:
+            slot = self._slots.pop(key, None)
+
+            if slot is None:
+                raise KeyError(id)
+
+            self._remove(slot)
+
+    def _remove(self, slot: int) -> None:
+        index, row = slot & _TABLE_MASK, slot >> _TABLE_BITS
+        moved = self._tables[index].remove(row)
+
+        if moved is not None:
+            self._slots[moved] = slot
+
+    def __contains__(self, id: object) -> bool:
+        return isinstance(id, str) and _key(id) in self._slots
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            keys = [key for table in self._tables for key in table.keys]
+
+        return map(_id, keys)
+
+    def __len__(self) -> int:
+        return len(self._slots)
@@ -1,15 +1,18 @@
-from sqlalchemy import Column, String, ForeignKey
+from sqlalchemy import Column, String, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 
-from src.repository.base import EntityModel, Base
+from src.repository.base import name_search_index, EntityIdType, EntityModel, Base
 
 
 class DeviceRepo(EntityModel, Base):
     __tablename__ = "device"
+    __table_args__ = (name_search_index("device"),)
 
     name = Column(String, nullable=False)
     type = Column(String, nullable=False)
-    state = Column(String, nullable=True)
-    paired_hub_id = Column(String, ForeignKey("hub.id"), nullable=True)
+    state = Column(JSON, nullable=True)
+    paired_hub_id = Column(
+        EntityIdType, ForeignKey("hub.id"), nullable=True, index=True
+    )
 
     paired_hub = relationship("HubRepo", back_populates="devices")
@@ -1,14 +1,60 @@
-from sqlalchemy import Column, String, Boolean
-from sqlalchemy.orm import relationship
+from typing import List, Optional
 
-from src.repository.base import EntityModel, Base
+from sqlalchemy import select, Column, String, Boolean
+from sqlalchemy.orm import joinedload, relationship
+
+from src.models.dwelling import DwellingTree
+from src.repository.base import (
+    get_session,
+    name_search_index,
+    parse_id,
+    EntityModel,
+    Base,
+)
+from src.repository.hub import HubRepo
 
 
 class DwellingRepo(EntityModel, Base):
     __tablename__ = "dwelling"
+    __table_args__ = (name_search_index("dwelling"),)
 
-    id = Column(String, primary_key=True)
     name = Column(String, nullable=False)
     is_occupied = Column(Boolean, default=False, nullable=False)
 
     hubs = relationship("HubRepo", back_populates="dwelling")
+
+    @property
+    def hub_ids(self) -> List[str]:
+        return [hub.id for hub in self.hubs]
+
+
+class DwellingTreeLoader:
+    """
+    Loads a dwelling with its hubs and their devices in a single joined query.
+    """
+
+    def load(self, dwelling_id: str) -> Optional[DwellingTree]:
+        """
+        Load a Dwelling tree.
+
+        Arguments:
+            dwelling_id: identifier of the Dwelling
+
+        Returns:
+            Dwelling tree if found, None otherwise
+        """
+        entity_id = parse_id(dwelling_id)
+
+        if entity_id is None:
+            return None
+
+        statement = (
+            select(DwellingRepo)
+            .options(joinedload(DwellingRepo.hubs).joinedload(HubRepo.devices))
+            .where(DwellingRepo.id == entity_id)
+        )
+
+        with get_session() as session:
+            db_item = session.execute(statement).unique().scalar_one_or_none()
+
+            return DwellingTree.model_validate(db_item) if db_item else None
@@ -1,14 +1,23 @@
+from typing import List
+
 from sqlalchemy import Column, String, ForeignKey
 from sqlalchemy.orm import relationship
 
-from src.repository.base import EntityModel, Base
+from src.repository.base import name_search_index, EntityIdType, EntityModel, Base
 
 
 class HubRepo(EntityModel, Base):
     __tablename__ = "hub"
+    __table_args__ = (name_search_index("hub"),)
 
-    id = Column(String, primary_key=True)
     name = Column(String, nullable=False)
-    dwelling_id = Column(String, ForeignKey("dwelling.id"), nullable=True)
+    dwelling_id = Column(
+        EntityIdType, ForeignKey("dwelling.id"), nullable=True, index=True
+    )
 
+    dwelling = relationship("DwellingRepo", back_populates="hubs")
     devices = relationship("DeviceRepo", back_populates="paired_hub")
+
+    @property
+    def paired_device_ids(self) -> List[str]:
+        return [device.id for device in self.devices]
@@ -0,0 +1,67 @@
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+
+class IdempotencyConflict(ValueError):
+    """
+    Raised when an idempotency key is replayed with a different request payload.
+    """
+
+
+@dataclass(frozen=True)
+class IdempotencyKey:
+    """
+    Client-supplied idempotency key of a create, with a hash of its payload.
+
+    Keys are scoped to the entity kind and the client, so different clients may use
+    the same key without seeing each other's entities.
+    """
+
+    scope: str
+    client_id: str
+    key: str
+    payload_hash: str
+
+    @classmethod
+    def for_payload(
+        cls,
+        scope: str,
+        client_id: Optional[str],
+        key: str,
+        payload: Dict[str, Any],
+    ) -> "IdempotencyKey":
+        """
+        Build a key for a create request.
+
+        Arguments:
+            scope: entity kind the key applies to (device, hub, dwelling)
+            client_id: identifier of the calling client, None for anonymous callers
+            key: client-supplied key, unique per logical create
+            payload: JSON-compatible request payload the key is bound to
+
+        Returns:
+            idempotency key
+        """
+        digest = hashlib.sha256(
+            json.dumps(payload, sort_keys=True, separators=(",", ":")).encode()
+        ).hexdigest()
+
+        return cls(scope, client_id or "", key, digest)
+
+    def check(self, payload_hash: str) -> None:
+        """
+        Verify a replay carries the payload the key was first used with.
+
+        Arguments:
+            payload_hash: hash recorded when the key was first used
+
+        Raises:
+            IdempotencyConflict: if the payloads differ
+        """
+        if payload_hash != self.payload_hash:
+            raise IdempotencyConflict(
+                f"Idempotency key {self.key} was already used with a different "
+                f"{self.scope} payload"
+            )
@@ -0,0 +1,693 @@
+import json
+import logging
+import os
+import select
+import socket
+import socketserver
+import threading
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Callable, List, Optional, Protocol, Sequence, Tuple
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+
+logger = logging.getLogger(__name__)
+
+# PostgreSQL channel carrying invalidations between workers
+CHANNEL = "entity_invalidation"
+
+
+@dataclass(frozen=True)
+class Invalidation:
+    """
+    A committed write to an entity row.
+
+    `version` is the row version after the write (the last version for a delete),
+    so a bus can drop invalidations arriving after a newer one for the same row.
+    """
+
+    entity: str
+    id: str
+    version: int
+    deleted: bool = False
+
+    def encode(self) -> str:
+        return json.dumps(asdict(self), separators=(",", ":"))
+
+    @classmethod
+    def decode(cls, payload: str) -> "Invalidation":
+        return cls(**json.loads(payload))
+
+
+Deliver = Callable[[Invalidation], None]
+
+# drops everything a cache holds, when invalidations may have been missed
+Flush = Callable[[], None]
+
+
+class InvalidationTransport(Protocol):
+    """
+    Carries published invalidations to every bus sharing the transport, including
+    the publishing one.
+
+    A transactional transport sends within the writing session, so invalidations
+    are delivered if and when the write commits; others are sent after the commit.
+    A transport that loses its connection flushes its bus, since invalidations sent
+    meanwhile never arrive.
+    """
+
+    transactional: bool
+
+    def attach(self, deliver: Deliver, flush: Flush) -> None:
+        ...
+
+    def start(self) -> None:
+        ...
+
+    def send(
+        self, invalidations: Sequence[Invalidation], session: Optional[Session] = None
+    ) -> None:
+        ...
+
+    def close(self) -> None:
+        ...
+
+
+class InvalidationBus:
+    """
+    Publishes entity write invalidations and fans received ones out to subscribers.
+
+    Every `DB` write publishes to the bus of its store; caches subscribe to drop
+    entries. With a cross-process transport, a write in one worker invalidates the
+    caches of all workers.
+
+    The bus remembers the latest version received for recently written rows and
+    drops invalidations that are not newer, so a delayed or duplicated invalidation
+    does not evict a cache entry again. A publish that cannot be sent is logged and
+    flushes the subscribed caches instead of failing the write that caused it.
+    """
+
+    def __init__(
+        self,
+        transport: Optional[InvalidationTransport] = None,
+        tracked_versions: int = 10_000,
+    ) -> None:
+        """
+        Initialize the bus. Nothing is opened until `start`.
+
+        Arguments:
+            transport: transport shared with other buses, in-process if omitted
+            tracked_versions: number of rows whose latest version is remembered
+        """
+        self._transport = transport or LocalTransport()
+        self.tracked_versions = tracked_versions
+        self._listeners: List[Deliver] = []
+        self._flushes: List[Flush] = []
+        self._versions: "OrderedDict[Tuple[str, str], int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._transport.attach(self._deliver, self.flush)
+
+    def subscribe(self, listener: Deliver, flush: Optional[Flush] = None) -> None:
+        """
+        Register a callback for every invalidation received.
+
+        Arguments:
+            listener: callback receiving each invalidation
+            flush: optional callback dropping everything the subscriber caches,
+                called when invalidations may have been lost
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+            if flush is not None:
+                self._flushes.append(flush)
+
+    def publish(
+        self, invalidations: Sequence[Invalidation], session: Optional[Session] = None
+    ) -> None:
+        """
+        Publish writes.
+
+        Arguments:
+            invalidations: invalidations to send
+            session: session making the writes, not yet committed; the invalidations
+                are sent with its transaction or once it commits. Without one they
+                are sent immediately.
+        """
+        if not invalidations:
+            return
+
+        if session is None:
+            self._send(invalidations)
+        elif self._transport.transactional:
+            self._transport.send(invalidations, session)
+        else:
+            event.listen(
+                session,
+                "after_commit",
+                lambda _: self._send(invalidations),
+                once=True,
+            )
+
+    def flush(self) -> None:
+        """
+        Drop everything subscribed caches hold, for when invalidations were lost.
+        """
+        with self._lock:
+            flushes = list(self._flushes)
+
+        logger.warning("flushing %d caches after lost invalidations", len(flushes))
+
+        for flush in flushes:
+            try:
+                flush()
+            except Exception:
+                logger.exception("cache flush failed")
+
+    def start(self) -> None:
+        """
+        Start receiving invalidations from other processes.
+        """
+        self._transport.start()
+
+    def close(self) -> None:
+        """
+        Stop receiving and release transport resources.
+        """
+        self._transport.close()
+
+    def _send(self, invalidations: Sequence[Invalidation]) -> None:
+        try:
+            self._transport.send(invalidations)
+        except Exception:
+            # the write is committed; rather than fail it, forget what may be stale
+            logger.exception("could not publish %d invalidations", len(invalidations))
+            self.flush()
+
+    def _stale(self, invalidation: Invalidation) -> bool:
+        key = (invalidation.entity, invalidation.id)
+
+        if invalidation.deleted:
+            # a deleted row has no later versions to order against
+            self._versions.pop(key, None)
+            return False
+
+        seen = self._versions.get(key)
+
+        if seen is not None and invalidation.version <= seen:
+            return True
+
+        self._versions[key] = invalidation.version
+        self._versions.move_to_end(key)
+
+        if len(self._versions) > self.tracked_versions:
+            self._versions.popitem(last=False)
+
+        return False
+
+    def _deliver(self, invalidation: Invalidation) -> None:
+        with self._lock:
+            if self._stale(invalidation):
+                return
+
+            listeners = list(self._listeners)
+
+        for listener in listeners:
+            try:
+                listener(invalidation)
+            except Exception:
+                # one failing cache must not starve the others
+                logger.exception("invalidation listener failed for %s", invalidation)
+
+
+class LocalTransport:
+    """
+    In-process transport delivering synchronously to its own bus.
+    """
+
+    transactional = False
+
+    def __init__(self) -> None:
+        self._deliver: Optional[Deliver] = None
+
+    def attach(self, deliver: Deliver, flush: Flush) -> None:
+        self._deliver = deliver
+
+    def start(self) -> None:
+        pass
+
+    def send(
+        self, invalidations: Sequence[Invalidation], session: Optional[Session] = None
+    ) -> None:
+        for invalidation in invalidations:
+            self._deliver(invalidation)
+
+    def close(self) -> None:
+        pass
+
+
+class InvalidationBroker:
+    """
+    Unix socket broker relaying every line a client sends to all connected clients.
+
+    Meant for tests and single-host deployments without PostgreSQL; run it in a
+    thread or its own process.
+    """
+
+    def __init__(self, path: str) -> None:
+        """
+        Initialize the broker.
+
+        Arguments:
+            path: filesystem path of the Unix socket to listen on
+        """
+        self.path = path
+        self._clients: List[socket.socket] = []
+        self._lock = threading.Lock()
+        self._server: Optional[socketserver.ThreadingUnixStreamServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """
+        Listen on the socket and relay in a background thread.
+        """
+        self._server = self._bind()
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="invalidation-broker", daemon=True
+        )
+        self._thread.start()
+
+    def serve_forever(self) -> None:
+        """
+        Listen on the socket and relay until the process is stopped.
+        """
+        self._server = self._bind()
+        self._server.serve_forever()
+
+    def close(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+        with self._lock:
+            for client in self._clients:
+                _shutdown(client)
+
+            self._clients.clear()
+
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def _bind(self) -> socketserver.ThreadingUnixStreamServer:
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        broker = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                try:
+                    for line in self.rfile:
+                        broker._relay(line)
+                finally:
+                    with broker._lock:
+                        if self.request in broker._clients:
+                            broker._clients.remove(self.request)
+
+        class Server(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+
+            def process_request(self, request, client_address) -> None:
+                # registered in accept order, before any later client can send
+                with broker._lock:
+                    broker._clients.append(request)
+
+                super().process_request(request, client_address)
+
+        server = Server(self.path, Handler)
+
+        return server
+
+    def _relay(self, line: bytes) -> None:
+        with self._lock:
+            for client in list(self._clients):
+                try:
+                    client.sendall(line)
+                except OSError:
+                    self._clients.remove(client)
+
+
+class UnixSocketTransport:
+    """
+    Transport through an `InvalidationBroker` on a Unix socket.
+
+    A reader thread receives relayed invalidations. If the broker goes away, the
+    reader flushes the bus and reconnects with exponential backoff, flushing again
+    once connected since invalidations relayed meanwhile were missed. A send
+    reconnects once if the connection is gone; if the broker is still unreachable
+    the batch is logged and dropped and the bus flushed.
+    """
+
+    transactional = False
+
+    def __init__(
+        self,
+        path: str,
+        timeout: float = 5.0,
+        retry_interval: float = 0.5,
+        max_retry_interval: float = 30.0,
+    ) -> None:
+        """
+        Initialize the transport. Nothing connects until `start` or the first send.
+
+        Arguments:
+            path: filesystem path of the broker's Unix socket
+            timeout: seconds to wait for the broker when connecting
+            retry_interval: seconds before the first reconnection attempt
+            max_retry_interval: longest wait between reconnection attempts
+        """
+        self.path = path
+        self.timeout = timeout
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._deliver: Optional[Deliver] = None
+        self._flush: Optional[Flush] = None
+        self._socket: Optional[socket.socket] = None
+        self._reader: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        self._lock = threading.Lock()
+
+    def attach(self, deliver: Deliver, flush: Flush) -> None:
+        self._deliver = deliver
+        self._flush = flush
+
+    def start(self) -> None:
+        self._connect()
+
+    def send(
+        self, invalidations: Sequence[Invalidation], session: Optional[Session] = None
+    ) -> None:
+        payload = "".join(
+            f"{invalidation.encode()}\n" for invalidation in invalidations
+        ).encode()
+
+        for _ in range(2):
+            connection = None
+
+            try:
+                connection = self._connect()
+
+                with self._lock:
+                    connection.sendall(payload)
+
+                return
+            except OSError:
+                if connection is not None:
+                    self._drop(connection)
+
+        logger.error(
+            "dropped %d invalidations: broker %s unreachable",
+            len(invalidations),
+            self.path,
+        )
+        self._flush()
+
+    def close(self) -> None:
+        self._closed.set()
+
+        with self._lock:
+            connection, self._socket = self._socket, None
+
+        if connection is not None:
+            _shutdown(connection)
+
+        if self._reader is not None:
+            self._reader.join(self.timeout)
+            self._reader = None
+
+    def _connect(self) -> socket.socket:
+        with self._lock:
+            if self._socket is None:
+                self._socket = self._open()
+
+            if self._reader is None:
+                self._closed.clear()
+                self._reader = threading.Thread(
+                    target=self._read,
+                    args=(self._socket,),
+                    name="invalidation-reader",
+                    daemon=True,
+                )
+                self._reader.start()
+
+            return self._socket
+
+    def _reconnect(self) -> Optional[socket.socket]:
+        with self._lock:
+            if self._closed.is_set():
+                return None
+
+            if self._socket is None:
+                self._socket = self._open()
+
+            return self._socket
+
+    def _open(self) -> socket.socket:
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            connection.settimeout(self.timeout)
+            connection.connect(self.path)
+            connection.settimeout(None)
+        except OSError:
+            connection.close()
+            raise
+
+        return connection
+
+    def _drop(self, connection: socket.socket) -> None:
+        with self._lock:
+            if self._socket is connection:
+                self._socket = None
+
+        _shutdown(connection)
+
+    def _read(self, connection: Optional[socket.socket]) -> None:
+        delay = self.retry_interval
+
+        while connection is not None:
+            try:
+                with connection.makefile("rb") as lines:
+                    for line in lines:
+                        self._deliver(Invalidation.decode(line.decode()))
+            except (OSError, ValueError):
+                pass
+
+            if self._closed.is_set():
+                return
+
+            logger.warning("invalidation broker connection lost")
+            self._drop(connection)
+            self._flush()
+            connection = None
+
+            while connection is None:
+                try:
+                    connection = self._reconnect()
+                except OSError:
+                    logger.warning(
+                        "invalidation broker %s unreachable, retrying in %.1fs",
+                        self.path,
+                        delay,
+                    )
+
+                    if self._closed.wait(delay):
+                        return
+
+                    delay = min(delay * 2, self.max_retry_interval)
+                    continue
+
+                if connection is None:
+                    return
+
+            delay = self.retry_interval
+            # invalidations relayed while disconnected were missed
+            self._flush()
+
+
+def _shutdown(connection: socket.socket) -> None:
+    # shutdown wakes a reader blocked on the socket, which close alone does not
+    try:
+        connection.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+    connection.close()
+
+
+class PostgresTransport:
+    """
+    Transport over PostgreSQL LISTEN/NOTIFY.
+
+    Invalidations are sent with `pg_notify` in the writing session, one notification
+    each in a single statement per batch, so PostgreSQL delivers them when the write
+    commits and drops them if it rolls back. They are received on a dedicated
+    psycopg2 connection listening on the channel from a background thread; it is
+    opened outside the engine's pool, so admission control sized to the pool still
+    matches the connections requests can check out. If that
+    connection fails, the listener flushes the bus and reconnects with exponential
+    backoff, flushing again once listening.
+    """
+
+    transactional = True
+
+    def __init__(
+        self,
+        engine: Callable[[], Engine],
+        channel: str = CHANNEL,
+        poll_interval: float = 1.0,
+        retry_interval: float = 0.5,
+        max_retry_interval: float = 30.0,
+    ) -> None:
+        """
+        Initialize the transport. Nothing connects until `start` or the first send.
+
+        Arguments:
+            engine: provider of the engine to notify and listen through
+            channel: notification channel shared by all workers
+            poll_interval: seconds between checks for shutdown while idle
+            retry_interval: seconds before the first reconnection attempt
+            max_retry_interval: longest wait between reconnection attempts
+        """
+        self._engine = engine
+        self.channel = channel
+        self.poll_interval = poll_interval
+        self.retry_interval = retry_interval
+        self.max_retry_interval = max_retry_interval
+        self._deliver: Optional[Deliver] = None
+        self._flush: Optional[Flush] = None
+        self._listener: Optional[threading.Thread] = None
+        self._listener_engine: Optional[Engine] = None
+        self._stopped = threading.Event()
+        self._notify = text(
+            "SELECT pg_notify(:channel, payload) FROM unnest(:payloads) AS payload"
+        )
+
+    def attach(self, deliver: Deliver, flush: Flush) -> None:
+        self._deliver = deliver
+        self._flush = flush
+
+    def start(self) -> None:
+        if self._listener is not None:
+            return
+
+        connection = self._open()
+        self._stopped.clear()
+        self._listener = threading.Thread(
+            target=self._listen,
+            args=(connection,),
+            name="invalidation-listener",
+            daemon=True,
+        )
+        self._listener.start()
+
+    def send(
+        self, invalidations: Sequence[Invalidation], session: Optional[Session] = None
+    ) -> None:
+        parameters = {
+            "channel": self.channel,
+            "payloads": [invalidation.encode() for invalidation in invalidations],
+        }
+
+        if session is not None:
+            session.execute(self._notify, parameters)
+            return
+
+        with self._engine().begin() as connection:
+            connection.execute(self._notify, parameters)
+
+    def close(self) -> None:
+        self._stopped.set()
+
+        if self._listener is not None:
+            self._listener.join(self.poll_interval * 2)
+            self._listener = None
+
+        if self._listener_engine is not None:
+            self._listener_engine.dispose()
+            self._listener_engine = None
+
+    def _open(self):
+        if self._listener_engine is None:
+            # unpooled, so listening never holds one of the pool's connections
+            self._listener_engine = create_engine(
+                self._engine().url, poolclass=NullPool
+            )
+
+        connection = self._listener_engine.raw_connection()
+        driver_connection = connection.driver_connection
+
+        if not hasattr(driver_connection, "notifies"):
+            connection.close()
+            raise ValueError("LISTEN/NOTIFY invalidation requires the psycopg2 driver")
+
+        driver_connection.autocommit = True
+
+        with driver_connection.cursor() as cursor:
+            cursor.execute(f'LISTEN "{self.channel}"')
+
+        return connection
+
+    def _listen(self, connection) -> None:
+        delay = self.retry_interval
+
+        while True:
+            try:
+                self._receive(connection)
+            except Exception:
+                logger.exception("invalidation listener connection lost")
+            finally:
+                connection.invalidate()
+
+            if self._stopped.is_set():
+                return
+
+            self._flush()
+            connection = None
+
+            while connection is None:
+                if self._stopped.wait(delay):
+                    return
+
+                try:
+                    connection = self._open()
+                except Exception:
+                    logger.exception(
+                        "cannot listen for invalidations, retrying in %.1fs", delay
+                    )
+                    delay = min(delay * 2, self.max_retry_interval)
+
+            delay = self.retry_interval
+            # notifications sent while disconnected were missed
+            self._flush()
+
+    def _receive(self, connection) -> None:
+        driver_connection = connection.driver_connection
+
+        while not self._stopped.is_set():
+            readable, _, _ = select.select(
+                [driver_connection], [], [], self.poll_interval
+            )
+
+            if not readable:
+                continue
+
+            driver_connection.poll()
+
+            while driver_connection.notifies:
+                notify = driver_connection.notifies.pop(0)
+                self._deliver(Invalidation.decode(notify.payload))
@@ -0,0 +1,795 @@
+import heapq
+from bisect import bisect_left, insort
+from threading import RLock
+from typing import (
+    Callable,
+    Dict,
+    FrozenSet,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
+
+from src.models.device import Device
+from src.models.dwelling import Dwelling, DwellingTree, HubTree
+from src.models.hub import Hub
+from src.models.search import EntityKind, SearchHit, SearchResults
+from src.repository.base import T
+from src.repository.compact import CompactDevices
+from src.repository.idempotency import IdempotencyKey
+from src.repository.search import (
+    SIMILARITY_THRESHOLD,
+    match_tier,
+    normalize_name,
+    similarity,
+    trigrams,
+    word_trigrams,
+    words,
+)
+
+# called with an item's id and the stored item, or None once it is deleted
+StoreListener = Callable[[str, Optional[T]], None]
+
+
+class MemoryStore(Generic[T]):
+    """
+    Thread-safe in-memory storage implementation for entity persistence.
+
+    Mirrors the `DB` interface so services can run without a database, e.g. in
+    tests or local development. Stored items are kept by reference.
+
+    Type Parameters:
+        T: type of entity being stored (Pydantic BaseModel)
+    """
+
+    def __init__(self) -> None:
+        self._items: Dict[str, T] = {}
+        # (scope, client, key) -> (id of the entity the key created, payload hash)
+        self._idempotency: Dict[Tuple[str, str, str], Tuple[str, str]] = {}
+        self._listeners: List[StoreListener] = []
+        self._lock = RLock()
+
+    def subscribe(self, listener: StoreListener) -> None:
+        """
+        Register a callback for every write, e.g. to maintain a secondary index.
+
+        Items already stored are replayed to the listener first. Listeners run under
+        the store's lock, in write order.
+
+        Arguments:
+            listener: callback receiving the written id and item (None on delete)
+        """
+        with self._lock:
+            for id, item in self._items.items():
+                listener(id, item)
+
+            self._listeners.append(listener)
+
+    def _notify(self, id: str, item: Optional[T]) -> None:
+        for listener in self._listeners:
+            listener(id, item)
+
+    def create(
+        self, id: str, item: T, idempotency_key: Optional[IdempotencyKey] = None
+    ) -> T:
+        """
+        Create a new item in the store.
+
+        Arguments:
+            id: unique identifier for the item
+            item: item to store
+            idempotency_key: optional client-supplied key; a retry carrying a claimed
+                key gets back the entity the key created
+
+        Returns:
+            stored item
+
+        Raises:
+            ValueError: if item with id already exists, or the entity an idempotency
+                key created has since been deleted
+            IdempotencyConflict: if the idempotency key was used with another payload
+        """
+        with self._lock:
+            if idempotency_key is not None:
+                scoped = (
+                    idempotency_key.scope,
+                    idempotency_key.client_id,
+                    idempotency_key.key,
+                )
+                claimed = self._idempotency.get(scoped)
+
+                if claimed is not None:
+                    claimed_id, payload_hash = claimed
+                    idempotency_key.check(payload_hash)
+                    existing = self._items.get(claimed_id)
+
+                    if existing is None:
+                        raise ValueError(
+                            f"Item {claimed_id} created with idempotency key "
+                            f"{idempotency_key.key} no longer exists"
+                        )
+
+                    return existing
+
+            if id in self._items:
+                raise ValueError(f"Item with id {id} already exists.")
+
+            if idempotency_key is not None:
+                self._idempotency[scoped] = (id, idempotency_key.payload_hash)
+
+            self._items[id] = item
+            self._notify(id, item)
+
+            return item
+
+    def get(self, id: str) -> Optional[T]:
+        """
+        Retrieve an item by its identifier.
+
+        Arguments:
+            id: identifier of the item to retrieve
+
+        Returns:
+            item if found, None otherwise
+        """
+        return self._items.get(id)
+
+    def get_many(self, ids: Sequence[str]) -> List[T]:
+        """
+        Retrieve several items by identifier.
+
+        Arguments:
+            ids: identifiers of the items to retrieve
+
+        Returns:
+            items found, in the order of ids
+        """
+        return [item for item in map(self._items.get, ids) if item is not None]
+
+    def list(self) -> List[T]:
+        """
+        List all items in the store.
+
+        Returns:
+            list of all stored items
+        """
+        with self._lock:
+            return list(self._items.values())
+
+    def update(self, id: str, item: T) -> T:
+        """
+        Update an existing item.
+
+        Arguments:
+            id: identifier of the item to update
+            item: new item data
+
+        Returns:
+            updated item
+
+        Raises:
+            ValueError: if item with id does not exist
+        """
+        with self._lock:
+            if id not in self._items:
+                raise ValueError(f"Item with id {id} not found")
+
+            self._items[id] = item
+            self._notify(id, item)
+
+            return item
+
+    def update_many(self, items: Sequence[T]) -> List[T]:
+        """
+        Update a batch of existing items.
+
+        Arguments:
+            items: new item data; each must carry its `id`
+
+        Returns:
+            items that were updated; items whose id is not stored are skipped
+        """
+        updated = []
+
+        with self._lock:
+            for item in items:
+                if item.id in self._items:
+                    self._items[item.id] = item
+                    self._notify(item.id, item)
+                    updated.append(item)
+
+        return updated
+
+    def create_many(self, items: Sequence[T]) -> int:
+        """
+        Insert a batch of items, skipping ids that already exist.
+
+        Arguments:
+            items: items to store; each must carry its `id`
+
+        Returns:
+            number of items inserted
+        """
+        inserted = 0
+
+        with self._lock:
+            for item in items:
+                if item.id not in self._items:
+                    self._items[item.id] = item
+                    self._notify(item.id, item)
+                    inserted += 1
+
+        return inserted
+
+    def iterate(self, batch_size: int = 1000) -> Iterator[T]:
+        """
+        Iterate over all items in id order.
+
+        Arguments:
+            batch_size: unused, accepted for interface compatibility
+
+        Returns:
+            iterator over all stored items
+        """
+        with self._lock:
+            ids = sorted(self._items)
+
+        for id in ids:
+            item = self._items.get(id)
+
+            if item is not None:
+                yield item
+
+    def pages(self, batch_size: int = 1000) -> Iterator[List[T]]:
+        """
+        Iterate over all items in id order, a page at a time.
+
+        Arguments:
+            batch_size: items per page
+
+        Returns:
+            iterator over pages of items
+        """
+        page: List[T] = []
+
+        for item in self.iterate():
+            page.append(item)
+
+            if len(page) >= batch_size:
+                yield page
+                page = []
+
+        if page:
+            yield page
+
+    def delete(self, id: str) -> None:
+        """
+        Delete an item from the store.
+
+        Arguments:
+            id: identifier of the item to delete
+
+        Raises:
+            ValueError: if item with id does not exist
+        """
+        with self._lock:
+            if id not in self._items:
+                raise ValueError(f"Item with id {id} not found")
+
+            del self._items[id]
+            self._notify(id, None)
+
+
+class CompactDeviceStore(MemoryStore[Device]):
+    """
+    In-memory Device store keeping devices in typed column arrays instead of as
+    models, for large fleets.
+
+    Unlike `MemoryStore`, devices are held by value: every read returns a new
+    `Device`, so changes must be written back with `update`.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._items = CompactDevices()
+
+
+class MemoryDwellingTreeLoader:
+    """
+    Assembles dwelling trees from in-memory stores.
+    """
+
+    def __init__(
+        self,
+        dwelling_store: MemoryStore[Dwelling],
+        hub_store: MemoryStore[Hub],
+        device_store: MemoryStore[Device],
+    ) -> None:
+        self._dwelling_store = dwelling_store
+        self._hub_store = hub_store
+        self._device_store = device_store
+
+    def load(self, dwelling_id: str) -> Optional[DwellingTree]:
+        """
+        Load a Dwelling tree.
+
+        Arguments:
+            dwelling_id: identifier of the Dwelling
+
+        Returns:
+            Dwelling tree if found, None otherwise
+        """
+        dwelling = self._dwelling_store.get(dwelling_id)
+
+        if dwelling is None:
+            return None
+
+        hubs = []
+
+        for hub_id in dwelling.hub_ids:
+            hub = self._hub_store.get(hub_id)
+
+            if hub is None:
+                continue
+
+            devices = [
+                device.model_copy(deep=True)
+                for device in map(self._device_store.get, hub.paired_device_ids)
+                if device is not None
+            ]
+            hubs.append(HubTree(**hub.model_dump(), devices=devices))
+
+        return DwellingTree(**dwelling.model_dump(), hubs=hubs)
+
+
+class _SortedStrings:
+    """
+    Sorted set of strings for prefix scans, kept as a few sorted runs.
+
+    Inserts go into a small sorted buffer; a full buffer becomes a run, and a run is
+    merged into the one before it while that one is at most twice its length, as in
+    a binary counter. There are O(log n) runs and every value is merged O(log n)
+    times, so building an index of n values costs O(n log n) rather than one merge
+    of the whole index per buffer.
+    """
+
+    __slots__ = ("_runs", "_pending")
+
+    _MAX_PENDING = 4096
+
+    def __init__(self) -> None:
+        # longest first
+        self._runs: List[List[str]] = []
+        self._pending: List[str] = []
+
+    def add(self, value: str) -> None:
+        insort(self._pending, value)
+
+        if len(self._pending) < self._MAX_PENDING:
+            return
+
+        self._runs.append(self._pending)
+        self._pending = []
+
+        while len(self._runs) > 1 and len(self._runs[-2]) <= 2 * len(self._runs[-1]):
+            # timsort merges the two sorted runs in linear time
+            last = self._runs.pop()
+            self._runs[-1] = sorted(self._runs[-1] + last)
+
+    def remove(self, value: str) -> None:
+        for values in (self._pending, *self._runs):
+            index = bisect_left(values, value)
+
+            if index < len(values) and values[index] == value:
+                del values[index]
+                return
+
+    def prefixed(self, prefix: str) -> Iterator[str]:
+        """
+        Values starting with prefix, in order.
+        """
+        return heapq.merge(
+            *(_prefixed(values, prefix) for values in (*self._runs, self._pending))
+        )
+
+
+class _NameEntry:
+    """
+    Entities sharing one normalized name, with ids kept sorted per kind.
+    """
+
+    __slots__ = ("members", "size", "_trigrams")
+
+    def __init__(self) -> None:
+        self.members: Dict[EntityKind, List[str]] = {}
+        self.size = 0
+        self._trigrams: Optional[FrozenSet[str]] = None
+
+    def trigrams(self, name: str) -> FrozenSet[str]:
+        # extracted on first scoring only, so rarely searched names cost no memory
+        if self._trigrams is None:
+            self._trigrams = trigrams(name)
+
+        return self._trigrams
+
+    def count(self, kinds: Optional[Set[EntityKind]]) -> int:
+        if kinds is None:
+            return self.size
+
+        return sum(len(ids) for kind, ids in self.members.items() if kind in kinds)
+
+    def iterate(
+        self, kinds: Optional[Set[EntityKind]]
+    ) -> Iterator[Tuple[str, EntityKind]]:
+        return heapq.merge(
+            *(
+                [(id, kind) for id in ids]
+                for kind, ids in self.members.items()
+                if kinds is None or kind in kinds
+            )
+        )
+
+
+class MemoryNameSearch:
+    """
+    In-memory name search index over dwellings, hubs and devices.
+
+    Counterpart of `NameSearch` for in-memory stores, kept current by subscribing to
+    them. Entities are grouped by normalized name, so a fleet of identically named
+    devices is ranked once per distinct name. Candidate names come from a sorted
+    name list (prefix), a sorted word list (word prefix) and trigram postings per
+    word (fuzzy), and are scored by match tier plus trigram similarity like
+    pg_trgm. Searches scoped to a dwelling or hub rank that small subtree directly.
+    """
+
+    def __init__(
+        self,
+        dwelling_store: MemoryStore[Dwelling],
+        hub_store: MemoryStore[Hub],
+        device_store: MemoryStore[Device],
+        max_candidates: int = 1000,
+    ) -> None:
+        """
+        Initialize the index and fill it from the stores.
+
+        Arguments:
+            dwelling_store: Dwellings to index
+            hub_store: Hubs to index
+            device_store: Devices to index
+            max_candidates: distinct names ranked per unscoped search at most; like
+                PostgreSQL's `gin_fuzzy_search_limit`, bounds the cost of very
+                unselective queries, whose results are then marked truncated
+        """
+        self._stores = {
+            EntityKind.DWELLING: dwelling_store,
+            EntityKind.HUB: hub_store,
+            EntityKind.DEVICE: device_store,
+        }
+        self._max_candidates = max_candidates
+        self._lock = RLock()
+        self._indexed: Dict[str, Tuple[EntityKind, str]] = {}
+        self._entries: Dict[str, _NameEntry] = {}
+        self._sorted_names = _SortedStrings()
+        self._words = _SortedStrings()
+        self._word_names: Dict[str, Set[str]] = {}
+        self._trigram_words: Dict[str, Set[str]] = {}
+
+        for kind, store in self._stores.items():
+            store.subscribe(self._listener(kind))
+
+    def search(
+        self,
+        query: str,
+        kinds: Sequence[EntityKind],
+        dwelling_id: Optional[str] = None,
+        hub_id: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> SearchResults:
+        """
+        Search entity names.
+
+        Arguments:
+            query: text to search for
+            kinds: kinds of entities to search
+            dwelling_id: optional Dwelling restricting hits to itself, its Hubs and
+                their Devices
+            hub_id: optional Hub restricting hits to itself, its Dwelling and its
+                Devices
+            limit: maximum number of hits to return
+            offset: number of best hits to skip
+
+        Returns:
+            page of hits, best match first
+        """
+        query = normalize_name(query)
+
+        if dwelling_id is not None or hub_id is not None:
+            return self._search_scope(query, kinds, dwelling_id, hub_id, limit, offset)
+
+        with self._lock:
+            return self._search_index(query, kinds, limit, offset)
+
+    def _listener(self, kind: EntityKind) -> StoreListener:
+        def listener(id: str, item: Optional[T]) -> None:
+            with self._lock:
+                if item is None:
+                    self._remove(id)
+                else:
+                    self._add(kind, id, normalize_name(item.name))
+
+        return listener
+
+    def _add(self, kind: EntityKind, id: str, name: str) -> None:
+        indexed = self._indexed.get(id)
+
+        if indexed == (kind, name):
+            return
+
+        if indexed is not None:
+            self._remove(id)
+
+        entry = self._entries.get(name)
+
+        if entry is None:
+            entry = self._entries[name] = _NameEntry()
+            self._sorted_names.add(name)
+
+            for word in set(words(name)):
+                names = self._word_names.get(word)
+
+                if names is None:
+                    names = self._word_names[word] = set()
+                    self._words.add(word)
+
+                    for gram in word_trigrams(word):
+                        self._trigram_words.setdefault(gram, set()).add(word)
+
+                names.add(name)
+
+        insort(entry.members.setdefault(kind, []), id)
+        entry.size += 1
+        self._indexed[id] = (kind, name)
+
+    def _remove(self, id: str) -> None:
+        indexed = self._indexed.pop(id, None)
+
+        if indexed is None:
+            return
+
+        kind, name = indexed
+        entry = self._entries[name]
+        ids = entry.members[kind]
+        del ids[bisect_left(ids, id)]
+        entry.size -= 1
+
+        if not ids:
+            del entry.members[kind]
+
+        if entry.size:
+            return
+
+        del self._entries[name]
+        self._sorted_names.remove(name)
+
+        for word in set(words(name)):
+            names = self._word_names[word]
+            names.discard(name)
+
+            if names:
+                continue
+
+            del self._word_names[word]
+            self._words.remove(word)
+
+            for gram in word_trigrams(word):
+                grams = self._trigram_words[gram]
+                grams.discard(word)
+
+                if not grams:
+                    del self._trigram_words[gram]
+
+    def _search_index(
+        self, query: str, kinds: Sequence[EntityKind], limit: int, offset: int
+    ) -> SearchResults:
+        selected = None if set(kinds) >= set(EntityKind) else set(kinds)
+        query_trigrams = trigrams(query)
+        candidates, truncated = self._candidates(query, query_trigrams)
+        ranked = []
+        total = 0
+
+        for name in candidates:
+            entry = self._entries[name]
+            count = entry.count(selected)
+
+            if not count:
+                continue
+
+            tier = match_tier(name, query)
+            score = tier + similarity(entry.trigrams(name), query_trigrams)
+
+            if tier or score >= SIMILARITY_THRESHOLD:
+                ranked.append((-score, name))
+                total += count
+
+        ranked.sort()
+        hits: List[SearchHit] = []
+        skip = offset
+
+        for negative_score, name in ranked:
+            if len(hits) >= limit:
+                break
+
+            entry = self._entries[name]
+            count = entry.count(selected)
+
+            if skip >= count:
+                skip -= count
+                continue
+
+            for id, kind in entry.iterate(selected):
+                if skip:
+                    skip -= 1
+                elif len(hits) < limit:
+                    hits.append(self._hit(kind, id, -negative_score))
+                else:
+                    break
+
+        return SearchResults(
+            hits=hits, total=total, offset=offset, limit=limit, truncated=truncated
+        )
+
+    def _candidates(
+        self, query: str, query_trigrams: FrozenSet[str]
+    ) -> Tuple[List[str], bool]:
+        """
+        Distinct names worth scoring, best-tier sources first, and whether the
+        candidate limit cut them short.
+        """
+        candidates: Dict[str, None] = {}
+
+        def collect(names: Iterable[str]) -> bool:
+            for name in names:
+                if name not in candidates:
+                    if len(candidates) >= self._max_candidates:
+                        return False
+
+                    candidates[name] = None
+
+            return True
+
+        def word_names(word_list: Iterable[str]) -> Iterator[str]:
+            for word in word_list:
+                yield from self._word_names[word]
+
+        query_words = words(query)
+        complete = collect(self._sorted_names.prefixed(query)) and (
+            not query_words
+            or collect(word_names(self._words.prefixed(query_words[0])))
+        )
+
+        if complete and query_trigrams:
+            # a name at least as similar as the threshold shares enough trigrams
+            # with the query that it must contain one of any few of them; pick
+            # the rarest few
+            required = int(SIMILARITY_THRESHOLD * len(query_trigrams))
+            rarest = sorted(
+                query_trigrams,
+                key=lambda gram: len(self._trigram_words.get(gram, ())),
+            )
+
+            for gram in rarest[: len(query_trigrams) - required + 1]:
+                if not collect(word_names(self._trigram_words.get(gram, ()))):
+                    complete = False
+                    break
+
+        return list(candidates), not complete
+
+    def _search_scope(
+        self,
+        query: str,
+        kinds: Sequence[EntityKind],
+        dwelling_id: Optional[str],
+        hub_id: Optional[str],
+        limit: int,
+        offset: int,
+    ) -> SearchResults:
+        query_trigrams = trigrams(query)
+        ranked = []
+
+        for kind, entity in self._scope(kinds, dwelling_id, hub_id):
+            name = normalize_name(entity.name)
+            tier = match_tier(name, query)
+            score = tier + similarity(trigrams(name), query_trigrams)
+
+            if tier or score >= SIMILARITY_THRESHOLD:
+                ranked.append((-score, name, entity.id, kind, entity.name))
+
+        ranked.sort(key=lambda hit: hit[:3])
+
+        return SearchResults(
+            hits=[
+                SearchHit(kind=kind, id=id, name=display, score=-negative_score)
+                for negative_score, _, id, kind, display in ranked[
+                    offset : offset + limit
+                ]
+            ],
+            total=len(ranked),
+            offset=offset,
+            limit=limit,
+        )
+
+    def _scope(
+        self,
+        kinds: Sequence[EntityKind],
+        dwelling_id: Optional[str],
+        hub_id: Optional[str],
+    ) -> List[Tuple[EntityKind, Union[Dwelling, Hub, Device]]]:
+        """
+        Entities of the requested kinds within the dwelling and/or hub.
+        """
+        dwelling_store = self._stores[EntityKind.DWELLING]
+        hub_store = self._stores[EntityKind.HUB]
+        device_store = self._stores[EntityKind.DEVICE]
+
+        if hub_id is not None:
+            hub = hub_store.get(hub_id)
+
+            if hub is None or (
+                dwelling_id is not None and hub.dwelling_id != dwelling_id
+            ):
+                return []
+
+            hubs = [hub]
+            dwelling_id = hub.dwelling_id
+        else:
+            dwelling = dwelling_store.get(dwelling_id)
+
+            if dwelling is None:
+                return []
+
+            hubs = [hub for hub in map(hub_store.get, dwelling.hub_ids) if hub]
+
+        entities: List[Tuple[EntityKind, Union[Dwelling, Hub, Device]]] = []
+        dwelling = dwelling_store.get(dwelling_id) if dwelling_id else None
+
+        if EntityKind.DWELLING in kinds and dwelling is not None:
+            entities.append((EntityKind.DWELLING, dwelling))
+
+        for hub in hubs:
+            if EntityKind.HUB in kinds:
+                entities.append((EntityKind.HUB, hub))
+
+            if EntityKind.DEVICE in kinds:
+                entities.extend(
+                    (EntityKind.DEVICE, device)
+                    for device in map(device_store.get, hub.paired_device_ids)
+                    if device is not None
+                )
+
+        return entities
+
+    def _hit(self, kind: EntityKind, id: str, score: float) -> SearchHit:
+        entity = self._stores[kind].get(id)
+
+        # a concurrent delete may have removed the entity ahead of its index entry
+        name = entity.name if entity is not None else ""
+
+        return SearchHit(kind=kind, id=id, name=name, score=score)
+
+
+def _prefixed(values: List[str], prefix: str) -> Iterator[str]:
+    """
+    Values of a sorted list starting with prefix, in order.
+    """
+    index = bisect_left(values, prefix)
+
+    while index < len(values) and values[index].startswith(prefix):
+        yield values[index]
+        index += 1
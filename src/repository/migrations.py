@@ -0,0 +1,289 @@
+import re
+from typing import List
+
+from sqlalchemy import inspect, text, TEXT, VARCHAR
+from sqlalchemy.engine import Connection
+
+# (table, column) pairs holding entity identifiers, parents before children
+ID_COLUMNS = [
+    ("dwelling", "id"),
+    ("hub", "id"),
+    ("hub", "dwelling_id"),
+    ("device", "id"),
+    ("device", "paired_hub_id"),
+]
+
+# (table, constraint, column, referenced table) for foreign keys between id columns
+FOREIGN_KEYS = [
+    ("hub", "hub_dwelling_id_fkey", "dwelling_id", "dwelling"),
+    ("device", "device_paired_hub_id_fkey", "paired_hub_id", "hub"),
+]
+
+_UUID_PATTERN = "^[0-9a-fA-F]{8}-?([0-9a-fA-F]{4}-?){3}[0-9a-fA-F]{12}$"
+
+
+def migrate(connection: Connection) -> List[str]:
+    """
+    Bring a database created by an earlier version up to the current schema.
+
+    Each step runs only if the database still needs it, so migrating an up to date
+    database changes nothing. Run it inside a single transaction so a failure leaves
+    the schema untouched.
+
+    Arguments:
+        connection: open connection to the database, inside a transaction
+
+    Returns:
+        names of the steps applied, in order
+
+    Raises:
+        ValueError: if any stored identifier is not a valid UUID
+    """
+    applied = []
+
+    if _has_string_ids(connection):
+        migrate_string_ids_to_uuid(connection)
+        applied.append("migrate_string_ids_to_uuid")
+
+    if _missing_versions(connection):
+        add_entity_versions(connection)
+        applied.append("add_entity_versions")
+
+    if connection.dialect.name == "postgresql" and not _has_gist_name_indexes(
+        connection
+    ):
+        convert_name_search_indexes_to_gist(connection)
+        applied.append("convert_name_search_indexes_to_gist")
+
+    if not inspect(connection).has_table("idempotency_key"):
+        create_idempotency_keys(connection)
+        applied.append("create_idempotency_keys")
+
+    return applied
+
+
+def find_invalid_ids(connection: Connection) -> List[str]:
+    """
+    Find string identifiers that cannot be converted to native UUIDs.
+
+    Arguments:
+        connection: open connection to the database
+
+    Returns:
+        descriptions of offending values as "table.column=value"
+    """
+    invalid = []
+    postgresql = connection.dialect.name == "postgresql"
+
+    for table, column in ID_COLUMNS:
+        if postgresql:
+            rows = connection.execute(
+                text(
+                    f"SELECT {column} FROM {table} "
+                    f"WHERE {column} IS NOT NULL AND {column}::text !~ :pattern"
+                ),
+                {"pattern": _UUID_PATTERN},
+            )
+        else:
+            # no regular expressions in SQL elsewhere, so the values are checked here
+            rows = (
+                (value,)
+                for (value,) in connection.execute(
+                    text(f"SELECT {column} FROM {table} WHERE {column} IS NOT NULL")
+                )
+                if not re.match(_UUID_PATTERN, str(value))
+            )
+
+        invalid.extend(f"{table}.{column}={value}" for (value,) in rows)
+
+    return invalid
+
+
+def migrate_string_ids_to_uuid(connection: Connection) -> None:
+    """
+    Convert VARCHAR identifier and foreign key columns to native PostgreSQL UUIDs.
+
+    Foreign keys are dropped, every id column is rewritten in place with
+    `USING column::uuid`, and the foreign keys are recreated together with
+    indexes on the referencing columns. The redundant secondary index that
+    previously duplicated each primary key is dropped. Run it inside a single
+    transaction so a failure leaves the string schema untouched.
+
+    Other databases cannot change column types in place, so their values are
+    rewritten to the 32 hex digit form UUIDs are stored as there instead.
+
+    Arguments:
+        connection: open connection to the database, inside a transaction
+
+    Raises:
+        ValueError: if any stored identifier is not a valid UUID
+    """
+    invalid = find_invalid_ids(connection)
+
+    if invalid:
+        raise ValueError(
+            f"Cannot migrate {len(invalid)} non-UUID identifiers: "
+            f"{', '.join(invalid[:10])}"
+        )
+
+    if connection.dialect.name != "postgresql":
+        _rewrite_string_ids(connection)
+        return
+
+    for table, constraint, _, _ in FOREIGN_KEYS:
+        connection.execute(
+            text(f"ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {constraint}")
+        )
+
+    for table, column in ID_COLUMNS:
+        connection.execute(
+            text(
+                f"ALTER TABLE {table} ALTER COLUMN {column} "
+                f"TYPE uuid USING {column}::uuid"
+            )
+        )
+
+    for table in ("dwelling", "hub", "device"):
+        connection.execute(text(f"DROP INDEX IF EXISTS ix_{table}_id"))
+
+    for table, constraint, column, referenced in FOREIGN_KEYS:
+        connection.execute(
+            text(
+                f"ALTER TABLE {table} ADD CONSTRAINT {constraint} "
+                f"FOREIGN KEY ({column}) REFERENCES {referenced} (id)"
+            )
+        )
+        connection.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} "
+                f"ON {table} ({column})"
+            )
+        )
+
+
+def add_entity_versions(connection: Connection) -> None:
+    """
+    Add the row version column published with cache invalidations to an existing
+    database; new databases get it from `init_schema`.
+
+    Arguments:
+        connection: open connection to the database
+    """
+    for table in _missing_versions(connection):
+        connection.execute(
+            text(f"ALTER TABLE {table} ADD COLUMN version integer NOT NULL DEFAULT 1")
+        )
+
+
+def create_name_search_indexes(connection: Connection) -> None:
+    """
+    Add the pg_trgm extension and the trigram name indexes used by name search to
+    an existing PostgreSQL database; new databases get them from `init_schema`.
+
+    Arguments:
+        connection: open connection to the PostgreSQL database
+    """
+    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+
+    for table in ("dwelling", "hub", "device"):
+        connection.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_name_trgm "
+                f"ON {table} USING gist (name gist_trgm_ops)"
+            )
+        )
+
+
+def convert_name_search_indexes_to_gist(connection: Connection) -> None:
+    """
+    Replace trigram GIN name indexes created by an earlier `init_schema` or
+    `create_name_search_indexes` with the GiST indexes name search now orders its
+    candidates by.
+
+    Arguments:
+        connection: open connection to the PostgreSQL database
+    """
+    for table in ("dwelling", "hub", "device"):
+        connection.execute(text(f"DROP INDEX IF EXISTS ix_{table}_name_trgm"))
+
+    create_name_search_indexes(connection)
+
+
+def create_idempotency_keys(connection: Connection) -> None:
+    """
+    Add the table recording which entity each client idempotency key created to an
+    existing PostgreSQL database; new databases get it from `init_schema`.
+
+    Arguments:
+        connection: open connection to the PostgreSQL database
+    """
+    connection.execute(
+        text(
+            "CREATE TABLE IF NOT EXISTS idempotency_key ("
+            "scope varchar NOT NULL, client_id varchar NOT NULL, key varchar NOT NULL, "
+            "entity_id uuid NOT NULL, payload_hash varchar(64) NOT NULL, "
+            "PRIMARY KEY (scope, client_id, key))"
+        )
+    )
+
+
+def _has_string_ids(connection: Connection) -> bool:
+    if connection.dialect.name == "postgresql":
+        columns = inspect(connection).get_columns("dwelling")
+        id_type = next(column["type"] for column in columns if column["name"] == "id")
+
+        return isinstance(id_type, (VARCHAR, TEXT))
+
+    # without a UUID type the column stays VARCHAR, so look for unconverted values
+    return any(
+        connection.execute(
+            text(
+                f"SELECT 1 FROM {table} WHERE length({column}) != 32 "
+                f"OR {column} GLOB '*[^0-9a-f]*' LIMIT 1"
+            )
+        ).first()
+        for table, column in ID_COLUMNS
+    )
+
+
+def _missing_versions(connection: Connection) -> List[str]:
+    schema = inspect(connection)
+
+    return [
+        table
+        for table in ("dwelling", "hub", "device")
+        if "version" not in {column["name"] for column in schema.get_columns(table)}
+    ]
+
+
+def _has_gist_name_indexes(connection: Connection) -> bool:
+    definitions = connection.execute(
+        text(
+            "SELECT indexdef FROM pg_indexes "
+            "WHERE indexname IN ('ix_dwelling_name_trgm', 'ix_hub_name_trgm', "
+            "'ix_device_name_trgm')"
+        )
+    ).scalars()
+
+    return sum("USING gist" in definition for definition in definitions) == 3
+
+
+def _rewrite_string_ids(connection: Connection) -> None:
+    for table, column in ID_COLUMNS:
+        connection.execute(
+            text(
+                f"UPDATE {table} SET {column} = lower(replace({column}, '-', '')) "
+                f"WHERE {column} IS NOT NULL"
+            )
+        )
+
+    for table in ("dwelling", "hub", "device"):
+        connection.execute(text(f"DROP INDEX IF EXISTS ix_{table}_id"))
+
+    for table, _, column, _ in FOREIGN_KEYS:
+        connection.execute(
+            text(
+                f"CREATE INDEX IF NOT EXISTS ix_{table}_{column} "
+                f"ON {table} ({column})"
+            )
+        )
@@ -0,0 +1,224 @@
+import asyncio
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class PoolSaturatedError(RuntimeError):
+    """
+    Raised when no database connection became available within the admission timeout.
+    """
+
+
+class PoolMetrics:
+    """
+    Connection pool gauges collected from pool events.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.connections_opened = 0
+        self.checkouts = 0
+        self.invalidations = 0
+
+    def attach(self, engine: Engine) -> None:
+        """
+        Start collecting events from the engine's pool.
+
+        Arguments:
+            engine: engine whose pool to observe
+        """
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, *args: Any) -> None:
+        with self._lock:
+            self.connections_opened += 1
+
+    def _on_checkout(self, *args: Any) -> None:
+        with self._lock:
+            self.checkouts += 1
+
+    def _on_invalidate(self, *args: Any) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self, engine: Optional[Engine]) -> Dict[str, Any]:
+        """
+        Read the current pool gauges.
+
+        Arguments:
+            engine: engine whose pool to read, None if not created yet
+
+        Returns:
+            pool size, checked out and overflow connections plus event counters
+        """
+        pool = engine.pool if engine is not None else None
+
+        return {
+            "size": _gauge(pool, "size"),
+            "checked_out": _gauge(pool, "checkedout"),
+            "overflow": _gauge(pool, "overflow"),
+            "connections_opened": self.connections_opened,
+            "checkouts": self.checkouts,
+            "invalidations": self.invalidations,
+        }
+
+
+def _gauge(pool: Any, name: str) -> Optional[int]:
+    # not every pool implementation (e.g. StaticPool) reports every gauge
+    reader = getattr(pool, name, None)
+
+    return reader() if reader is not None else None
+
+
+# controller whose slot the current request holds, set by `admit_request`
+_request_admission: ContextVar[Optional["AdmissionController"]] = ContextVar(
+    "request_admission", default=None
+)
+
+# how long a queued request sleeps between attempts to take a slot
+_POLL_INTERVAL = 0.005
+
+
+class AdmissionController:
+    """
+    Bounds concurrent database sessions to the pool capacity.
+
+    Callers beyond the limit queue for at most `timeout` seconds and are then shed
+    with `PoolSaturatedError`, so a saturated pool surfaces as a fast, explicit
+    failure instead of a long pool checkout timeout.
+
+    HTTP requests take their slot once, on the event loop, with `admit_request`;
+    sessions opened while serving the request then run under that slot instead of
+    queueing again.
+    """
+
+    def __init__(self, limit: int, timeout: float) -> None:
+        """
+        Initialize the admission controller.
+
+        Arguments:
+            limit: maximum concurrent sessions, normally pool size plus overflow
+            timeout: seconds a caller may queue before being shed
+        """
+        self.limit = limit
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.queued = 0
+        self.admitted = 0
+        self.shed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """
+        Hold an admission slot for the duration of the block.
+
+        Inside a request admitted with `admit_request` the request's slot is used.
+
+        Raises:
+            PoolSaturatedError: if no slot frees up within the timeout
+        """
+        if _request_admission.get() is self:
+            yield
+            return
+
+        started = time.perf_counter()
+        self._queue()
+        self._admitted(self._slots.acquire(timeout=self.timeout), started)
+
+        try:
+            yield
+        finally:
+            self._release()
+
+    @asynccontextmanager
+    async def admit_request(self) -> AsyncIterator[None]:
+        """
+        Hold an admission slot for an HTTP request, waiting without blocking the
+        event loop.
+
+        Raises:
+            PoolSaturatedError: if no slot frees up within the timeout
+        """
+        started = time.perf_counter()
+        deadline = started + self.timeout
+        self._queue()
+
+        try:
+            acquired = self._slots.acquire(blocking=False)
+
+            while not acquired and time.perf_counter() < deadline:
+                await asyncio.sleep(_POLL_INTERVAL)
+                acquired = self._slots.acquire(blocking=False)
+        except BaseException:
+            # cancelled while queued
+            with self._lock:
+                self.queued -= 1
+            raise
+
+        self._admitted(acquired, started)
+        token = _request_admission.set(self)
+
+        try:
+            yield
+        finally:
+            _request_admission.reset(token)
+            self._release()
+
+    def _queue(self) -> None:
+        with self._lock:
+            self.queued += 1
+
+    def _admitted(self, acquired: bool, started: float) -> None:
+        waited = time.perf_counter() - started
+
+        with self._lock:
+            self.queued -= 1
+
+            if not acquired:
+                self.shed += 1
+            else:
+                self.in_flight += 1
+                self.admitted += 1
+                self.total_wait += waited
+                self.max_wait = max(self.max_wait, waited)
+
+        if not acquired:
+            raise PoolSaturatedError(
+                f"Database pool saturated: no connection within {self.timeout}s"
+            )
+
+    def _release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+        self._slots.release()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Read the current admission gauges.
+
+        Returns:
+            limit, in-flight and queued sessions, counters and wait times in seconds
+        """
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "admitted": self.admitted,
+                "shed": self.shed,
+                "average_wait": self.total_wait / self.admitted if self.admitted else 0.0,
+                "max_wait": self.max_wait,
+            }
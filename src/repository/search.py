@@ -0,0 +1,310 @@
+import re
+from functools import lru_cache
+from typing import Any, FrozenSet, List, Optional, Sequence
+
+from sqlalchemy import (
+    case,
+    func,
+    literal,
+    or_,
+    select,
+    union_all,
+    Boolean,
+    Float,
+    String,
+)
+
+from src.models.search import EntityKind, SearchHit, SearchResults
+from src.repository.base import get_engine, get_session, parse_id
+from src.repository.device import DeviceRepo
+from src.repository.dwelling import DwellingRepo
+from src.repository.hub import HubRepo
+
+# pg_trgm's default `%` threshold; names this similar to the query match even
+# without a prefix hit
+SIMILARITY_THRESHOLD = 0.3
+
+# candidates per entity kind and match type (exact or prefix, fuzzy) taken before
+# ranking, so a query matching most of the fleet does not rank all of it
+MAX_CANDIDATES = 1000
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+def normalize_name(name: str) -> str:
+    """
+    Normalize a name or query for matching: lower case, single spaces.
+    """
+    return " ".join(name.lower().split())
+
+
+def words(text: str) -> List[str]:
+    """
+    Lower-cased alphanumeric words of a text, the units pg_trgm extracts trigrams
+    from.
+    """
+    return _WORD.findall(text.lower())
+
+
+@lru_cache(maxsize=65536)
+def word_trigrams(word: str) -> FrozenSet[str]:
+    """
+    Trigrams of a single lower-cased word, padded with two spaces in front and one
+    behind as pg_trgm does.
+    """
+    padded = f"  {word} "
+
+    return frozenset(padded[i : i + 3] for i in range(len(padded) - 2))
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """
+    Trigrams of a text as pg_trgm extracts them.
+    """
+    return frozenset().union(*map(word_trigrams, words(text)))
+
+
+def similarity(left: FrozenSet[str], right: FrozenSet[str]) -> float:
+    """
+    Trigram similarity (shared over distinct trigrams), as pg_trgm's `similarity`.
+    """
+    if not left or not right:
+        return 0.0
+
+    shared = len(left & right)
+
+    return shared / (len(left) + len(right) - shared)
+
+
+def match_tier(name: str, query: str) -> int:
+    """
+    Rank class of a normalized name for a normalized query.
+
+    Returns:
+        3 for an exact match, 2 if the name starts with the query, 1 if a later
+        word starts with it, 0 otherwise
+    """
+    if name == query:
+        return 3
+
+    if name.startswith(query):
+        return 2
+
+    if f" {query}" in name:
+        return 1
+
+    return 0
+
+
+class NameSearch:
+    """
+    Ranked, paginated name search over dwellings, hubs and devices in the database.
+
+    On PostgreSQL, prefix and word-prefix matches use ILIKE and fuzzy matches use
+    pg_trgm's `%` operator, all served by the trigram GiST indexes on the name
+    columns. Each kind contributes at most `MAX_CANDIDATES` (or enough for the
+    requested page) exact and prefix matches, the best ranked, and as many fuzzy
+    matches, the nearest by trigram distance `<->`, which the GiST index returns in
+    order without visiting the other matches. Fetching them separately keeps close
+    fuzzy matches from crowding out exact and prefix hits, which always rank above
+    them. The candidates are then scored by match tier plus trigram similarity. If
+    either cap is reached the results are marked truncated and `total` counts
+    candidates rather than every match. Other databases only match prefixes and
+    rank by tier, then name.
+    """
+
+    def search(
+        self,
+        query: str,
+        kinds: Sequence[EntityKind],
+        dwelling_id: Optional[str] = None,
+        hub_id: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> SearchResults:
+        """
+        Search entity names.
+
+        Arguments:
+            query: text to search for
+            kinds: kinds of entities to search
+            dwelling_id: optional Dwelling restricting hits to itself, its Hubs and
+                their Devices
+            hub_id: optional Hub restricting hits to itself, its Dwelling and its
+                Devices
+            limit: maximum number of hits to return
+            offset: number of best hits to skip
+
+        Returns:
+            page of hits, best match first
+        """
+        results = SearchResults(offset=offset, limit=limit)
+        query = normalize_name(query)
+
+        if (dwelling_id is not None and parse_id(dwelling_id) is None) or (
+            hub_id is not None and parse_id(hub_id) is None
+        ):
+            return results
+
+        dwelling_id = dwelling_id and parse_id(dwelling_id)
+        hub_id = hub_id and parse_id(hub_id)
+
+        fuzzy = get_engine().dialect.name == "postgresql"
+        candidates = max(MAX_CANDIDATES, offset + limit)
+        matches = union_all(
+            *(
+                statement
+                for kind in kinds
+                for statement in self._matches(
+                    kind, query, dwelling_id, hub_id, fuzzy, candidates
+                )
+            )
+        ).subquery()
+        # rows each capped query returned, to tell whether any reached its cap
+        counted = select(
+            matches,
+            func.count()
+            .over(partition_by=(matches.c.kind, matches.c.fuzzy))
+            .label("fetched"),
+        ).subquery()
+        ordering = (
+            counted.c.score.desc(),
+            func.lower(counted.c.name),
+            counted.c.id,
+        )
+
+        with get_session() as session:
+            rows = session.execute(
+                select(
+                    counted.c.kind,
+                    counted.c.id,
+                    counted.c.name,
+                    counted.c.score,
+                    func.count().over().label("total"),
+                    func.max(counted.c.fetched).over().label("fetched"),
+                )
+                .order_by(*ordering)
+                .limit(limit)
+                .offset(offset)
+            ).all()
+
+            if rows:
+                results.total = rows[0].total
+                results.truncated = rows[0].fetched >= candidates
+            elif offset:
+                # paged past the end; the window counts came back with no rows
+                total, fetched = session.execute(
+                    select(func.count(), func.max(counted.c.fetched))
+                ).one()
+                results.total = total
+                results.truncated = (fetched or 0) >= candidates
+
+        results.hits = [
+            SearchHit(
+                kind=EntityKind(row.kind), id=row.id, name=row.name, score=row.score
+            )
+            for row in rows
+        ]
+
+        return results
+
+    def _matches(
+        self,
+        kind: EntityKind,
+        query: str,
+        dwelling_id: Optional[str],
+        hub_id: Optional[str],
+        fuzzy: bool,
+        candidates: int,
+    ) -> List[Any]:
+        table = _TABLES[kind]
+        name = table.c.name
+        escaped = re.sub(r"([\\%_])", r"\\\1", query)
+        prefix = name.ilike(f"{escaped}%", escape="\\")
+        word_prefix = name.ilike(f"% {escaped}%", escape="\\")
+        tier = case(
+            (func.lower(name) == query, 3),
+            (prefix, 2),
+            (word_prefix, 1),
+            else_=0,
+        )
+
+        score = (tier + func.similarity(name, query)) if fuzzy else tier
+        scopes = _scopes(kind, dwelling_id, hub_id)
+
+        def capped(condition: Any, ordering: Sequence[Any], is_fuzzy: bool) -> Any:
+            statement = (
+                select(
+                    literal(kind.value, String).label("kind"),
+                    table.c.id,
+                    name,
+                    score.cast(Float).label("score"),
+                    literal(is_fuzzy, Boolean).label("fuzzy"),
+                )
+                .where(condition, *scopes)
+                .order_by(*ordering)
+                .limit(candidates)
+                .subquery()
+            )
+
+            # wrapped so the limited query can be a member of a UNION on any database
+            return select(statement)
+
+        prefixed = or_(prefix, word_prefix)
+        statements = [
+            capped(prefixed, (score.desc(), func.lower(name), table.c.id), False)
+        ]
+
+        if fuzzy:
+            statements.append(
+                capped(
+                    ~prefixed & name.op("%")(query),
+                    (name.op("<->")(query),),
+                    True,
+                )
+            )
+
+        return statements
+
+
+_TABLES = {
+    EntityKind.DWELLING: DwellingRepo.__table__,
+    EntityKind.HUB: HubRepo.__table__,
+    EntityKind.DEVICE: DeviceRepo.__table__,
+}
+
+
+def _scopes(
+    kind: EntityKind, dwelling_id: Optional[str], hub_id: Optional[str]
+) -> List[Any]:
+    dwellings, hubs, devices = (
+        _TABLES[EntityKind.DWELLING],
+        _TABLES[EntityKind.HUB],
+        _TABLES[EntityKind.DEVICE],
+    )
+    scopes = []
+
+    if dwelling_id is not None:
+        scopes.append(
+            {
+                EntityKind.DWELLING: dwellings.c.id == dwelling_id,
+                EntityKind.HUB: hubs.c.dwelling_id == dwelling_id,
+                EntityKind.DEVICE: devices.c.paired_hub_id.in_(
+                    select(hubs.c.id).where(hubs.c.dwelling_id == dwelling_id)
+                ),
+            }[kind]
+        )
+
+    if hub_id is not None:
+        scopes.append(
+            {
+                EntityKind.DWELLING: dwellings.c.id
+                == select(hubs.c.dwelling_id)
+                .where(hubs.c.id == hub_id)
+                .scalar_subquery(),
+                EntityKind.HUB: hubs.c.id == hub_id,
+                EntityKind.DEVICE: devices.c.paired_hub_id == hub_id,
+            }[kind]
+        )
+
+    return scopes
@@ -0,0 +1,73 @@
+import threading
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.engine.default import CACHE_HIT, CACHE_MISS
+
+
+class StatementCacheMetrics:
+    """
+    Compiled statement cache counters collected from cursor executions.
+
+    Every statement SQLAlchemy compiles is looked up in the engine's compiled cache
+    first; the execution context records whether that lookup hit. Statements that
+    bypass the cache (raw driver SQL, DDL) count as uncached.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+    def attach(self, engine: Engine) -> None:
+        """
+        Start counting cache lookups of the engine's executions.
+
+        Arguments:
+            engine: engine whose executions to observe
+        """
+        event.listen(engine, "after_cursor_execute", self._on_execute)
+
+    def _on_execute(
+        self,
+        conn: Any,
+        cursor: Any,
+        statement: str,
+        parameters: Any,
+        context: Any,
+        executemany: bool,
+    ) -> None:
+        cache_hit = getattr(context, "cache_hit", None)
+
+        with self._lock:
+            if cache_hit is CACHE_HIT:
+                self.hits += 1
+            elif cache_hit is CACHE_MISS:
+                self.misses += 1
+            else:
+                self.uncached += 1
+
+    def snapshot(self, engine: Optional[Engine]) -> Dict[str, Any]:
+        """
+        Read the current cache counters.
+
+        Arguments:
+            engine: engine whose compiled cache to size, None if not created yet
+
+        Returns:
+            hits, misses, uncached executions, hit rate over cacheable executions,
+            and the number of cached statements against the cache capacity
+        """
+        cache = getattr(engine, "_compiled_cache", None)
+        lookups = self.hits + self.misses
+
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncached": self.uncached,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "entries": len(cache) if cache is not None else None,
+            "capacity": getattr(cache, "capacity", None),
+        }
@@ -0,0 +1,286 @@
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+
+from src.models.device import Device
+from src.models.dwelling import Dwelling
+from src.models.hub import Hub
+from src.repository.base import DB
+
+# record kinds in dependency order: every reference points at an earlier kind
+KINDS: Dict[str, Type[BaseModel]] = {
+    "dwelling": Dwelling,
+    "hub": Hub,
+    "device": Device,
+}
+KIND_ORDER = {kind: rank for rank, kind in enumerate(KINDS)}
+
+# kind -> (field referencing another entity, kind it references)
+REFERENCES: Dict[str, Tuple[str, str]] = {
+    "hub": ("dwelling_id", "dwelling"),
+    "device": ("paired_hub_id", "hub"),
+}
+
+
+class FileCheckpoint:
+    """
+    Persists the number of input lines durably imported, so an import can resume.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def load(self) -> int:
+        """
+        Read the checkpoint.
+
+        Returns:
+            number of lines already imported, 0 if there is no checkpoint
+        """
+        try:
+            with open(self.path) as file:
+                return json.load(file)["lines"]
+        except FileNotFoundError:
+            return 0
+
+    def save(self, lines: int) -> None:
+        """
+        Atomically record the number of lines imported.
+
+        Arguments:
+            lines: number of lines imported
+        """
+        temporary = f"{self.path}.tmp"
+
+        with open(temporary, "w") as file:
+            json.dump({"lines": lines}, file)
+
+        os.replace(temporary, self.path)
+
+
+@dataclass
+class ImportReport:
+    """
+    Outcome of an import.
+    """
+
+    lines: int = 0
+    resumed_from: int = 0
+    created: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(KINDS, 0))
+    skipped: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(KINDS, 0))
+
+
+class FleetImporter:
+    """
+    Incremental NDJSON importer holding at most one batch in memory.
+
+    Lines are fed one at a time; records are buffered per kind and written with one
+    batched insert per `batch_size` records, after which the checkpoint advances.
+    Records must come in dependency order (dwellings, hubs, devices), which is the
+    order `BulkService.export` writes. Before a batch is written, the Dwellings and
+    Hubs it references are looked up in one query, so a dangling reference is
+    reported with its line instead of failing the insert.
+    """
+
+    def __init__(
+        self,
+        stores: Dict[str, DB],
+        batch_size: int,
+        checkpoint: Optional[FileCheckpoint] = None,
+    ) -> None:
+        self._stores = stores
+        self._batch_size = batch_size
+        self._checkpoint = checkpoint
+        self._batch: List[BaseModel] = []
+        self._batch_lines: List[int] = []
+        self._batch_kind: Optional[str] = None
+        self._rank = 0
+        self._line = 0
+        self._batch_end = 0
+        self.report = ImportReport()
+        self.report.resumed_from = checkpoint.load() if checkpoint else 0
+
+    def feed(self, line: str) -> None:
+        """
+        Import one NDJSON line.
+
+        Arguments:
+            line: JSON object with a `kind` field and the entity's fields
+
+        Raises:
+            ValueError: if the record is malformed, out of dependency order, or
+                references a missing entity
+        """
+        self._line += 1
+
+        if self._line <= self.report.resumed_from or not line.strip():
+            return
+
+        record = json.loads(line)
+        kind = record.pop("kind", None)
+
+        if kind not in KINDS:
+            raise ValueError(f"Line {self._line}: unknown record kind {kind}")
+
+        if KIND_ORDER[kind] < self._rank:
+            raise ValueError(
+                f"Line {self._line}: {kind} record after {list(KINDS)[self._rank]} "
+                "records; records must be in dependency order"
+            )
+
+        if kind != self._batch_kind:
+            self._flush()
+            self._batch_kind = kind
+            self._rank = KIND_ORDER[kind]
+
+        self._batch.append(KINDS[kind].model_validate(record))
+        self._batch_lines.append(self._line)
+        self._batch_end = self._line
+
+        if len(self._batch) >= self._batch_size:
+            self._flush()
+
+    def finish(self) -> ImportReport:
+        """
+        Write the last partial batch.
+
+        Returns:
+            import report
+
+        Raises:
+            ValueError: if a record of the last batch references a missing entity
+        """
+        self._flush()
+        self.report.lines = self._line
+
+        return self.report
+
+    def _flush(self) -> None:
+        if not self._batch:
+            return
+
+        self._check_references()
+
+        try:
+            inserted = self._stores[self._batch_kind].create_many(self._batch)
+        except ValueError as e:
+            # e.g. a referenced entity deleted since the check
+            raise ValueError(
+                f"Lines {self._batch_lines[0]}-{self._batch_lines[-1]}: {e}"
+            )
+
+        self.report.created[self._batch_kind] += inserted
+        self.report.skipped[self._batch_kind] += len(self._batch) - inserted
+        self._batch = []
+        self._batch_lines = []
+
+        if self._checkpoint is not None:
+            self._checkpoint.save(self._batch_end)
+
+    def _check_references(self) -> None:
+        if self._batch_kind not in REFERENCES:
+            return
+
+        field, kind = REFERENCES[self._batch_kind]
+        referenced = {
+            getattr(item, field)
+            for item in self._batch
+            if getattr(item, field) is not None
+        }
+        found = {item.id for item in self._stores[kind].get_many(list(referenced))}
+
+        for line, item in zip(self._batch_lines, self._batch):
+            reference = getattr(item, field)
+
+            if reference is not None and reference not in found:
+                raise ValueError(
+                    f"Line {line}: {self._batch_kind} {item.id} references missing "
+                    f"{kind} {reference}"
+                )
+
+
+class BulkService:
+    """
+    Service for streaming fleets in and out as NDJSON.
+    """
+
+    def __init__(
+        self,
+        dwelling_store: DB[Dwelling],
+        hub_store: DB[Hub],
+        device_store: DB[Device],
+        batch_size: int = 5000,
+    ) -> None:
+        """
+        Initialize the Bulk service.
+
+        Arguments:
+            dwelling_store: storage for Dwelling entities
+            hub_store: storage for Hub entities
+            device_store: storage for Device entities
+            batch_size: records per batched insert and per export fetch
+        """
+        self._stores = {
+            "dwelling": dwelling_store,
+            "hub": hub_store,
+            "device": device_store,
+        }
+        self._batch_size = batch_size
+
+    def export(self) -> Iterator[str]:
+        """
+        Stream every Dwelling, Hub and Device as NDJSON in dependency order.
+
+        Pairings and installations are carried by the entities' reference fields
+        (`paired_hub_id`, `dwelling_id` and the matching id lists). Entities are read
+        a page at a time, each page in its own session, so a slow client does not
+        hold a database connection for the whole export.
+
+        Returns:
+            iterator over newline-terminated JSON lines
+        """
+        for kind, store in self._stores.items():
+            for page in store.pages(self._batch_size):
+                for item in page:
+                    line = json.dumps({"kind": kind, **item.model_dump(mode="json")})
+                    yield line + "\n"
+
+    def importer(self, checkpoint: Optional[FileCheckpoint] = None) -> FleetImporter:
+        """
+        Start an incremental import.
+
+        Arguments:
+            checkpoint: optional checkpoint to resume from and advance
+
+        Returns:
+            importer to feed NDJSON lines to
+        """
+        return FleetImporter(self._stores, self._batch_size, checkpoint)
+
+    def import_lines(
+        self, lines: Iterable[str], checkpoint: Optional[FileCheckpoint] = None
+    ) -> ImportReport:
+        """
+        Import NDJSON lines.
+
+        Already existing ids are skipped, so replaying an import is safe.
+
+        Arguments:
+            lines: NDJSON lines in dependency order
+            checkpoint: optional checkpoint to resume from and advance
+
+        Returns:
+            import report
+
+        Raises:
+            ValueError: if a record is malformed or out of dependency order
+        """
+        importer = self.importer(checkpoint)
+
+        for line in lines:
+            importer.feed(line)
+
+        return importer.finish()
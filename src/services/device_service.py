@@ -1,8 +1,25 @@
-from typing import List, Optional
-from uuid import uuid4
+from contextlib import nullcontext
+from threading import Lock
+from typing import ContextManager, Dict, List, Optional, Sequence, Tuple
 
-from src.models.device import Device, DeviceState, DeviceType
+from src.models.device import (
+    Device,
+    DeviceState,
+    DeviceType,
+    StateWrite,
+    StateWrites,
+)
 from src.repository.base import DB
+from src.repository.idempotency import IdempotencyKey
+from src.services.ids import IdGenerator, uuid7
+from src.services.rate_limit import (
+    Priority,
+    RateLimiter,
+    RateLimitExceeded,
+    priority_for,
+)
+from src.services.rollups import StatusRollups
+from src.services.topology_cache import TopologyCache
 
 
 class DeviceService:
@@ -10,17 +27,40 @@ class DeviceService:
     Service for managing IoT Devices and their states.
     """
 
-    def __init__(self, device_store: DB[Device]) -> None:
+    def __init__(
+        self,
+        device_store: DB[Device],
+        id_generator: IdGenerator = uuid7,
+        rate_limiter: Optional[RateLimiter] = None,
+        topology_cache: Optional[TopologyCache] = None,
+        rollups: Optional[StatusRollups] = None,
+    ) -> None:
         """
         Initialize the Device service.
 
         Arguments:
             device_store: storage for Device entities
+            id_generator: generator for new Device identifiers
+            rate_limiter: optional limiter for state writes through paired hubs
+            topology_cache: optional cache of Dwelling trees to invalidate on state
+                changes
+            rollups: optional hub and dwelling status rollups to keep current
         """
         self._store = device_store
+        self._id_generator = id_generator
+        self._rate_limiter = rate_limiter
+        self._topology_cache = topology_cache
+        self._rollups = rollups
+        self._coalesced: Dict[str, DeviceState] = {}
+        self._coalesced_lock = Lock()
 
     def create_device(
-        self, name: str, device_type: DeviceType, initial_state: DeviceState
+        self,
+        name: str,
+        device_type: DeviceType,
+        initial_state: DeviceState,
+        idempotency_key: Optional[str] = None,
+        client_id: Optional[str] = None,
     ) -> Device:
         """
         Create a new Device.
@@ -29,17 +69,34 @@ class DeviceService:
             name: name of the Device
             device_type: type of device (switch, dimmer, etc.)
             initial_state: initial state configuration for the Device
+            idempotency_key: optional client-supplied key; retries with the same key
+                and payload return the originally created Device
+            client_id: identifier of the calling client, scoping its idempotency keys
 
         Returns:
             newly created Device
+
+        Raises:
+            IdempotencyConflict: if the key was used with a different payload
         """
         device = Device(
-            id=str(uuid4()),
+            id=self._id_generator(),
             name=name,
             type=device_type,
             state=initial_state,
         )
-        return self._store.create(device.id, device)
+        key = (
+            IdempotencyKey.for_payload(
+                "device",
+                client_id,
+                idempotency_key,
+                device.model_dump(mode="json", exclude={"id"}),
+            )
+            if idempotency_key
+            else None
+        )
+
+        return self._store.create(device.id, device, idempotency_key=key)
 
     def delete_device(self, device_id: str) -> None:
         """
@@ -77,6 +134,11 @@ class DeviceService:
         """
         Update a Device's state.
 
+        If a rate limiter is configured and the Device's hub or dwelling is over its
+        limit, telemetry writes are coalesced (only the latest state per Device is
+        kept and written by `flush_coalesced`) and other writes are rejected. Use
+        `write_device_state` to tell a coalesced write from a written one.
+
         Arguments:
             device_id: identifier of the Device to update
             new_state: new state configuration for the Device
@@ -86,6 +148,36 @@ class DeviceService:
 
         Raises:
             ValueError: if Device not found
+            RateLimitExceeded: if the write is over the rate limit and cannot be
+                coalesced
+        """
+        written = self.write_device_state(device_id, new_state)
+
+        if written.coalesced:
+            return written.device.model_copy(update={"state": new_state})
+
+        return written.device
+
+    def write_device_state(
+        self, device_id: str, new_state: DeviceState
+    ) -> StateWrite:
+        """
+        Update a Device's state, reporting whether the write was coalesced.
+
+        Rate limits apply as in `modify_device_state`.
+
+        Arguments:
+            device_id: identifier of the Device to update
+            new_state: new state configuration for the Device
+
+        Returns:
+            the updated Device, or the stored Device flagged as coalesced if the new
+            state was queued instead of written
+
+        Raises:
+            ValueError: if Device not found
+            RateLimitExceeded: if the write is over the rate limit and cannot be
+                coalesced
         """
         device = self._store.get(device_id)
 
@@ -95,9 +187,162 @@ class DeviceService:
         if not isinstance(new_state, type(device.state)):
             raise ValueError(f"Cannot apply {new_state} to device type of {device.type}")
 
+        if self._coalesce(device, new_state):
+            return StateWrite(device=device, coalesced=True)
+
+        old_state = device.state
         device.state = new_state
 
-        return self._store.update(device_id, device)
+        with self._writing(device.paired_hub_id):
+            device = self._store.update(device_id, device)
+            self._state_written(device, old_state)
+
+        return StateWrite(device=device)
+
+    def modify_device_states(
+        self, changes: Sequence[Tuple[str, DeviceState]]
+    ) -> StateWrites:
+        """
+        Update the states of a batch of Devices.
+
+        The Devices are read with one `get_many` and the admitted states written with
+        one `update_many`, instead of a read and a write per Device. Rate limits apply
+        per Device as in `modify_device_state`.
+
+        Arguments:
+            changes: (Device id, new state) pairs, at most one per Device
+
+        Returns:
+            written Devices, and the ids of Devices whose state was coalesced,
+            rejected by the rate limiter, or could not be applied (Device not found
+            or state of another type)
+        """
+        result = StateWrites()
+        ids = [device_id for device_id, _ in changes]
+        devices = {device.id: device for device in self._store.get_many(ids)}
+        old_states: Dict[str, DeviceState] = {}
+        pending: List[Device] = []
+
+        for device_id, new_state in changes:
+            device = devices.get(device_id)
+
+            if device is None or not isinstance(new_state, type(device.state)):
+                result.failed.append(device_id)
+                continue
+
+            try:
+                if self._coalesce(device, new_state):
+                    result.coalesced.append(device_id)
+                    continue
+            except RateLimitExceeded:
+                result.rejected.append(device_id)
+                continue
+
+            old_states[device_id] = device.state
+            pending.append(device.model_copy(update={"state": new_state}))
+
+        with self._writing(*{device.paired_hub_id for device in pending}):
+            for device in self._store.update_many(pending):
+                self._state_written(device, old_states.pop(device.id))
+                result.written.append(device)
+
+        # deleted between the read and the write
+        result.failed.extend(old_states)
+
+        return result
+
+    def _coalesce(self, device: Device, new_state: DeviceState) -> bool:
+        """
+        Apply the rate limits to a state write.
+
+        Returns:
+            True if the write is over the limit and was queued for `flush_coalesced`,
+            False if it may be written now
+
+        Raises:
+            RateLimitExceeded: if the write is over the limit and cannot be coalesced
+        """
+        if self._rate_limiter is not None and device.paired_hub_id:
+            priority = priority_for(device.type)
+            retry_after = self._rate_limiter.try_acquire(device.paired_hub_id, priority)
+
+            if retry_after is not None:
+                if priority != Priority.TELEMETRY:
+                    raise RateLimitExceeded(
+                        f"Hub {device.paired_hub_id} is over its write rate limit",
+                        retry_after,
+                    )
+
+                with self._coalesced_lock:
+                    self._coalesced[device.id] = new_state
+
+                return True
+
+        # a direct write supersedes any coalesced state for the device
+        with self._coalesced_lock:
+            self._coalesced.pop(device.id, None)
+
+        return False
+
+    def _writing(self, *hub_ids: Optional[str]) -> ContextManager:
+        if self._rollups is None:
+            return nullcontext()
+
+        return self._rollups.writing(*hub_ids)
+
+    def _state_written(self, device: Device, old_state: DeviceState) -> None:
+        if self._topology_cache is not None:
+            self._topology_cache.invalidate_device(device.id)
+
+        if self._rollups is not None and device.paired_hub_id:
+            self._rollups.state_changed(device.paired_hub_id, old_state, device.state)
+
+    def flush_coalesced(self) -> int:
+        """
+        Write coalesced telemetry states for which the rate limits have capacity again.
+
+        States still over the limit stay queued for the next flush.
+
+        Returns:
+            number of Device states written
+        """
+        with self._coalesced_lock:
+            pending = list(self._coalesced.items())
+
+        flushed = 0
+
+        for device_id, state in pending:
+            device = self._store.get(device_id)
+
+            if device is None or not device.paired_hub_id:
+                with self._coalesced_lock:
+                    self._coalesced.pop(device_id, None)
+                continue
+
+            retry_after = self._rate_limiter.try_acquire(
+                device.paired_hub_id, Priority.TELEMETRY
+            )
+
+            if retry_after is not None:
+                continue
+
+            with self._coalesced_lock:
+                # skip if superseded by a newer write while flushing
+                if self._coalesced.get(device_id) is not state:
+                    continue
+
+                del self._coalesced[device_id]
+
+            old_state = device.state
+            device.state = state
+
+            with self._writing(device.paired_hub_id):
+                self._store.update(device_id, device)
+                self._state_written(device, old_state)
+
+            flushed += 1
+
+        return flushed
 
     def list_devices(self) -> List[Device]:
         """
@@ -1,9 +1,14 @@
-from typing import List
-from uuid import uuid4
+from typing import List, Optional
 
-from src.models.dwelling import Dwelling
+from src.models.dwelling import Dwelling, DwellingTree
 from src.models.hub import Hub
+from src.models.rollup import StatusRollup
 from src.repository.base import DB
+from src.repository.idempotency import IdempotencyKey
+from src.repository.dwelling import DwellingTreeLoader
+from src.services.ids import IdGenerator, uuid7
+from src.services.rollups import StatusRollups
+from src.services.topology_cache import TopologyCache
 
 
 class DwellingService:
@@ -12,7 +17,13 @@ class DwellingService:
     """
 
     def __init__(
-        self, dwelling_store: DB[Dwelling], hub_store: DB[Hub]
+        self,
+        dwelling_store: DB[Dwelling],
+        hub_store: DB[Hub],
+        id_generator: IdGenerator = uuid7,
+        tree_loader: Optional[DwellingTreeLoader] = None,
+        topology_cache: Optional[TopologyCache] = None,
+        rollups: Optional[StatusRollups] = None,
     ) -> None:
         """
         Initialize the Dwelling service.
@@ -20,22 +31,56 @@ class DwellingService:
         Arguments:
             dwelling_store: storage for Dwelling entities.
             hub_store: storage for Hub entities.
+            id_generator: generator for new Dwelling identifiers.
+            tree_loader: loader for Dwelling trees (Dwelling, Hubs and Devices).
+            topology_cache: optional cache of Dwelling trees shared with the other
+                services.
+            rollups: optional hub and dwelling status rollups to keep current.
         """
         self._dwelling_store = dwelling_store
         self._hub_store = hub_store
-
-    def create_dwelling(self, name: str) -> Dwelling:
+        self._id_generator = id_generator
+        self._tree_loader = tree_loader
+        self._topology_cache = topology_cache
+        self._rollups = rollups
+
+    def create_dwelling(
+        self,
+        name: str,
+        idempotency_key: Optional[str] = None,
+        client_id: Optional[str] = None,
+    ) -> Dwelling:
         """
         Create a new Dwelling.
 
         Arguments:
             name: name of the Dwelling
+            idempotency_key: optional client-supplied key; retries with the same key
+                and payload return the originally created Dwelling
+            client_id: identifier of the calling client, scoping its idempotency keys
 
         Returns:
             newly created Dwelling
+
+        Raises:
+            IdempotencyConflict: if the key was used with a different payload
         """
-        dwelling = Dwelling(id=str(uuid4()), name=name)
-        return self._dwelling_store.create(dwelling.id, dwelling)
+        dwelling = Dwelling(
+            id=self._id_generator(),
+            name=name,
+        )
+        key = (
+            IdempotencyKey.for_payload(
+                "dwelling",
+                client_id,
+                idempotency_key,
+                dwelling.model_dump(exclude={"id"}),
+            )
+            if idempotency_key
+            else None
+        )
+
+        return self._dwelling_store.create(dwelling.id, dwelling, idempotency_key=key)
 
     def set_occupied_status(self, dwelling_id: str, is_occupied: bool) -> Dwelling:
         """
@@ -57,8 +102,12 @@ class DwellingService:
             raise ValueError(f"Dwelling {dwelling_id} not found")
 
         dwelling.is_occupied = is_occupied
+        dwelling = self._dwelling_store.update(dwelling_id, dwelling)
 
-        return self._dwelling_store.update(dwelling_id, dwelling)
+        if self._topology_cache is not None:
+            self._topology_cache.invalidate_dwelling(dwelling_id)
+
+        return dwelling
 
     def install_hub(self, dwelling_id: str, hub_id: str) -> Dwelling:
         """
@@ -92,8 +141,73 @@ class DwellingService:
         hub.dwelling_id = dwelling_id
 
         self._hub_store.update(hub_id, hub)
+        dwelling = self._dwelling_store.update(dwelling_id, dwelling)
+
+        if self._topology_cache is not None:
+            self._topology_cache.invalidate_dwelling(dwelling_id)
+
+        if self._rollups is not None:
+            self._rollups.hub_installed(dwelling_id, hub_id)
+
+        return dwelling
+
+    def get_dwelling_tree(self, dwelling_id: str) -> DwellingTree:
+        """
+        Get a Dwelling with its installed Hubs and their paired Devices.
+
+        The tree is loaded in one query and cached until a pairing, installation or
+        Device state change touches the Dwelling.
+
+        Arguments:
+            dwelling_id: identifier of the Dwelling
+
+        Returns:
+            Dwelling tree
+
+        Raises:
+            ValueError: if Dwelling not found, or no tree loader is configured
+        """
+        if self._tree_loader is None:
+            raise ValueError("Dwelling trees are not available without a tree loader")
+
+        generation = None
+
+        if self._topology_cache is not None:
+            tree = self._topology_cache.get(dwelling_id)
+
+            if tree is not None:
+                return tree
+
+            # taken before loading, so a write racing the load keeps its tree out
+            generation = self._topology_cache.generation()
+
+        tree = self._tree_loader.load(dwelling_id)
+
+        if not tree:
+            raise ValueError(f"Dwelling {dwelling_id} not found")
+
+        if self._topology_cache is not None:
+            self._topology_cache.put(tree, generation)
+
+        return tree
+
+    def get_dwelling_status(self, dwelling_id: str) -> StatusRollup:
+        """
+        Get the status rollup of all Devices in a Dwelling in constant time.
+
+        Arguments:
+            dwelling_id: identifier of the Dwelling
+
+        Returns:
+            status rollup, empty for unknown Dwellings
+
+        Raises:
+            ValueError: if no rollups are configured
+        """
+        if self._rollups is None:
+            raise ValueError("Status rollups are not configured")
 
-        return self._dwelling_store.update(dwelling_id, dwelling)
+        return self._rollups.get_dwelling(dwelling_id)
 
     def list_dwellings(self) -> List[Dwelling]:
         """
@@ -1,9 +1,14 @@
-from typing import List
-from uuid import uuid4
+from contextlib import nullcontext
+from typing import ContextManager, List, Optional
 
 from src.models.device import Device
 from src.models.hub import Hub
+from src.models.rollup import StatusRollup
 from src.repository.base import DB
+from src.repository.idempotency import IdempotencyKey
+from src.services.ids import IdGenerator, uuid7
+from src.services.rollups import StatusRollups
+from src.services.topology_cache import TopologyCache
 
 
 class HubService:
@@ -12,7 +17,12 @@ class HubService:
     """
 
     def __init__(
-        self, hub_store: DB[Hub], device_store: DB[Device]
+        self,
+        hub_store: DB[Hub],
+        device_store: DB[Device],
+        id_generator: IdGenerator = uuid7,
+        topology_cache: Optional[TopologyCache] = None,
+        rollups: Optional[StatusRollups] = None,
     ) -> None:
         """
         Initialize the Hub service.
@@ -20,23 +30,51 @@ class HubService:
         Arguments:
             hub_store: storage for Hub entities
             device_store: storage for Device entities
+            id_generator: generator for new Hub identifiers
+            topology_cache: optional cache of Dwelling trees to invalidate on
+                pairing changes
+            rollups: optional hub and dwelling status rollups to keep current
         """
         self._hub_store = hub_store
         self._device_store = device_store
-
-    def create_hub(self, name: str) -> Hub:
+        self._id_generator = id_generator
+        self._topology_cache = topology_cache
+        self._rollups = rollups
+
+    def create_hub(
+        self,
+        name: str,
+        idempotency_key: Optional[str] = None,
+        client_id: Optional[str] = None,
+    ) -> Hub:
         """
         Create a new Hub.
 
         Arguments:
             name: name of the Hub to create
+            idempotency_key: optional client-supplied key; retries with the same key
+                and payload return the originally created Hub
+            client_id: identifier of the calling client, scoping its idempotency keys
 
         Returns:
             newly created Hub
+
+        Raises:
+            IdempotencyConflict: if the key was used with a different payload
         """
-        hub = Hub(id=str(uuid4()), name=name)
+        hub = Hub(
+            id=self._id_generator(),
+            name=name,
+        )
+        key = (
+            IdempotencyKey.for_payload(
+                "hub", client_id, idempotency_key, hub.model_dump(exclude={"id"})
+            )
+            if idempotency_key
+            else None
+        )
 
-        return self._hub_store.create(hub.id, hub)
+        return self._hub_store.create(hub.id, hub, idempotency_key=key)
 
     def pair_device(self, hub_id: str, device_id: str) -> Hub:
         """
@@ -69,9 +107,17 @@ class HubService:
         hub.paired_device_ids.append(device_id)
         device.paired_hub_id = hub_id
 
-        self._device_store.update(device_id, device)
+        with self._writing(hub_id):
+            self._device_store.update(device_id, device)
+            hub = self._hub_store.update(hub_id, hub)
+
+            if self._topology_cache is not None:
+                self._topology_cache.invalidate_hub(hub_id)
+
+            if self._rollups is not None:
+                self._rollups.device_paired(hub, device)
 
-        return self._hub_store.update(hub_id, hub)
+        return hub
 
     def get_device_state(self, hub_id: str, device_id: str) -> Device:
         """
@@ -119,9 +165,7 @@ class HubService:
         if not hub:
             raise ValueError(f"Hub {hub_id} not found")
 
-        return [
-            self._device_store.get(device_id) for device_id in hub.paired_device_ids
-        ]
+        return self._device_store.get_many(hub.paired_device_ids)
 
     def remove_device(self, hub_id: str, device_id: str) -> Hub:
         """
@@ -152,6 +196,38 @@ class HubService:
         hub.paired_device_ids.remove(device_id)
         device.paired_hub_id = None
 
-        self._device_store.update(device_id, device)
+        with self._writing(hub_id):
+            self._device_store.update(device_id, device)
+            hub = self._hub_store.update(hub_id, hub)
+
+            if self._topology_cache is not None:
+                self._topology_cache.invalidate_hub(hub_id)
+
+            if self._rollups is not None:
+                self._rollups.device_unpaired(hub, device)
+
+        return hub
+
+    def _writing(self, hub_id: str) -> ContextManager:
+        if self._rollups is None:
+            return nullcontext()
+
+        return self._rollups.writing(hub_id)
+
+    def get_hub_status(self, hub_id: str) -> StatusRollup:
+        """
+        Get the status rollup of a Hub's paired Devices in constant time.
+
+        Arguments:
+            hub_id: identifier of the Hub
+
+        Returns:
+            status rollup, empty for unknown Hubs
+
+        Raises:
+            ValueError: if no rollups are configured
+        """
+        if self._rollups is None:
+            raise ValueError("Status rollups are not configured")
 
-        return self._hub_store.update(hub_id, hub)
+        return self._rollups.get_hub(hub_id)
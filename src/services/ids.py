@@ -0,0 +1,85 @@
+import os
+import threading
+import time
+from typing import Callable
+from uuid import UUID, uuid4
+
+# mints a new entity identifier; services accept one so the id scheme is pluggable
+IdGenerator = Callable[[], str]
+
+_uuid7_lock = threading.Lock()
+_uuid7_last_ms = 0
+_uuid7_counter = 0
+
+
+def uuid7() -> str:
+    """
+    Generate a time-ordered UUIDv7 (RFC 9562).
+
+    The 48 most significant bits hold the Unix timestamp in milliseconds, followed by
+    a 12-bit counter that keeps identifiers minted within the same millisecond
+    monotonic, so new rows land at the right-hand edge of the primary key B-tree
+    instead of at random positions.
+
+    Returns:
+        canonical string form of the identifier
+    """
+    global _uuid7_last_ms, _uuid7_counter
+
+    with _uuid7_lock:
+        timestamp_ms = time.time_ns() // 1_000_000
+
+        if timestamp_ms > _uuid7_last_ms:
+            _uuid7_last_ms = timestamp_ms
+            _uuid7_counter = int.from_bytes(os.urandom(2), "big") & 0x7FF
+        else:
+            # same millisecond (or clock step back): keep ordering via the counter
+            _uuid7_counter += 1
+            if _uuid7_counter > 0xFFF:
+                _uuid7_last_ms += 1
+                _uuid7_counter = 0
+
+        timestamp_ms = _uuid7_last_ms
+        counter = _uuid7_counter
+
+    random_bits = int.from_bytes(os.urandom(8), "big") & 0x3FFFFFFFFFFFFFFF
+
+    value = (timestamp_ms & 0xFFFFFFFFFFFF) << 80
+    value |= 0x7 << 76
+    value |= counter << 64
+    value |= 0b10 << 62
+    value |= random_bits
+
+    return str(UUID(int=value))
+
+
+def uuid4_id() -> str:
+    """
+    Generate a random UUIDv4, the legacy identifier scheme.
+
+    Returns:
+        canonical string form of the identifier
+    """
+    return str(uuid4())
+
+
+def uuid7_timestamp_ms(id: str) -> int:
+    """
+    Extract the creation timestamp embedded in a UUIDv7 identifier.
+
+    Arguments:
+        id: UUIDv7 identifier
+
+    Returns:
+        Unix timestamp in milliseconds
+
+    Raises:
+        ValueError: if id is not a UUIDv7
+    """
+    value = UUID(id)
+
+    if value.version != 7:
+        raise ValueError(f"Identifier {id} is not a UUIDv7")
+
+    return value.int >> 80
+
@@ -0,0 +1,209 @@
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Callable, Dict, Optional, Tuple
+
+from src.models.device import DeviceType
+
+
+class Priority(IntEnum):
+    """
+    Write priority classes, highest first.
+    """
+
+    CRITICAL = 0
+    INTERACTIVE = 1
+    TELEMETRY = 2
+
+
+# lock commands must get through telemetry storms; thermostat updates are telemetry
+DEVICE_PRIORITIES: Dict[DeviceType, Priority] = {
+    DeviceType.LOCK: Priority.CRITICAL,
+    DeviceType.THERMOSTAT: Priority.TELEMETRY,
+}
+
+
+def priority_for(device_type: DeviceType) -> Priority:
+    return DEVICE_PRIORITIES.get(device_type, Priority.INTERACTIVE)
+
+
+class RateLimitExceeded(ValueError):
+    """
+    Raised when a write exceeds the rate limit of its hub or dwelling.
+    """
+
+    def __init__(self, message: str, retry_after: float) -> None:
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class RateLimit:
+    """
+    Token bucket parameters.
+
+    Attributes:
+        rate: sustained writes per second
+        burst: bucket capacity, i.e. writes allowed back to back
+        reserve: fraction of the burst each priority may not consume, keeping
+            headroom for higher priorities
+    """
+
+    rate: float
+    burst: float
+    reserve: Dict[Priority, float] = field(
+        default_factory=lambda: {
+            Priority.CRITICAL: 0.0,
+            Priority.INTERACTIVE: 0.25,
+            Priority.TELEMETRY: 0.5,
+        }
+    )
+
+    def split(self, workers: int) -> "RateLimit":
+        """
+        Share of the limit for one of several workers limiting independently.
+
+        Arguments:
+            workers: number of worker processes applying the limit
+
+        Returns:
+            limit with rate and burst divided evenly between the workers
+        """
+        return RateLimit(self.rate / workers, self.burst / workers, dict(self.reserve))
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a fixed rate.
+    """
+
+    def __init__(self, limit: RateLimit, now: float) -> None:
+        self.limit = limit
+        self.tokens = limit.burst
+        self.updated = now
+
+    def refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self.updated)
+        self.tokens = min(self.limit.burst, self.tokens + elapsed * self.limit.rate)
+        self.updated = now
+
+    def available(self, priority: Priority) -> float:
+        """
+        Tokens the given priority may consume, after the reserve it must leave.
+        """
+        return self.tokens - self.limit.burst * self.limit.reserve.get(priority, 0.0)
+
+    def retry_after(self, priority: Priority) -> float:
+        """
+        Seconds until one token is available to the given priority.
+        """
+        missing = 1.0 - self.available(priority)
+
+        return max(0.0, missing / self.limit.rate) if self.limit.rate else float("inf")
+
+
+class RateLimiter:
+    """
+    Token-bucket rate limiter for device state writes, keyed by hub and dwelling.
+
+    A write consumes one token from its hub's bucket and, if the hub is installed in
+    a dwelling, one from the dwelling's bucket; it is admitted only if both can
+    spare it. Lower priorities leave a reserve in each bucket so critical commands
+    still get through when telemetry has drained the rest.
+
+    Buckets live in process memory, so each worker enforces its limits on its own;
+    with several workers, give each its share (`RateLimit.split`) so that together
+    they stay within the intended limit.
+    """
+
+    def __init__(
+        self,
+        hub_limit: RateLimit,
+        dwelling_limit: Optional[RateLimit] = None,
+        resolve_dwelling: Optional[Callable[[str], Optional[str]]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        unresolved_ttl: float = 30.0,
+    ) -> None:
+        """
+        Initialize the rate limiter.
+
+        Arguments:
+            hub_limit: limit applied per hub
+            dwelling_limit: optional limit applied per dwelling across its hubs
+            resolve_dwelling: looks up the dwelling a hub is installed in
+            clock: monotonic time source in seconds
+            unresolved_ttl: seconds a hub found in no dwelling is not looked up
+                again, so a hub gets its dwelling's limit at most this long after
+                being installed
+        """
+        self._hub_limit = hub_limit
+        self._dwelling_limit = dwelling_limit
+        self._resolve_dwelling = resolve_dwelling
+        self._clock = clock
+        self._buckets: Dict[Tuple[str, str], TokenBucket] = {}
+        self._dwellings: Dict[str, str] = {}
+        # hub id -> clock reading after which to look the hub's dwelling up again
+        self._unresolved: Dict[str, float] = {}
+        self._unresolved_ttl = unresolved_ttl
+        self._lock = threading.Lock()
+
+    def _dwelling_of(self, hub_id: str) -> Optional[str]:
+        # hubs are never moved between dwellings, so a resolved dwelling is kept
+        dwelling_id = self._dwellings.get(hub_id)
+
+        if dwelling_id is not None or self._resolve_dwelling is None:
+            return dwelling_id
+
+        if self._clock() < self._unresolved.get(hub_id, float("-inf")):
+            return None
+
+        dwelling_id = self._resolve_dwelling(hub_id)
+
+        if dwelling_id is not None:
+            self._dwellings[hub_id] = dwelling_id
+            self._unresolved.pop(hub_id, None)
+        else:
+            self._unresolved[hub_id] = self._clock() + self._unresolved_ttl
+
+        return dwelling_id
+
+    def _bucket(self, kind: str, key: str, limit: RateLimit, now: float) -> TokenBucket:
+        bucket = self._buckets.get((kind, key))
+
+        if bucket is None:
+            bucket = self._buckets[(kind, key)] = TokenBucket(limit, now)
+        else:
+            bucket.refill(now)
+
+        return bucket
+
+    def try_acquire(self, hub_id: str, priority: Priority) -> Optional[float]:
+        """
+        Consume a token for a write through the given hub if the limits allow it.
+
+        Arguments:
+            hub_id: identifier of the hub the device is paired with
+            priority: priority class of the write
+
+        Returns:
+            None if admitted, otherwise seconds until a retry could be admitted
+        """
+        dwelling_id = self._dwelling_of(hub_id) if self._dwelling_limit else None
+
+        with self._lock:
+            now = self._clock()
+            buckets = [self._bucket("hub", hub_id, self._hub_limit, now)]
+
+            if dwelling_id is not None:
+                buckets.append(
+                    self._bucket("dwelling", dwelling_id, self._dwelling_limit, now)
+                )
+
+            if any(bucket.available(priority) < 1.0 for bucket in buckets):
+                return max(bucket.retry_after(priority) for bucket in buckets)
+
+            for bucket in buckets:
+                bucket.tokens -= 1.0
+
+            return None
@@ -0,0 +1,361 @@
+import time
+from contextlib import contextmanager
+from threading import Lock
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.models.device import (
+    Device,
+    DeviceState,
+    DimmerState,
+    LockState,
+    Mode,
+    SwitchState,
+    ThermostatState,
+)
+from src.models.hub import Hub
+from src.models.rollup import StatusRollup
+from src.repository.base import DB
+from src.repository.invalidation import Invalidation
+
+# counter deltas contributed by a single device
+Contribution = Dict[str, float]
+
+
+def contribution(state: DeviceState) -> Contribution:
+    """
+    Compute what a device in the given state adds to a rollup.
+
+    Arguments:
+        state: device state
+
+    Returns:
+        counter deltas keyed by StatusRollup field
+    """
+    delta: Contribution = {"devices": 1}
+
+    if isinstance(state, (SwitchState, DimmerState)) and state.is_on:
+        delta["lights_on"] = 1
+
+    elif isinstance(state, LockState):
+        delta["locks"] = 1
+        delta["unlocked_locks"] = 0 if state.is_locked else 1
+
+    elif isinstance(state, ThermostatState):
+        delta["thermostats"] = 1
+        delta["thermostats_heating"] = 1 if state.mode == Mode.HEAT else 0
+        delta["thermostats_cooling"] = 1 if state.mode == Mode.COOL else 0
+        delta["target_temperature_sum"] = state.target_temperature
+
+    return delta
+
+
+class StatusRollups:
+    """
+    Status rollups per hub and per dwelling, counting paired devices.
+
+    Services apply each write as a delta, so reads are O(1) regardless of how many
+    devices a hub or dwelling has. `verify` recomputes everything from the stores
+    and corrects drift.
+
+    Services bracket each write with `writing` for the hubs it affects, from before
+    the store write until its delta is applied. A hub written during a scan is not
+    corrected from that scan, since the scan may or may not have read the write the
+    delta carries; with stores given, it is recomputed on its own instead. With
+    stores given the rollups can also follow invalidations from other workers,
+    recomputing the hubs their writes touched.
+    """
+
+    def __init__(
+        self,
+        device_store: Optional[DB[Device]] = None,
+        hub_store: Optional[DB[Hub]] = None,
+        attempts: int = 3,
+    ) -> None:
+        """
+        Initialize the rollups.
+
+        Arguments:
+            device_store: optional storage for Device entities, to recompute hubs
+            hub_store: optional storage for Hub entities, to recompute hubs
+            attempts: times a hub recompute is retried while writes keep landing
+        """
+        self._device_store = device_store
+        self._hub_store = hub_store
+        self._attempts = attempts
+        self._rollups: Dict[Tuple[str, str], StatusRollup] = {}
+        self._hub_dwellings: Dict[str, str] = {}
+        # writes in flight, and writes finished so far, per hub
+        self._writing: Dict[str, int] = {}
+        self._written: Dict[str, int] = {}
+        self._lock = Lock()
+
+    @contextmanager
+    def writing(self, *hub_ids: Optional[str]) -> Iterator[None]:
+        """
+        Mark a write to the given hubs' devices as in flight for the block, which
+        writes the store and applies the write's delta.
+
+        Arguments:
+            hub_ids: hubs whose rollups the write changes; None entries are ignored
+        """
+        hub_ids = tuple(hub_id for hub_id in hub_ids if hub_id is not None)
+
+        with self._lock:
+            for hub_id in hub_ids:
+                self._writing[hub_id] = self._writing.get(hub_id, 0) + 1
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                for hub_id in hub_ids:
+                    self._written[hub_id] = self._written.get(hub_id, 0) + 1
+
+                    if self._writing[hub_id] == 1:
+                        del self._writing[hub_id]
+                    else:
+                        self._writing[hub_id] -= 1
+
+    def _apply(self, key: Tuple[str, str], delta: Contribution, sign: int) -> None:
+        rollup = self._rollups.get(key)
+
+        if rollup is None:
+            rollup = self._rollups[key] = StatusRollup()
+
+        for field, value in delta.items():
+            setattr(rollup, field, getattr(rollup, field) + sign * value)
+
+    def _apply_device(self, hub_id: str, delta: Contribution, sign: int) -> None:
+        self._apply(("hub", hub_id), delta, sign)
+        dwelling_id = self._hub_dwellings.get(hub_id)
+
+        if dwelling_id is not None:
+            self._apply(("dwelling", dwelling_id), delta, sign)
+
+    def device_paired(self, hub: Hub, device: Device) -> None:
+        with self._lock:
+            if hub.dwelling_id is not None:
+                self._hub_dwellings[hub.id] = hub.dwelling_id
+
+            self._apply_device(hub.id, contribution(device.state), 1)
+
+    def device_unpaired(self, hub: Hub, device: Device) -> None:
+        with self._lock:
+            self._apply_device(hub.id, contribution(device.state), -1)
+
+    def state_changed(
+        self, hub_id: str, old_state: DeviceState, new_state: DeviceState
+    ) -> None:
+        with self._lock:
+            self._apply_device(hub_id, contribution(old_state), -1)
+            self._apply_device(hub_id, contribution(new_state), 1)
+
+    def hub_installed(self, dwelling_id: str, hub_id: str) -> None:
+        with self._lock:
+            self._hub_dwellings[hub_id] = dwelling_id
+            hub_rollup = self._rollups.get(("hub", hub_id))
+
+            if hub_rollup is not None:
+                delta = hub_rollup.model_dump(exclude={"average_target_temperature"})
+                self._apply(("dwelling", dwelling_id), delta, 1)
+
+    def get_hub(self, hub_id: str) -> StatusRollup:
+        return self._get(("hub", hub_id))
+
+    def get_dwelling(self, dwelling_id: str) -> StatusRollup:
+        return self._get(("dwelling", dwelling_id))
+
+    def _get(self, key: Tuple[str, str]) -> StatusRollup:
+        with self._lock:
+            rollup = self._rollups.get(key)
+
+            return rollup.model_copy() if rollup is not None else StatusRollup()
+
+    def _quiet(self, hub_id: str, written: Dict[str, int]) -> bool:
+        # no write in flight, and none finished since `written` was taken
+        return hub_id not in self._writing and self._written.get(
+            hub_id, 0
+        ) == written.get(hub_id, 0)
+
+    def verify(self, devices: Iterable[Device], hubs: Iterable[Hub]) -> List[str]:
+        """
+        Recompute all rollups from a full scan and correct the maintained ones.
+
+        Hubs written while the scan ran keep their maintained rollup, as the scan
+        may have read some of those writes and not others; with stores configured
+        they are recomputed one by one afterwards. Dwelling rollups are then rebuilt
+        as the sum of their hubs.
+
+        Arguments:
+            devices: every Device in the system, streamed from one snapshot
+            hubs: every Hub in the system
+
+        Returns:
+            keys ("kind:id") whose maintained rollup had drifted from the scan
+        """
+        with self._lock:
+            written = dict(self._written)
+            busy = set(self._writing)
+
+        hub_dwellings = {
+            hub.id: hub.dwelling_id for hub in hubs if hub.dwelling_id is not None
+        }
+        scanned: Dict[str, StatusRollup] = {}
+
+        for device in devices:
+            if device.paired_hub_id is not None:
+                rollup = scanned.setdefault(device.paired_hub_id, StatusRollup())
+                _add(rollup, contribution(device.state))
+
+        drifted = []
+        skipped = []
+
+        with self._lock:
+            self._hub_dwellings.update(hub_dwellings)
+            hub_ids = {id for kind, id in self._rollups if kind == "hub"}
+
+            for hub_id in hub_ids | set(scanned):
+                if hub_id in busy or not self._quiet(hub_id, written):
+                    skipped.append(hub_id)
+                elif self._correct_hub(hub_id, scanned.get(hub_id)):
+                    drifted.append(f"hub:{hub_id}")
+
+            drifted.extend(self._rebuild_dwellings())
+
+        if self._hub_store is not None and self._device_store is not None:
+            for hub_id in skipped:
+                drifted.extend(self.recompute_hub(hub_id))
+
+        return sorted(set(drifted))
+
+    def recompute_hub(self, hub_id: str) -> List[str]:
+        """
+        Recompute a hub's rollup from the stores, and its dwelling's rollup.
+
+        The hub is read again while writes to it land, up to the configured number
+        of attempts; if it never stays quiet its maintained rollup is kept.
+
+        Arguments:
+            hub_id: identifier of the Hub
+
+        Returns:
+            keys ("kind:id") whose maintained rollup had drifted
+        """
+        if self._hub_store is None or self._device_store is None:
+            return []
+
+        for attempt in range(self._attempts):
+            if attempt:
+                # let the writes in flight finish
+                time.sleep(0.01)
+
+            with self._lock:
+                if hub_id in self._writing:
+                    continue
+
+                written = dict(self._written)
+
+            hub = self._hub_store.get(hub_id)
+            rollup = None
+
+            if hub is not None:
+                rollup = StatusRollup()
+
+                for device in self._device_store.get_many(hub.paired_device_ids):
+                    if device.paired_hub_id == hub_id:
+                        _add(rollup, contribution(device.state))
+
+            with self._lock:
+                if not self._quiet(hub_id, written):
+                    continue
+
+                if hub is not None and hub.dwelling_id is not None:
+                    self._hub_dwellings[hub_id] = hub.dwelling_id
+
+                drifted = ["hub:" + hub_id] if self._correct_hub(hub_id, rollup) else []
+
+                return drifted + self._rebuild_dwellings()
+
+        return []
+
+    def invalidate(self, invalidation: Invalidation) -> None:
+        """
+        Recompute the hub affected by a write made in this or another worker.
+
+        Arguments:
+            invalidation: invalidation received from the bus
+        """
+        if invalidation.entity == "hub":
+            self.recompute_hub(invalidation.id)
+
+        elif (
+            invalidation.entity == "device"
+            and not invalidation.deleted
+            and self._device_store is not None
+        ):
+            device = self._device_store.get(invalidation.id)
+
+            if device is not None and device.paired_hub_id is not None:
+                self.recompute_hub(device.paired_hub_id)
+
+    def _correct_hub(self, hub_id: str, scanned: Optional[StatusRollup]) -> bool:
+        key = ("hub", hub_id)
+
+        if _same(self._rollups.get(key), scanned):
+            return False
+
+        if scanned is None:
+            del self._rollups[key]
+        else:
+            self._rollups[key] = scanned
+
+        return True
+
+    def _rebuild_dwellings(self) -> List[str]:
+        # a dwelling's rollup is the sum of its hubs' rollups
+        rebuilt: Dict[str, StatusRollup] = {}
+
+        for (kind, id), rollup in self._rollups.items():
+            dwelling_id = self._hub_dwellings.get(id) if kind == "hub" else None
+
+            if dwelling_id is not None:
+                _add(
+                    rebuilt.setdefault(dwelling_id, StatusRollup()),
+                    rollup.model_dump(exclude={"average_target_temperature"}),
+                )
+
+        drifted = []
+        dwelling_ids = {id for kind, id in self._rollups if kind == "dwelling"}
+
+        for dwelling_id in dwelling_ids | set(rebuilt):
+            key = ("dwelling", dwelling_id)
+            rollup = rebuilt.get(dwelling_id)
+
+            if _same(self._rollups.get(key), rollup):
+                continue
+
+            drifted.append(f"dwelling:{dwelling_id}")
+
+            if rollup is None:
+                del self._rollups[key]
+            else:
+                self._rollups[key] = rollup
+
+        return drifted
+
+
+def _add(rollup: StatusRollup, delta: Contribution) -> None:
+    for field, value in delta.items():
+        setattr(rollup, field, getattr(rollup, field) + value)
+
+
+def _same(left: Optional[StatusRollup], right: Optional[StatusRollup]) -> bool:
+    left = left or StatusRollup()
+    right = right or StatusRollup()
+    floats = {"target_temperature_sum", "average_target_temperature"}
+
+    # sums of floats pick up rounding error over many deltas
+    return (
+        left.model_dump(exclude=floats) == right.model_dump(exclude=floats)
+        and abs(left.target_temperature_sum - right.target_temperature_sum) < 1e-6
+    )
@@ -0,0 +1,68 @@
+from typing import Optional, Sequence, Union
+
+from src.models.search import EntityKind, SearchResults
+from src.repository.memory_store import MemoryNameSearch
+from src.repository.search import NameSearch
+
+MAX_LIMIT = 100
+
+
+class SearchService:
+    """
+    Service for finding dwellings, hubs and devices by name.
+    """
+
+    def __init__(self, name_search: Union[NameSearch, MemoryNameSearch]) -> None:
+        """
+        Initialize the Search service.
+
+        Arguments:
+            name_search: name index of the configured backend
+        """
+        self._name_search = name_search
+
+    def search(
+        self,
+        query: str,
+        kinds: Optional[Sequence[EntityKind]] = None,
+        dwelling_id: Optional[str] = None,
+        hub_id: Optional[str] = None,
+        limit: int = 20,
+        offset: int = 0,
+    ) -> SearchResults:
+        """
+        Search names by prefix, word prefix and similarity, best match first.
+
+        Arguments:
+            query: text to search for
+            kinds: kinds of entities to search, all kinds if omitted
+            dwelling_id: optional Dwelling restricting hits to itself, its Hubs and
+                their Devices
+            hub_id: optional Hub restricting hits to itself, its Dwelling and its
+                Devices
+            limit: maximum number of hits to return
+            offset: number of best hits to skip
+
+        Returns:
+            page of hits
+
+        Raises:
+            ValueError: if query is blank or the page is out of range
+        """
+        if not query.strip():
+            raise ValueError("Search query must not be blank")
+
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ValueError(f"Search limit must be between 1 and {MAX_LIMIT}")
+
+        if offset < 0:
+            raise ValueError("Search offset must not be negative")
+
+        return self._name_search.search(
+            query,
+            list(kinds or EntityKind),
+            dwelling_id=dwelling_id,
+            hub_id=hub_id,
+            limit=limit,
+            offset=offset,
+        )
@@ -0,0 +1,221 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Dict, List, Optional, Union
+
+from src.models.dwelling import DwellingTree
+from src.repository.compact import CompactDevices
+from src.repository.invalidation import Invalidation
+
+
+class _PackedTree:
+    """
+    Dwelling tree whose devices are held in the cache's compact device table.
+    """
+
+    __slots__ = ("tree", "device_ids")
+
+    def __init__(self, tree: DwellingTree, device_ids: List[List[str]]) -> None:
+        # the tree's hubs carry no devices; device_ids lists them per hub
+        self.tree = tree
+        self.device_ids = device_ids
+
+
+class TopologyCache:
+    """
+    LRU cache of dwelling trees with invalidation by dwelling, hub or device.
+
+    Cached trees index the hubs and devices they contain, so a write that only
+    knows a hub or device id still evicts the right dwelling.
+
+    Every invalidation advances a generation counter. A reader takes the generation
+    before loading a tree and hands it to `put`, which drops the tree if anything
+    was invalidated meanwhile: the load may have read the state the invalidation
+    replaced, and an invalidated entity is not always in the index yet (a Device
+    paired during the load), so any invalidation counts.
+
+    A compact cache keeps the devices of cached trees in typed column arrays rather
+    than as models, like `CompactDeviceStore`, and builds a new tree on every hit.
+    """
+
+    def __init__(self, max_entries: int = 10_000, compact: bool = False) -> None:
+        """
+        Initialize the cache.
+
+        Arguments:
+            max_entries: number of dwelling trees kept before evicting the least
+                recently used
+            compact: hold devices compactly, trading a rebuild per hit for memory
+        """
+        self._max_entries = max_entries
+        self._trees: "OrderedDict[str, Union[DwellingTree, _PackedTree]]" = (
+            OrderedDict()
+        )
+        self._devices = CompactDevices() if compact else None
+        self._hub_dwellings: Dict[str, str] = {}
+        self._device_dwellings: Dict[str, str] = {}
+        self._generation = 0
+        self._lock = Lock()
+
+    def get(self, dwelling_id: str) -> Optional[DwellingTree]:
+        """
+        Get a cached Dwelling tree.
+
+        Arguments:
+            dwelling_id: identifier of the Dwelling
+
+        Returns:
+            cached tree, None on a miss
+        """
+        with self._lock:
+            entry = self._trees.get(dwelling_id)
+
+            if entry is None:
+                return None
+
+            self._trees.move_to_end(dwelling_id)
+
+            if isinstance(entry, DwellingTree):
+                return entry
+
+            hubs = [
+                hub.model_copy(update={"devices": [self._devices[id] for id in ids]})
+                for hub, ids in zip(entry.tree.hubs, entry.device_ids)
+            ]
+
+            return entry.tree.model_copy(update={"hubs": hubs})
+
+    def generation(self) -> int:
+        """
+        Read the invalidation generation, to be taken before loading a tree.
+
+        Returns:
+            number of invalidations so far
+        """
+        with self._lock:
+            return self._generation
+
+    def put(self, tree: DwellingTree, generation: Optional[int] = None) -> bool:
+        """
+        Cache a Dwelling tree.
+
+        Arguments:
+            tree: tree to cache
+            generation: generation read before the tree was loaded; the tree is not
+                cached if an invalidation arrived since
+
+        Returns:
+            True if the tree was cached
+        """
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+
+            self._evict(tree.id)
+
+            for hub in tree.hubs:
+                for device in hub.devices:
+                    # an older tree still holding a moved device is stale
+                    self._evict(self._device_dwellings.get(device.id))
+
+            self._trees[tree.id] = self._pack(tree)
+
+            for hub in tree.hubs:
+                self._hub_dwellings[hub.id] = tree.id
+
+                for device in hub.devices:
+                    self._device_dwellings[device.id] = tree.id
+
+            while len(self._trees) > self._max_entries:
+                self._evict(next(iter(self._trees)))
+
+        return True
+
+    def invalidate_dwelling(self, dwelling_id: str) -> None:
+        with self._lock:
+            self._generation += 1
+            self._evict(dwelling_id)
+
+    def invalidate_hub(self, hub_id: str) -> None:
+        with self._lock:
+            self._generation += 1
+            dwelling_id = self._hub_dwellings.get(hub_id)
+
+            if dwelling_id is not None:
+                self._evict(dwelling_id)
+
+    def invalidate_device(self, device_id: str) -> None:
+        with self._lock:
+            self._generation += 1
+            dwelling_id = self._device_dwellings.get(device_id)
+
+            if dwelling_id is not None:
+                self._evict(dwelling_id)
+
+    def invalidate(self, invalidation: Invalidation) -> None:
+        """
+        Evict the tree containing an entity written in this or another worker.
+
+        Arguments:
+            invalidation: invalidation received from the bus
+        """
+        evict = {
+            "dwelling": self.invalidate_dwelling,
+            "hub": self.invalidate_hub,
+            "device": self.invalidate_device,
+        }.get(invalidation.entity)
+
+        if evict is not None:
+            evict(invalidation.id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._trees.clear()
+
+            if self._devices is not None:
+                self._devices = CompactDevices()
+            self._hub_dwellings.clear()
+            self._device_dwellings.clear()
+
+    def _pack(self, tree: DwellingTree) -> Union[DwellingTree, _PackedTree]:
+        if self._devices is None:
+            return tree
+
+        for hub in tree.hubs:
+            for device in hub.devices:
+                self._devices[device.id] = device
+
+        return _PackedTree(
+            tree.model_copy(
+                update={
+                    "hubs": [
+                        hub.model_copy(update={"devices": []}) for hub in tree.hubs
+                    ]
+                }
+            ),
+            [[device.id for device in hub.devices] for hub in tree.hubs],
+        )
+
+    def _evict(self, dwelling_id: Optional[str]) -> None:
+        entry = self._trees.pop(dwelling_id, None)
+
+        if entry is None:
+            return
+
+        if isinstance(entry, DwellingTree):
+            hubs = [
+                (hub.id, [device.id for device in hub.devices]) for hub in entry.hubs
+            ]
+        else:
+            hubs = [
+                (hub.id, ids) for hub, ids in zip(entry.tree.hubs, entry.device_ids)
+            ]
+
+        for hub_id, device_ids in hubs:
+            self._hub_dwellings.pop(hub_id, None)
+
+            for device_id in device_ids:
+                self._device_dwellings.pop(device_id, None)
+
+                if self._devices is not None:
+                    self._devices.pop(device_id, None)
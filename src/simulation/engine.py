@@ -0,0 +1,330 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from src.models.device import (
+    Device,
+    DeviceState,
+    DeviceType,
+    DimmerState,
+    LockState,
+    Mode,
+    SwitchState,
+    ThermostatState,
+)
+from src.services.device_service import DeviceService
+
+MODES = [Mode.OFF, Mode.HEAT, Mode.COOL]
+MODE_CODES = {mode: code for code, mode in enumerate(MODES)}
+
+
+@dataclass
+class SimulationParameters:
+    """
+    Physical and behavioural parameters of the simulated fleet.
+
+    Attributes:
+        tick_seconds: simulated time advanced per tick
+        outdoor_temperature: temperature homes drift towards, in °F
+        leakage_rate: fraction of the indoor/outdoor gap closed per hour
+        heating_rate: °F per hour added by a heating thermostat below target
+        cooling_rate: °F per hour removed by a cooling thermostat above target
+        sensor_noise: standard deviation of temperature readings, in °F
+        report_threshold: change in °F since the last report that triggers telemetry
+        toggle_probability: per-tick chance a switch or dimmer is toggled
+        lock_probability: per-tick chance a lock is locked or unlocked
+        setpoint_probability: per-tick chance a thermostat target is adjusted
+    """
+
+    tick_seconds: float = 60.0
+    outdoor_temperature: float = 50.0
+    leakage_rate: float = 0.1
+    heating_rate: float = 4.0
+    cooling_rate: float = 4.0
+    sensor_noise: float = 0.05
+    report_threshold: float = 0.5
+    toggle_probability: float = 0.001
+    lock_probability: float = 0.0005
+    setpoint_probability: float = 0.0002
+
+
+@dataclass
+class TickReport:
+    """
+    Outcome of a simulation tick.
+    """
+
+    tick: int
+    changed: int = 0
+    written: int = 0
+    coalesced: int = 0
+    rejected: int = 0
+    failed: List[str] = field(default_factory=list)
+
+
+class SimulationEngine:
+    """
+    Vectorized simulation of a device fleet.
+
+    Device states are held in NumPy arrays per device type and advanced for the whole
+    fleet at once each tick; only devices whose reported state changed are turned
+    back into `DeviceState` objects and written through `DeviceService`, one bulk
+    state write per batch. Runs are reproducible for a given seed.
+    """
+
+    def __init__(
+        self,
+        device_service: Optional[DeviceService] = None,
+        parameters: Optional[SimulationParameters] = None,
+        seed: int = 0,
+        batch_size: int = 1000,
+    ) -> None:
+        """
+        Initialize the simulation engine.
+
+        Arguments:
+            device_service: service to write changes through; without one the engine
+                runs as a detached digital twin
+            parameters: simulation parameters
+            seed: random seed making runs reproducible
+            batch_size: number of state writes per batch
+        """
+        self._device_service = device_service
+        self.parameters = parameters or SimulationParameters()
+        self._rng = np.random.default_rng(seed)
+        self._batch_size = batch_size
+        self.tick = 0
+
+        self.thermostat_ids: List[str] = []
+        self.mode = np.zeros(0, dtype=np.int8)
+        self.current_temperature = np.zeros(0)
+        self.reported_temperature = np.zeros(0)
+        self.target_temperature = np.zeros(0)
+
+        self.light_ids: List[str] = []
+        self.light_is_dimmer = np.zeros(0, dtype=bool)
+        self.light_is_on = np.zeros(0, dtype=bool)
+        self.brightness = np.zeros(0, dtype=np.int16)
+
+        self.lock_ids: List[str] = []
+        self.is_locked = np.zeros(0, dtype=bool)
+        self.pin_codes: List[Optional[str]] = []
+
+    def load(self, devices: Iterable[Device]) -> None:
+        """
+        Load the starting state of the fleet.
+
+        Arguments:
+            devices: Devices to simulate; unsupported types are ignored
+        """
+        thermostats: List[Tuple[str, int, float, float]] = []
+        lights: List[Tuple[str, bool, bool, int]] = []
+        locks: List[Tuple[str, bool, Optional[str]]] = []
+
+        for device in devices:
+            state = device.state
+
+            if isinstance(state, ThermostatState):
+                thermostats.append(
+                    (
+                        device.id,
+                        MODE_CODES[state.mode],
+                        state.current_temperature,
+                        state.target_temperature,
+                    )
+                )
+            elif isinstance(state, DimmerState):
+                lights.append((device.id, True, state.is_on, state.brightness))
+            elif isinstance(state, SwitchState):
+                lights.append((device.id, False, state.is_on, 0))
+            elif isinstance(state, LockState):
+                locks.append((device.id, state.is_locked, state.pin_code))
+
+        self.thermostat_ids = [row[0] for row in thermostats]
+        self.mode = np.array([row[1] for row in thermostats], dtype=np.int8)
+        self.current_temperature = np.array(
+            [row[2] for row in thermostats], dtype=float
+        )
+        self.reported_temperature = self.current_temperature.copy()
+        self.target_temperature = np.array([row[3] for row in thermostats], dtype=float)
+
+        self.light_ids = [row[0] for row in lights]
+        self.light_is_dimmer = np.array([row[1] for row in lights], dtype=bool)
+        self.light_is_on = np.array([row[2] for row in lights], dtype=bool)
+        self.brightness = np.array([row[3] for row in lights], dtype=np.int16)
+
+        self.lock_ids = [row[0] for row in locks]
+        self.is_locked = np.array([row[1] for row in locks], dtype=bool)
+        self.pin_codes = [row[2] for row in locks]
+
+    def load_fleet(
+        self, count: int, mix: Optional[Dict[DeviceType, float]] = None
+    ) -> None:
+        """
+        Generate a synthetic fleet without backing Devices, for detached runs.
+
+        Arguments:
+            count: total number of devices
+            mix: share of each device type, defaults to mostly thermostats and lights
+        """
+        mix = mix or {
+            DeviceType.THERMOSTAT: 0.4,
+            DeviceType.SWITCH: 0.3,
+            DeviceType.DIMMER: 0.2,
+            DeviceType.LOCK: 0.1,
+        }
+        counts = {
+            device_type: int(round(count * share)) for device_type, share in mix.items()
+        }
+        rng = self._rng
+
+        thermostats = counts.get(DeviceType.THERMOSTAT, 0)
+        self.thermostat_ids = [f"thermostat-{i}" for i in range(thermostats)]
+        self.mode = rng.choice(np.array([0, 1, 2], dtype=np.int8), size=thermostats)
+        self.current_temperature = rng.normal(68.0, 3.0, size=thermostats)
+        self.reported_temperature = self.current_temperature.copy()
+        self.target_temperature = np.round(rng.normal(70.0, 2.0, size=thermostats))
+
+        switches = counts.get(DeviceType.SWITCH, 0)
+        dimmers = counts.get(DeviceType.DIMMER, 0)
+        self.light_ids = [f"switch-{i}" for i in range(switches)] + [
+            f"dimmer-{i}" for i in range(dimmers)
+        ]
+        self.light_is_dimmer = np.arange(switches + dimmers) >= switches
+        self.light_is_on = rng.random(switches + dimmers) < 0.3
+        self.brightness = np.where(
+            self.light_is_dimmer, rng.integers(0, 101, size=switches + dimmers), 0
+        ).astype(np.int16)
+
+        locks = counts.get(DeviceType.LOCK, 0)
+        self.lock_ids = [f"lock-{i}" for i in range(locks)]
+        self.is_locked = rng.random(locks) < 0.9
+        self.pin_codes = [None] * locks
+
+    def step(self) -> Dict[str, DeviceState]:
+        """
+        Advance the fleet by one tick.
+
+        Returns:
+            new states of the Devices whose reported state changed, by Device id
+        """
+        p = self.parameters
+        rng = self._rng
+        hours = p.tick_seconds / 3600.0
+        self.tick += 1
+
+        # thermostats: heat leaks towards outdoors, HVAC drives towards target
+        temperature = self.current_temperature
+        target = self.target_temperature
+        heating = (self.mode == MODE_CODES[Mode.HEAT]) & (temperature < target)
+        cooling = (self.mode == MODE_CODES[Mode.COOL]) & (temperature > target)
+        temperature += hours * p.leakage_rate * (p.outdoor_temperature - temperature)
+        temperature += hours * (p.heating_rate * heating - p.cooling_rate * cooling)
+
+        adjust = rng.random(len(temperature)) < p.setpoint_probability
+        target[adjust] += rng.choice([-1.0, 1.0], size=int(adjust.sum()))
+
+        reading = temperature + rng.normal(0.0, p.sensor_noise, size=len(temperature))
+        drift = np.abs(reading - self.reported_temperature)
+        report = adjust | (drift >= p.report_threshold)
+        self.reported_temperature[report] = np.round(reading[report], 1)
+
+        # lights and locks: occupants flip them occasionally
+        toggle = rng.random(len(self.light_is_on)) < p.toggle_probability
+        self.light_is_on ^= toggle
+        dimmed = toggle & self.light_is_dimmer & self.light_is_on
+        self.brightness[dimmed] = rng.integers(10, 101, size=int(dimmed.sum()))
+
+        flip = rng.random(len(self.is_locked)) < p.lock_probability
+        self.is_locked ^= flip
+
+        changes: Dict[str, DeviceState] = {}
+
+        for index in np.flatnonzero(report):
+            changes[self.thermostat_ids[index]] = self.thermostat_state(index)
+
+        for index in np.flatnonzero(toggle):
+            changes[self.light_ids[index]] = self.light_state(index)
+
+        for index in np.flatnonzero(flip):
+            changes[self.lock_ids[index]] = self.lock_state(index)
+
+        return changes
+
+    def thermostat_state(self, index: int) -> ThermostatState:
+        return ThermostatState(
+            mode=MODES[self.mode[index]],
+            current_temperature=float(self.reported_temperature[index]),
+            target_temperature=float(self.target_temperature[index]),
+        )
+
+    def light_state(self, index: int) -> DeviceState:
+        if self.light_is_dimmer[index]:
+            return DimmerState(
+                is_on=bool(self.light_is_on[index]),
+                brightness=int(self.brightness[index]),
+            )
+
+        return SwitchState(is_on=bool(self.light_is_on[index]))
+
+    def lock_state(self, index: int) -> LockState:
+        return LockState(
+            is_locked=bool(self.is_locked[index]), pin_code=self.pin_codes[index]
+        )
+
+    def batches(
+        self, changes: Dict[str, DeviceState]
+    ) -> Iterator[List[Tuple[str, DeviceState]]]:
+        """
+        Split changes into write batches.
+
+        Arguments:
+            changes: new states by Device id
+
+        Returns:
+            iterator over batches of (Device id, state) pairs
+        """
+        items = list(changes.items())
+
+        for start in range(0, len(items), self._batch_size):
+            yield items[start : start + self._batch_size]
+
+    def run_tick(self) -> TickReport:
+        """
+        Advance one tick and write the changes through the Device service.
+
+        Each batch is written with one `modify_device_states` call. Telemetry queued
+        by the rate limiter is counted as coalesced, not written; other rate-limited
+        writes are counted as rejected, and writes to Devices that no longer exist
+        are recorded as failed.
+
+        Returns:
+            report of the tick
+        """
+        changes = self.step()
+        report = TickReport(tick=self.tick, changed=len(changes))
+
+        if self._device_service is None:
+            return report
+
+        for batch in self.batches(changes):
+            result = self._device_service.modify_device_states(batch)
+            report.written += len(result.written)
+            report.coalesced += len(result.coalesced)
+            report.rejected += len(result.rejected)
+            report.failed.extend(result.failed)
+
+        return report
+
+    def run(self, ticks: int) -> List[TickReport]:
+        """
+        Run a number of ticks.
+
+        Arguments:
+            ticks: number of ticks to run
+
+        Returns:
+            one report per tick
+        """
+        return [self.run_tick() for _ in range(ticks)]
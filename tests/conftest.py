@@ -1,27 +1,72 @@
+import os
+
 import pytest
 
+from src.app import create_stores
+from src.config import Settings
 from src.models.device import Device
 from src.models.dwelling import Dwelling
 from src.models.hub import Hub
-from src.repository.memory_store import PostgresStore
+from src.repository import base
+from src.repository.memory_store import MemoryDwellingTreeLoader, MemoryStore
 from src.services.device_service import DeviceService
 from src.services.dwelling_service import DwellingService
 from src.services.hub_service import HubService
 
+pytest_plugins = ["tests.query_budget", "pytester"]
+
 
 @pytest.fixture
 def device_store():
-    return PostgresStore[Device]()
+    return MemoryStore[Device]()
 
 
 @pytest.fixture
 def hub_store():
-    return PostgresStore[Hub]()
+    return MemoryStore[Hub]()
 
 
 @pytest.fixture
 def dwelling_store():
-    return PostgresStore[Dwelling]()
+    return MemoryStore[Dwelling]()
+
+
+@pytest.fixture
+def dwelling_tree_loader(dwelling_store, hub_store, device_store):
+    return MemoryDwellingTreeLoader(dwelling_store, hub_store, device_store)
+
+
+@pytest.fixture
+def sql_stores(tmp_path):
+    """
+    Database-backed stores on a throwaway SQLite database.
+    """
+    stores = create_stores(Settings(database_url=f"sqlite:///{tmp_path / 'test.db'}"))
+    base.init_schema()
+
+    yield stores
+
+    base.configure_engine(base.DATABASE_URL)
+
+
+@pytest.fixture
+def postgres_stores():
+    """
+    Database-backed stores on the throwaway PostgreSQL database named by the
+    TEST_POSTGRES_URL environment variable; skipped if it is not set.
+    """
+    url = os.environ.get("TEST_POSTGRES_URL")
+
+    if not url:
+        pytest.skip("TEST_POSTGRES_URL is not set")
+
+    stores = create_stores(Settings(database_url=url))
+    base.init_schema()
+
+    yield stores
+
+    base.Base.metadata.drop_all(base.get_engine())
+    base.configure_engine(base.DATABASE_URL)
 
 
 @pytest.fixture
@@ -0,0 +1,217 @@
+"""
+Pytest plugin counting SQL statements and database sessions per test.
+
+Statements are counted from every engine's `before_cursor_execute` event and
+sessions from each session beginning a transaction on a connection (`after_begin`),
+so a test sees every round trip and connection checkout its code causes.
+
+Budgets make query cost a tested contract:
+
+    @pytest.mark.query_budget(statements=12, sessions=8)
+    def test_whole_call_phase(...): ...
+
+    def test_one_call(query_budget, hub_service):
+        with query_budget("pair_device", statements=5, sessions=4):
+            hub_service.pair_device(hub.id, device.id)
+
+A test exceeding a budget fails. Budgeted counts are listed in the terminal
+summary, and `--query-report PATH` writes every test's counts as JSON for CI.
+"""
+import json
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+
+@dataclass
+class QueryCount:
+    statements: int = 0
+    sessions: int = 0
+
+
+@dataclass
+class BudgetResult:
+    label: str
+    count: QueryCount
+    statements: Optional[int] = None
+    sessions: Optional[int] = None
+
+    @property
+    def exceeded(self) -> List[str]:
+        return [
+            f"{name} {used} > {budget}"
+            for name, used, budget in (
+                ("statements", self.count.statements, self.statements),
+                ("sessions", self.count.sessions, self.sessions),
+            )
+            if budget is not None and used > budget
+        ]
+
+
+@dataclass
+class QueryLog:
+    count: QueryCount = field(default_factory=QueryCount)
+    budgets: List[BudgetResult] = field(default_factory=list)
+
+
+class QueryCounter:
+    """
+    Running statement and session counts, fed by SQLAlchemy events.
+    """
+
+    def __init__(self) -> None:
+        self.total = QueryCount()
+
+    def install(self) -> None:
+        event.listen(Engine, "before_cursor_execute", self._on_statement)
+        event.listen(Session, "after_begin", self._on_session)
+
+    def uninstall(self) -> None:
+        event.remove(Engine, "before_cursor_execute", self._on_statement)
+        event.remove(Session, "after_begin", self._on_session)
+
+    def _on_statement(self, *args) -> None:
+        self.total.statements += 1
+
+    def _on_session(self, *args) -> None:
+        self.total.sessions += 1
+
+    @contextmanager
+    def measure(self) -> Iterator[QueryCount]:
+        """
+        Count statements and sessions within the block.
+        """
+        count = QueryCount()
+        statements, sessions = self.total.statements, self.total.sessions
+
+        try:
+            yield count
+        finally:
+            count.statements = self.total.statements - statements
+            count.sessions = self.total.sessions - sessions
+
+
+class QueryBudgetPlugin:
+    def __init__(self, report_path: Optional[str]) -> None:
+        self.counter = QueryCounter()
+        self.report_path = report_path
+        self.tests: Dict[str, QueryLog] = {}
+
+    def pytest_configure(self, config: pytest.Config) -> None:
+        self.counter.install()
+
+    def pytest_unconfigure(self, config: pytest.Config) -> None:
+        self.counter.uninstall()
+
+    @pytest.hookimpl(wrapper=True)
+    def pytest_runtest_call(self, item: pytest.Item) -> Iterator[None]:
+        queries = self.tests.setdefault(item.nodeid, QueryLog())
+        marker = item.get_closest_marker("query_budget")
+
+        with self.counter.measure() as count:
+            queries.count = count
+            result = yield
+
+        if marker is not None:
+            budget = BudgetResult(label="test", count=count, **marker.kwargs)
+            queries.budgets.append(budget)
+
+            if budget.exceeded:
+                pytest.fail(
+                    f"query budget exceeded: {', '.join(budget.exceeded)}",
+                    pytrace=False,
+                )
+
+        return result
+
+    def pytest_terminal_summary(self, terminalreporter) -> None:
+        budgeted = [
+            (nodeid, budget)
+            for nodeid, queries in self.tests.items()
+            for budget in queries.budgets
+        ]
+
+        if budgeted:
+            terminalreporter.section("query budgets")
+
+            for nodeid, budget in budgeted:
+                status = "OVER" if budget.exceeded else "ok"
+                count = budget.count
+                terminalreporter.write_line(
+                    f"{status:<4} {nodeid} [{budget.label}] "
+                    f"statements {count.statements}/{_limit(budget.statements)} "
+                    f"sessions {count.sessions}/{_limit(budget.sessions)}"
+                )
+
+        if self.report_path:
+            with open(self.report_path, "w") as report:
+                json.dump(
+                    {
+                        nodeid: {
+                            **asdict(queries.count),
+                            "budgets": [
+                                {**asdict(budget), "exceeded": budget.exceeded}
+                                for budget in queries.budgets
+                            ],
+                        }
+                        for nodeid, queries in self.tests.items()
+                    },
+                    report,
+                    indent=2,
+                )
+
+
+def _limit(budget: Optional[int]) -> str:
+    return "-" if budget is None else str(budget)
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--query-report",
+        metavar="PATH",
+        help="write per-test SQL statement and session counts as JSON",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.addinivalue_line(
+        "markers",
+        "query_budget(statements=None, sessions=None): fail the test if its call "
+        "phase runs more SQL statements or opens more database sessions",
+    )
+    config.pluginmanager.register(
+        QueryBudgetPlugin(config.getoption("--query-report")), "query_budget_plugin"
+    )
+
+
+@pytest.fixture
+def query_budget(request: pytest.FixtureRequest):
+    """
+    Context manager failing the test if its block exceeds a statement or session
+    budget; yields the block's counts.
+    """
+    plugin = request.config.pluginmanager.get_plugin("query_budget_plugin")
+    queries = plugin.tests.setdefault(request.node.nodeid, QueryLog())
+
+    @contextmanager
+    def budget(
+        label: str, statements: Optional[int] = None, sessions: Optional[int] = None
+    ) -> Iterator[QueryCount]:
+        with plugin.counter.measure() as count:
+            yield count
+
+        result = BudgetResult(label, count, statements, sessions)
+        queries.budgets.append(result)
+
+        if result.exceeded:
+            pytest.fail(
+                f"query budget for {label} exceeded: {', '.join(result.exceeded)}",
+                pytrace=False,
+            )
+
+    return budget
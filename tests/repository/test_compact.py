@@ -0,0 +1,159 @@
+import tracemalloc
+
+import pytest
+
+from src.models.device import (
+    CameraState,
+    Device,
+    DeviceType,
+    DimmerState,
+    LockState,
+    Mode,
+    SwitchState,
+    ThermostatState,
+)
+from src.repository.compact import CompactDevices
+from src.repository.memory_store import CompactDeviceStore, MemoryStore
+from src.services.device_service import DeviceService
+from src.services.hub_service import HubService
+from src.services.ids import uuid7
+
+
+def _device(state, device_type=DeviceType.SWITCH, id=None, **fields) -> Device:
+    return Device(
+        id=id or uuid7(), name="Device", type=device_type, state=state, **fields
+    )
+
+
+@pytest.mark.parametrize(
+    "device",
+    [
+        _device(SwitchState(is_on=True)),
+        _device(DimmerState(brightness=73, is_on=True), DeviceType.DIMMER),
+        _device(LockState(), DeviceType.LOCK),
+        _device(LockState(is_locked=False, pin_code="0042"), DeviceType.LOCK),
+        _device(
+            ThermostatState(
+                mode=Mode.COOL, current_temperature=71.3, target_temperature=68.25
+            ),
+            DeviceType.THERMOSTAT,
+            paired_hub_id=uuid7(),
+        ),
+        _device(SwitchState(), id="legacy-device-7"),
+        _device(SwitchState(), id=uuid7().upper()),
+    ],
+    ids=["switch", "dimmer", "lock", "lock-pin", "thermostat", "string-id", "upper-id"],
+)
+def test_devices_round_trip_losslessly(device) -> None:
+    devices = CompactDevices()
+    devices[device.id] = device
+
+    stored = devices[device.id]
+
+    assert stored == device
+    assert stored is not device
+    assert list(devices) == [device.id]
+
+
+def test_camera_state_round_trips() -> None:
+    devices = CompactDevices()
+    state = CameraState(is_recording=True, resolution="4k")
+    device = _device(SwitchState(), DeviceType.CAMERA).model_copy(
+        update={"state": state}
+    )
+    devices[device.id] = device
+
+    assert devices[device.id].state == state
+
+
+def test_integers_beyond_64_bits_round_trip() -> None:
+    devices = CompactDevices()
+    small = _device(DimmerState(brightness=5), DeviceType.DIMMER)
+    devices[small.id] = small
+    big = _device(DimmerState(brightness=2**70), DeviceType.DIMMER)
+    devices[big.id] = big
+    negative = small.model_copy(update={"state": DimmerState(brightness=-(2**90))})
+    devices[negative.id] = negative
+
+    assert devices[big.id] == big
+    assert devices[negative.id] == negative
+
+
+def test_pin_codes_are_not_interned() -> None:
+    devices = CompactDevices()
+    device = _device(LockState(pin_code="1234"), DeviceType.LOCK)
+    devices[device.id] = device
+    strings = len(devices._strings)
+
+    for pin_code in ("5678", "9012"):
+        devices[device.id] = device.model_copy(
+            update={"state": LockState(pin_code=pin_code)}
+        )
+
+    assert devices[device.id].state.pin_code == "9012"
+    assert len(devices._strings) == strings
+    assert "1234" not in devices._strings._codes
+
+
+def test_delete_and_state_class_change_keep_other_rows() -> None:
+    devices = CompactDevices()
+    stored = [_device(SwitchState(is_on=index % 2 == 0)) for index in range(5)]
+
+    for device in stored:
+        devices[device.id] = device
+
+    del devices[stored[1].id]
+    replaced = stored[3].model_copy(
+        update={"type": DeviceType.DIMMER, "state": DimmerState(brightness=5)}
+    )
+    devices[replaced.id] = replaced
+    expected = [stored[0], stored[2], replaced, stored[4]]
+
+    assert len(devices) == 4
+    assert stored[1].id not in devices
+    assert [devices[device.id] for device in expected] == expected
+
+    with pytest.raises(KeyError):
+        del devices[stored[1].id]
+
+
+def test_compact_store_serves_services() -> None:
+    device_store = CompactDeviceStore()
+    device_service = DeviceService(device_store)
+    hub_service = HubService(MemoryStore(), device_store)
+    hub = hub_service.create_hub("Hub")
+    device = device_service.create_device("Switch", DeviceType.SWITCH, SwitchState())
+
+    hub_service.pair_device(hub.id, device.id)
+    device_service.modify_device_state(device.id, SwitchState(is_on=True))
+
+    assert device_store.get(device.id) == device.model_copy(
+        update={"paired_hub_id": hub.id, "state": SwitchState(is_on=True)}
+    )
+    assert hub_service.list_devices(hub.id) == [device_store.get(device.id)]
+
+
+def _resident_bytes(store: MemoryStore, hub_ids) -> int:
+    tracemalloc.start()
+
+    try:
+        for index in range(5000):
+            device = _device(
+                DimmerState(brightness=index % 101),
+                DeviceType.DIMMER,
+                paired_hub_id=hub_ids[index % len(hub_ids)],
+            )
+            store.create(device.id, device)
+
+        return tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+
+
+def test_compact_store_uses_several_times_less_memory() -> None:
+    hub_ids = [uuid7() for _ in range(500)]
+
+    models = _resident_bytes(MemoryStore[Device](), hub_ids)
+    compact = _resident_bytes(CompactDeviceStore(), hub_ids)
+
+    assert models > 4 * compact
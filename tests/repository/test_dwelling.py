@@ -0,0 +1,64 @@
+from sqlalchemy import event
+
+from src.models.device import DeviceType, SwitchState
+from src.repository import base
+from src.services.device_service import DeviceService
+from src.services.dwelling_service import DwellingService
+from src.services.hub_service import HubService
+
+
+def test_dwelling_tree_loaded_in_one_query(sql_stores) -> None:
+    device_service = DeviceService(sql_stores.devices)
+    hub_service = HubService(sql_stores.hubs, sql_stores.devices)
+    dwelling_service = DwellingService(
+        sql_stores.dwellings, sql_stores.hubs, tree_loader=sql_stores.dwelling_trees
+    )
+
+    dwelling = dwelling_service.create_dwelling("Test Dwelling")
+
+    for hub_number in range(3):
+        hub = hub_service.create_hub(f"Hub {hub_number}")
+        dwelling_service.install_hub(dwelling.id, hub.id)
+
+        for device_number in range(3):
+            device = device_service.create_device(
+                f"Switch {hub_number}.{device_number}",
+                DeviceType.SWITCH,
+                SwitchState(is_on=False),
+            )
+            hub_service.pair_device(hub.id, device.id)
+
+    statements = []
+    engine = base.get_engine()
+    listener = lambda *args: statements.append(args[2])  # noqa: E731
+    event.listen(engine, "before_cursor_execute", listener)
+
+    try:
+        tree = dwelling_service.get_dwelling_tree(dwelling.id)
+    finally:
+        event.remove(engine, "before_cursor_execute", listener)
+
+    assert len(statements) == 1
+    assert len(tree.hubs) == 3
+    assert sorted(tree.hub_ids) == sorted(hub.id for hub in tree.hubs)
+    assert all(len(hub.devices) == 3 for hub in tree.hubs)
+    assert all(len(hub.paired_device_ids) == 3 for hub in tree.hubs)
+
+
+def test_non_canonical_ids_find_stored_rows(sql_stores) -> None:
+    device_service = DeviceService(sql_stores.devices)
+    dwelling_service = DwellingService(
+        sql_stores.dwellings, sql_stores.hubs, tree_loader=sql_stores.dwelling_trees
+    )
+    dwelling = dwelling_service.create_dwelling("Test Dwelling")
+    device = device_service.create_device("Switch", DeviceType.SWITCH, SwitchState())
+    upper = device.id.upper()
+
+    assert sql_stores.devices.get(upper) == device
+    assert sql_stores.devices.get_many([upper]) == [device]
+    assert sql_stores.devices.update(upper, device) == device
+    assert dwelling_service.get_dwelling_tree(dwelling.id.upper()).id == dwelling.id
+
+    sql_stores.devices.delete(upper)
+
+    assert sql_stores.devices.get(device.id) is None
@@ -0,0 +1,337 @@
+import multiprocessing
+import os
+import tempfile
+import threading
+from typing import List, Optional
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from src.models.device import Device, DeviceType, SwitchState
+from src.models.dwelling import DwellingTree, HubTree
+from src.repository import base
+from src.repository.device import DeviceRepo
+from src.repository.invalidation import (
+    Flush,
+    Deliver,
+    Invalidation,
+    InvalidationBroker,
+    InvalidationBus,
+    PostgresTransport,
+    UnixSocketTransport,
+)
+from src.services.device_service import DeviceService
+from src.services.hub_service import HubService
+from src.services.ids import uuid7
+from src.services.topology_cache import TopologyCache
+
+
+class Received:
+    """
+    Invalidations delivered to a bus, with a way to wait for them.
+    """
+
+    def __init__(self, bus: InvalidationBus) -> None:
+        self.items: List[Invalidation] = []
+        self._arrived = threading.Condition()
+        bus.subscribe(self._append)
+
+    def _append(self, invalidation: Invalidation) -> None:
+        with self._arrived:
+            self.items.append(invalidation)
+            self._arrived.notify_all()
+
+    def wait(self, count: int, timeout: float = 5.0) -> List[Invalidation]:
+        with self._arrived:
+            assert self._arrived.wait_for(lambda: len(self.items) >= count, timeout)
+
+            return list(self.items)
+
+
+@pytest.fixture
+def broker_path():
+    # Unix socket paths are limited to about 100 bytes, so keep it short
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bus.sock")
+        broker = InvalidationBroker(path)
+        broker.start()
+
+        yield path
+
+        broker.close()
+
+
+class Flushes:
+    """
+    Flushes of a bus, with a way to wait for them.
+    """
+
+    def __init__(self, bus: InvalidationBus) -> None:
+        self.count = 0
+        self._flushed = threading.Condition()
+        bus.subscribe(lambda invalidation: None, self._flush)
+
+    def _flush(self) -> None:
+        with self._flushed:
+            self.count += 1
+            self._flushed.notify_all()
+
+    def wait(self, count: int, timeout: float = 5.0) -> None:
+        with self._flushed:
+            assert self._flushed.wait_for(lambda: self.count >= count, timeout)
+
+
+class RecordingTransport:
+    """
+    Transport recording what it is sent, or failing every send.
+    """
+
+    def __init__(self, transactional: bool = False, fail: bool = False) -> None:
+        self.transactional = transactional
+        self.fail = fail
+        self.sent: List[Invalidation] = []
+        self.in_transaction: List[bool] = []
+
+    def attach(self, deliver: Deliver, flush: Flush) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def send(
+        self, invalidations: List[Invalidation], session: Optional[Session] = None
+    ) -> None:
+        if self.fail:
+            raise OSError("transport down")
+
+        self.sent.extend(invalidations)
+        self.in_transaction.append(session is not None and session.in_transaction())
+
+    def close(self) -> None:
+        pass
+
+
+def _switch(device_service: DeviceService) -> Device:
+    return device_service.create_device("Switch", DeviceType.SWITCH, SwitchState())
+
+
+def test_writes_publish_row_versions(sql_stores) -> None:
+    received = Received(sql_stores.bus)
+    device_service = DeviceService(sql_stores.devices)
+    device = _switch(device_service)
+
+    for is_on in (True, False):
+        device_service.modify_device_state(device.id, SwitchState(is_on=is_on))
+
+    device_service.delete_device(device.id)
+
+    assert received.items == [
+        Invalidation("device", device.id, 1),
+        Invalidation("device", device.id, 2),
+        Invalidation("device", device.id, 3),
+        Invalidation("device", device.id, 3, deleted=True),
+    ]
+
+
+def test_failed_and_skipped_writes_publish_nothing(sql_stores) -> None:
+    received = Received(sql_stores.bus)
+    device = _switch(DeviceService(sql_stores.devices))
+
+    with pytest.raises(ValueError):
+        sql_stores.devices.update(uuid7(), device)
+
+    with pytest.raises(ValueError):
+        sql_stores.devices.create(device.id, device)
+
+    sql_stores.devices.create_many([device])
+
+    assert received.items == [Invalidation("device", device.id, 1)]
+
+
+def test_batch_create_and_relationship_delete_publish(sql_stores) -> None:
+    received = Received(sql_stores.bus)
+    devices = [
+        Device(id=uuid7(), name="Switch", type=DeviceType.SWITCH, state=SwitchState())
+        for _ in range(3)
+    ]
+    sql_stores.devices.create_many(devices)
+    hub_service = HubService(sql_stores.hubs, sql_stores.devices)
+    hub = hub_service.create_hub("Hub")
+    hub_service.pair_device(hub.id, devices[0].id)
+    sql_stores.hubs.delete(hub.id)
+
+    published = {(item.entity, item.id): item for item in received.items}
+
+    assert {published[("device", device.id)].version for device in devices} == {
+        1,
+        2,
+    }
+    assert published[("hub", hub.id)] == Invalidation("hub", hub.id, 2, deleted=True)
+
+
+def test_invalidation_payload_round_trip() -> None:
+    invalidation = Invalidation("hub", uuid7(), 7, deleted=True)
+
+    assert Invalidation.decode(invalidation.encode()) == invalidation
+
+
+def test_failing_listener_does_not_block_others() -> None:
+    bus = InvalidationBus()
+    bus.subscribe(lambda invalidation: 1 / 0)
+    received = Received(bus)
+
+    bus.publish([Invalidation("device", uuid7(), 1)])
+
+    assert len(received.items) == 1
+
+
+def test_write_in_one_worker_evicts_cache_of_another(broker_path) -> None:
+    writer = InvalidationBus(UnixSocketTransport(broker_path))
+    reader = InvalidationBus(UnixSocketTransport(broker_path))
+    cache = TopologyCache()
+    reader.subscribe(cache.invalidate)
+    received = Received(reader)
+    reader.start()
+    device = Device(
+        id=uuid7(), name="Switch", type=DeviceType.SWITCH, state=SwitchState()
+    )
+    tree = DwellingTree(
+        id=uuid7(),
+        name="Dwelling",
+        hubs=[HubTree(id=uuid7(), name="Hub", devices=[device])],
+    )
+    cache.put(tree)
+
+    try:
+        writer.publish([Invalidation("device", device.id, 2)])
+        received.wait(1)
+    finally:
+        writer.close()
+        reader.close()
+
+    assert cache.get(tree.id) is None
+
+
+def _publish_from_child(path: str, ids: List[str]) -> None:
+    bus = InvalidationBus(UnixSocketTransport(path))
+    bus.publish([Invalidation("device", id, 1) for id in ids])
+    bus.close()
+
+
+def test_invalidations_cross_process_boundaries(broker_path) -> None:
+    bus = InvalidationBus(UnixSocketTransport(broker_path))
+    received = Received(bus)
+    bus.start()
+    ids = [uuid7() for _ in range(3)]
+    child = multiprocessing.get_context("spawn").Process(
+        target=_publish_from_child, args=(broker_path, ids)
+    )
+
+    try:
+        child.start()
+        child.join(10)
+        items = received.wait(len(ids))
+    finally:
+        bus.close()
+
+    assert child.exitcode == 0
+    assert [item.id for item in items] == ids
+
+
+def test_stale_and_duplicate_invalidations_are_dropped() -> None:
+    bus = InvalidationBus()
+    received = Received(bus)
+    id = uuid7()
+
+    for version, deleted in [(2, False), (1, False), (2, False), (3, False)]:
+        bus.publish([Invalidation("device", id, version, deleted)])
+
+    bus.publish([Invalidation("device", id, 3, deleted=True)])
+    # a late update of a deleted row is still delivered
+    bus.publish([Invalidation("device", id, 3)])
+
+    assert [(item.version, item.deleted) for item in received.items] == [
+        (2, False),
+        (3, False),
+        (3, True),
+        (3, False),
+    ]
+
+
+def test_failed_publish_flushes_caches_instead_of_failing_write(sql_stores) -> None:
+    bus = InvalidationBus(RecordingTransport(fail=True))
+    flushes = Flushes(bus)
+    devices = base.DB[Device](DeviceRepo, Device, bus=bus)
+    device = _switch(DeviceService(devices))
+
+    assert devices.get(device.id) == device
+    assert flushes.count == 1
+
+
+def test_invalidations_are_sent_after_commit_or_in_the_transaction(
+    sql_stores,
+) -> None:
+    deferred = RecordingTransport()
+    transactional = RecordingTransport(transactional=True)
+
+    for transport in (deferred, transactional):
+        devices = base.DB[Device](
+            DeviceRepo, Device, bus=InvalidationBus(transport)
+        )
+        device = _switch(DeviceService(devices))
+
+        with pytest.raises(ValueError):
+            devices.create(device.id, device)
+
+        assert transport.sent == [Invalidation("device", device.id, 1)]
+
+    assert deferred.in_transaction == [False]
+    assert transactional.in_transaction == [True]
+
+
+def test_unix_transport_reconnects_and_flushes_after_broker_restart() -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bus.sock")
+        broker = InvalidationBroker(path)
+        broker.start()
+        bus = InvalidationBus(
+            UnixSocketTransport(path, retry_interval=0.01, max_retry_interval=0.05)
+        )
+        received = Received(bus)
+        flushes = Flushes(bus)
+        bus.start()
+
+        try:
+            broker.close()
+            flushes.wait(1)
+
+            # while the broker is down a send is dropped, not raised
+            bus.publish([Invalidation("device", uuid7(), 1)])
+            assert flushes.count >= 2
+
+            broker = InvalidationBroker(path)
+            broker.start()
+            flushes.wait(3)
+            id = uuid7()
+            bus.publish([Invalidation("device", id, 1)])
+
+            assert [item.id for item in received.wait(1)] == [id]
+        finally:
+            bus.close()
+            broker.close()
+
+
+def test_postgres_listener_does_not_take_a_pooled_connection(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'bus.db'}")
+    pooled = []
+    event.listen(engine, "connect", lambda *args: pooled.append(args))
+    transport = PostgresTransport(lambda: engine)
+
+    # the listener connects outside the pool before finding SQLite cannot LISTEN
+    with pytest.raises(ValueError, match="psycopg2"):
+        transport.start()
+
+    transport.close()
+
+    assert pooled == []
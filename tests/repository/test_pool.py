@@ -0,0 +1,178 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.app import create_app
+from src.config import Settings
+from src.models.device import Device, DeviceType, SwitchState
+from src.repository import base
+from src.repository.device import DeviceRepo
+from src.repository.pool import AdmissionController, PoolSaturatedError
+
+
+@pytest.fixture
+def saturable_store(tmp_path):
+    base.configure_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        admission=AdmissionController(limit=1, timeout=0.05),
+        pool_size=1,
+        max_overflow=0,
+    )
+    base.init_schema()
+
+    yield base.DB[Device](DeviceRepo, Device)
+
+    base.configure_engine(base.DATABASE_URL)
+
+
+def test_admission_sheds_when_saturated() -> None:
+    admission = AdmissionController(limit=1, timeout=0.01)
+
+    with admission.admit():
+        with pytest.raises(PoolSaturatedError):
+            with admission.admit():
+                pass
+
+    snapshot = admission.snapshot()
+
+    assert snapshot["admitted"] == 1
+    assert snapshot["shed"] == 1
+    assert snapshot["in_flight"] == 0
+
+
+def test_admission_queues_until_slot_frees() -> None:
+    admission = AdmissionController(limit=1, timeout=1.0)
+    held = threading.Event()
+    release = threading.Event()
+
+    def hold() -> None:
+        with admission.admit():
+            held.set()
+            release.wait()
+
+    worker = threading.Thread(target=hold)
+    worker.start()
+    held.wait()
+
+    threading.Timer(0.05, release.set).start()
+
+    with admission.admit():
+        pass
+
+    worker.join()
+    snapshot = admission.snapshot()
+
+    assert snapshot["admitted"] == 2
+    assert snapshot["shed"] == 0
+    assert snapshot["max_wait"] >= 0.04
+
+
+def test_store_raises_when_pool_saturated(saturable_store) -> None:
+    device = Device(
+        id="00000000-0000-7000-8000-000000000001",
+        name="Test Switch",
+        type=DeviceType.SWITCH,
+        state=SwitchState(),
+    )
+    saturable_store.create(device.id, device)
+
+    with base.get_session():
+        with pytest.raises(PoolSaturatedError):
+            saturable_store.get(device.id)
+
+    assert saturable_store.get(device.id) == device
+
+
+def test_pool_status_reports_gauges(saturable_store) -> None:
+    saturable_store.list()
+
+    status = base.pool_status()
+
+    assert status["pool"]["size"] == 1
+    assert status["pool"]["checked_out"] == 0
+    assert status["pool"]["checkouts"] >= 1
+    assert status["admission"]["limit"] == 1
+
+
+def test_request_slot_covers_its_sessions() -> None:
+    admission = AdmissionController(limit=1, timeout=0.01)
+
+    async def request() -> None:
+        async with admission.admit_request():
+            with admission.admit():
+                pass
+
+            with admission.admit():
+                pass
+
+    asyncio.run(request())
+    snapshot = admission.snapshot()
+
+    assert snapshot["admitted"] == 1
+    assert snapshot["shed"] == 0
+    assert snapshot["in_flight"] == 0
+
+
+def test_queued_request_does_not_block_event_loop() -> None:
+    admission = AdmissionController(limit=1, timeout=0.1)
+    ticks = []
+
+    async def tick() -> None:
+        for _ in range(5):
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.01)
+
+    async def run() -> None:
+        async with admission.admit_request():
+            with pytest.raises(PoolSaturatedError):
+                await asyncio.gather(_queued_request(admission), tick())
+
+    asyncio.run(run())
+
+    assert len(ticks) == 5
+    assert admission.snapshot()["shed"] == 1
+    assert admission.snapshot()["queued"] == 0
+
+
+async def _queued_request(admission: AdmissionController) -> None:
+    async with admission.admit_request():
+        pass
+
+
+def test_routes_admit_once_per_request(tmp_path) -> None:
+    app = create_app(
+        Settings(database_url=f"sqlite:///{tmp_path / 'api.db'}", pool_size=1)
+    )
+
+    with TestClient(app) as client:
+        base.init_schema()
+        before = client.get("/health/pool").json()["admission"]["admitted"]
+        created = client.post(
+            "/devices",
+            json={"id": "x", "name": "Switch", "type": "switch", "state": {}},
+        )
+        admitted = client.get("/health/pool").json()["admission"]["admitted"]
+
+    assert created.status_code == 201
+    assert admitted - before == 1
+
+
+def test_saturated_pool_responds_503_with_retry_after(tmp_path) -> None:
+    app = create_app(
+        Settings(
+            database_url=f"sqlite:///{tmp_path / 'api.db'}",
+            pool_size=1,
+            max_overflow=0,
+            admission_timeout=0.05,
+        )
+    )
+
+    with TestClient(app) as client:
+        with base.admission_controller().admit():
+            response = client.get("/dwellings/d/tree")
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
@@ -0,0 +1,64 @@
+import pytest
+
+from src.models.device import Device, DeviceType, SwitchState
+from src.repository import base
+from src.repository.device import DeviceRepo
+from src.services.device_service import DeviceService
+from src.services.hub_service import HubService
+
+
+@pytest.fixture
+def device_store(tmp_path):
+    base.configure_engine(f"sqlite:///{tmp_path / 'statements.db'}")
+    base.init_schema()
+
+    yield base.DB[Device](DeviceRepo, Device)
+
+    base.configure_engine(base.DATABASE_URL)
+
+
+def _device(device_store: base.DB[Device], is_on: bool = False) -> Device:
+    service = DeviceService(device_store)
+
+    return service.create_device("Switch", DeviceType.SWITCH, SwitchState(is_on=is_on))
+
+
+def test_warmed_statements_are_served_from_cache(device_store) -> None:
+    device = _device(device_store)
+    device_store.warm_up()
+    before = base.statement_cache_status()
+
+    for is_on in (True, False, True):
+        device.state = SwitchState(is_on=is_on)
+        device_store.update(device.id, device)
+        device_store.get(device.id)
+
+    device_store.delete(device.id)
+    after = base.statement_cache_status()
+
+    assert after["misses"] == before["misses"]
+    assert after["hits"] - before["hits"] == 7
+    assert after["hit_rate"] > 0
+
+
+def test_update_and_delete_report_missing_rows(device_store) -> None:
+    device = _device(device_store)
+    device_store.delete(device.id)
+
+    with pytest.raises(ValueError):
+        device_store.update(device.id, device)
+
+    with pytest.raises(ValueError):
+        device_store.delete(device.id)
+
+    assert device_store.get(device.id) is None
+
+
+def test_relationship_fields_loaded_by_id(sql_stores) -> None:
+    device = _device(sql_stores.devices, is_on=True)
+    hub_service = HubService(sql_stores.hubs, sql_stores.devices)
+    hub = hub_service.create_hub("Hub")
+    hub_service.pair_device(hub.id, device.id)
+
+    assert sql_stores.hubs.get(hub.id).paired_device_ids == [device.id]
+    assert sql_stores.devices.get(device.id).state == SwitchState(is_on=True)
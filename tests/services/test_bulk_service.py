@@ -0,0 +1,197 @@
+import json
+
+import pytest
+
+from src.models.device import Device, DeviceType, SwitchState, ThermostatState
+from src.models.dwelling import Dwelling
+from src.models.hub import Hub
+from src.repository import base
+from src.repository.memory_store import MemoryStore
+from src.services.bulk_service import BulkService, FileCheckpoint
+
+
+@pytest.fixture
+def fleet(device_service, hub_service, dwelling_service):
+    dwelling = dwelling_service.create_dwelling("Test Dwelling")
+    hub = hub_service.create_hub("Test Hub")
+    dwelling_service.install_hub(dwelling.id, hub.id)
+
+    for number in range(5):
+        device = device_service.create_device(
+            f"Switch {number}", DeviceType.SWITCH, SwitchState(is_on=number % 2 == 0)
+        )
+        hub_service.pair_device(hub.id, device.id)
+
+    device_service.create_device(
+        "Spare Thermostat", DeviceType.THERMOSTAT, ThermostatState()
+    )
+
+    return dwelling, hub
+
+
+@pytest.fixture
+def bulk_service(dwelling_store, hub_store, device_store):
+    return BulkService(dwelling_store, hub_store, device_store, batch_size=2)
+
+
+def _empty_bulk_service(batch_size: int = 2) -> BulkService:
+    return BulkService(
+        MemoryStore[Dwelling](),
+        MemoryStore[Hub](),
+        MemoryStore[Device](),
+        batch_size=batch_size,
+    )
+
+
+def _dump(service: BulkService):
+    return sorted(service.export())
+
+
+def test_export_in_dependency_order(fleet, bulk_service) -> None:
+    kinds = [json.loads(line)["kind"] for line in bulk_service.export()]
+
+    assert kinds == ["dwelling", "hub"] + ["device"] * 6
+
+
+def test_import_round_trip(fleet, bulk_service) -> None:
+    target = _empty_bulk_service()
+
+    report = target.import_lines(bulk_service.export())
+
+    assert report.created == {"dwelling": 1, "hub": 1, "device": 6}
+    assert _dump(target) == _dump(bulk_service)
+
+
+def test_import_is_idempotent(fleet, bulk_service) -> None:
+    target = _empty_bulk_service()
+    lines = list(bulk_service.export())
+
+    target.import_lines(lines)
+    report = target.import_lines(lines)
+
+    assert report.created == {"dwelling": 0, "hub": 0, "device": 0}
+    assert report.skipped == {"dwelling": 1, "hub": 1, "device": 6}
+
+
+def test_import_rejects_out_of_order_records(fleet, bulk_service) -> None:
+    lines = list(bulk_service.export())
+
+    # one batch, so the order is checked before any references are
+    with pytest.raises(ValueError, match="dependency order"):
+        _empty_bulk_service(batch_size=100).import_lines(reversed(lines))
+
+
+def test_import_resumes_from_checkpoint(fleet, bulk_service, tmp_path) -> None:
+    lines = list(bulk_service.export())
+    broken = lines[:5] + ["{not json\n"] + lines[5:]
+    checkpoint = FileCheckpoint(str(tmp_path / "import.checkpoint"))
+    target = _empty_bulk_service()
+
+    with pytest.raises(ValueError):
+        target.import_lines(broken, checkpoint)
+
+    assert checkpoint.load() == 4
+
+    fixed = lines[:5] + ["\n"] + lines[5:]
+    report = target.import_lines(fixed, checkpoint)
+
+    assert report.resumed_from == 4
+    assert _dump(target) == _dump(bulk_service)
+
+
+def test_import_round_trip_database(fleet, bulk_service, sql_stores) -> None:
+    target = BulkService(
+        sql_stores.dwellings, sql_stores.hubs, sql_stores.devices, batch_size=2
+    )
+
+    report = target.import_lines(bulk_service.export())
+
+    assert report.created == {"dwelling": 1, "hub": 1, "device": 6}
+    assert _dump(target) == _dump(bulk_service)
+
+
+@pytest.mark.parametrize("kind", ["hub", "device"])
+def test_import_reports_dangling_reference(
+    fleet, bulk_service, sql_stores, kind
+) -> None:
+    lines = [json.loads(line) for line in bulk_service.export()]
+    records = [record for record in lines if record["kind"] != "dwelling"]
+
+    if kind == "device":
+        records = [record for record in records if record["kind"] == "device"]
+
+    target = BulkService(
+        sql_stores.dwellings, sql_stores.hubs, sql_stores.devices, batch_size=2
+    )
+
+    with pytest.raises(ValueError, match=f"^Line 1: {kind} .* references missing"):
+        target.import_lines(json.dumps(record) for record in records)
+
+    assert sql_stores.devices.list() == []
+
+
+def test_export_reads_a_page_per_session(
+    fleet, bulk_service, sql_stores, monkeypatch
+) -> None:
+    source = BulkService(
+        sql_stores.dwellings, sql_stores.hubs, sql_stores.devices, batch_size=2
+    )
+    source.import_lines(bulk_service.export())
+    sessions = []
+    get_session = base.get_session
+
+    def counting_session():
+        sessions.append(1)
+        return get_session()
+
+    monkeypatch.setattr(base, "get_session", counting_session)
+    lines = list(source.export())
+    monkeypatch.undo()
+
+    assert _dump(source) == _dump(bulk_service)
+    # dwelling 1 page, hub 1 page, devices 3 full pages and an empty one
+    assert len(lines) == 8
+    assert len(sessions) == 6
+
+
+def test_copy_values_are_escaped() -> None:
+    assert base._copy_value(None) == "\\N"
+    assert base._copy_value("a\tb\nc\\d\re") == "a\\tb\\nc\\\\d\\re"
+    assert base._copy_value({"name": "x\ty"}) == '{"name": "x\\\\ty"}'
+
+
+def test_import_round_trip_postgres_copy(fleet, bulk_service, postgres_stores) -> None:
+    if base.get_engine().dialect.driver != "psycopg2":
+        pytest.skip("the COPY path needs psycopg2")
+
+    lines = [json.loads(line) for line in bulk_service.export()]
+
+    for record in lines:
+        record["name"] = f"{record['name']}\twith\nawkward\\characters"
+
+    target = BulkService(
+        postgres_stores.dwellings,
+        postgres_stores.hubs,
+        postgres_stores.devices,
+        batch_size=2,
+    )
+    source = _empty_bulk_service()
+    source.import_lines(json.dumps(record) for record in lines)
+
+    report = target.import_lines(source.export())
+    replayed = target.import_lines(source.export())
+
+    assert report.created == {"dwelling": 1, "hub": 1, "device": 6}
+    assert replayed.skipped == report.created
+    assert _dump(target) == _dump(source)
+
+    dangling = Device(
+        id="00000000-0000-7000-8000-000000000001",
+        name="Dangling",
+        type=DeviceType.SWITCH,
+        state=SwitchState(),
+        paired_hub_id="00000000-0000-7000-8000-000000000002",
+    )
+
+    with pytest.raises(ValueError, match="Cannot insert device batch"):
+        postgres_stores.devices.create_many([dangling])
@@ -8,6 +8,8 @@ from src.models.device import (
     SwitchState,
     ThermostatState,
 )
+from src.repository.idempotency import IdempotencyConflict
+from src.services.device_service import DeviceService
 
 
 def test_create_device(device_service) -> None:
@@ -51,6 +53,24 @@ def test_modify_device_state(device_service) -> None:
     assert updated_device.state.is_on
 
 
+def test_modify_device_states(device_service) -> None:
+    switch = device_service.create_device("Switch", DeviceType.SWITCH, SwitchState())
+    lock = device_service.create_device("Lock", DeviceType.LOCK, LockState())
+
+    result = device_service.modify_device_states(
+        [
+            (switch.id, SwitchState(is_on=True)),
+            (lock.id, SwitchState(is_on=True)),
+            ("missing", SwitchState()),
+        ]
+    )
+
+    assert [device.id for device in result.written] == [switch.id]
+    assert result.failed == [lock.id, "missing"]
+    assert device_service.get_device(switch.id).state.is_on
+    assert device_service.get_device(lock.id).state == LockState()
+
+
 def test_create_dimmer(device_service) -> None:
     device = device_service.create_device(
         "Test Dimmer", DeviceType.DIMMER, DimmerState(brightness=50, is_on=True)
@@ -97,3 +117,77 @@ def test_create_thermostat(device_service) -> None:
         },
         "paired_hub_id": None,
     }
+
+
+def test_create_device_with_idempotency_key(device_service) -> None:
+    device = device_service.create_device(
+        "Test Switch", DeviceType.SWITCH, SwitchState(is_on=False), idempotency_key="abc"
+    )
+    retried = device_service.create_device(
+        "Test Switch", DeviceType.SWITCH, SwitchState(is_on=False), idempotency_key="abc"
+    )
+
+    assert retried.model_dump() == device.model_dump()
+    assert len(device_service.list_devices()) == 1
+
+
+def test_idempotency_keys_are_scoped_per_client(device_service) -> None:
+    device_one = device_service.create_device(
+        "Switch", DeviceType.SWITCH, SwitchState(), idempotency_key="abc", client_id="a"
+    )
+    device_two = device_service.create_device(
+        "Switch", DeviceType.SWITCH, SwitchState(), idempotency_key="abc", client_id="b"
+    )
+
+    assert device_one.id != device_two.id
+    assert len(device_service.list_devices()) == 2
+
+
+def test_idempotency_key_replayed_with_another_payload(device_service) -> None:
+    device_service.create_device(
+        "Switch", DeviceType.SWITCH, SwitchState(), idempotency_key="abc"
+    )
+
+    with pytest.raises(IdempotencyConflict):
+        device_service.create_device(
+            "Switch", DeviceType.SWITCH, SwitchState(is_on=True), idempotency_key="abc"
+        )
+
+    assert len(device_service.list_devices()) == 1
+
+
+def test_idempotency_keys_on_database_backend(sql_stores) -> None:
+    device_service = DeviceService(sql_stores.devices)
+    device = device_service.create_device(
+        "Switch", DeviceType.SWITCH, SwitchState(), idempotency_key="abc", client_id="a"
+    )
+    retried = device_service.create_device(
+        "Switch", DeviceType.SWITCH, SwitchState(), idempotency_key="abc", client_id="a"
+    )
+    other_client = device_service.create_device(
+        "Switch", DeviceType.SWITCH, SwitchState(), idempotency_key="abc", client_id="b"
+    )
+
+    with pytest.raises(IdempotencyConflict):
+        device_service.create_device(
+            "Lamp",
+            DeviceType.SWITCH,
+            SwitchState(),
+            idempotency_key="abc",
+            client_id="a",
+        )
+
+    assert retried == device
+    assert other_client.id != device.id
+    assert len(device_service.list_devices()) == 2
+
+
+def test_create_device_with_distinct_idempotency_keys(device_service) -> None:
+    device_one = device_service.create_device(
+        "Switch 1", DeviceType.SWITCH, SwitchState(is_on=False), idempotency_key="one"
+    )
+    device_two = device_service.create_device(
+        "Switch 2", DeviceType.SWITCH, SwitchState(is_on=False), idempotency_key="two"
+    )
+
+    assert device_one.id != device_two.id
@@ -1,5 +1,12 @@
 import pytest
 
+from src.models.device import Device, DeviceType, SwitchState
+from src.models.dwelling import DwellingTree, HubTree
+from src.services.device_service import DeviceService
+from src.services.dwelling_service import DwellingService
+from src.services.hub_service import HubService
+from src.services.topology_cache import TopologyCache
+
 
 def test_create_dwelling(dwelling_service) -> None:
     dwelling = dwelling_service.create_dwelling("Test Dwelling")
@@ -12,6 +19,14 @@ def test_create_dwelling(dwelling_service) -> None:
     }
 
 
+def test_create_dwelling_with_idempotency_key(dwelling_service) -> None:
+    dwelling = dwelling_service.create_dwelling("Test Dwelling", idempotency_key="abc")
+    retried = dwelling_service.create_dwelling("Test Dwelling", idempotency_key="abc")
+
+    assert retried.model_dump() == dwelling.model_dump()
+    assert len(dwelling_service.list_dwellings()) == 1
+
+
 def test_set_occupied_status(dwelling_service) -> None:
     dwelling = dwelling_service.create_dwelling("Test Dwelling")
 
@@ -80,3 +95,173 @@ def test_install_nonexistent_hub(dwelling_service) -> None:
 
     with pytest.raises(ValueError, match="Hub .* not found"):
         dwelling_service.install_hub(dwelling.id, "nonexistent-hub")
+
+
+@pytest.fixture
+def topology_cache():
+    return TopologyCache()
+
+
+@pytest.fixture
+def tree_services(
+    dwelling_store, hub_store, device_store, dwelling_tree_loader, topology_cache
+):
+    return (
+        DwellingService(
+            dwelling_store,
+            hub_store,
+            tree_loader=dwelling_tree_loader,
+            topology_cache=topology_cache,
+        ),
+        HubService(hub_store, device_store, topology_cache=topology_cache),
+        DeviceService(device_store, topology_cache=topology_cache),
+    )
+
+
+def test_get_dwelling_tree(tree_services) -> None:
+    dwelling_service, hub_service, device_service = tree_services
+    dwelling = dwelling_service.create_dwelling("Test Dwelling")
+    hub = hub_service.create_hub("Living Room Hub")
+    device = device_service.create_device(
+        "Living Room Light", DeviceType.SWITCH, SwitchState(is_on=False)
+    )
+    hub_service.pair_device(hub.id, device.id)
+    dwelling_service.install_hub(dwelling.id, hub.id)
+
+    tree = dwelling_service.get_dwelling_tree(dwelling.id)
+
+    assert tree.id == dwelling.id
+    assert [h.id for h in tree.hubs] == [hub.id]
+    assert [d.id for d in tree.hubs[0].devices] == [device.id]
+
+
+def test_get_dwelling_tree_is_cached(tree_services, topology_cache) -> None:
+    dwelling_service, _, _ = tree_services
+    dwelling = dwelling_service.create_dwelling("Test Dwelling")
+
+    tree = dwelling_service.get_dwelling_tree(dwelling.id)
+
+    assert topology_cache.get(dwelling.id) is tree
+    assert dwelling_service.get_dwelling_tree(dwelling.id) is tree
+
+
+def test_get_dwelling_tree_invalidated_on_changes(tree_services) -> None:
+    dwelling_service, hub_service, device_service = tree_services
+    dwelling = dwelling_service.create_dwelling("Test Dwelling")
+    hub = hub_service.create_hub("Living Room Hub")
+    device = device_service.create_device(
+        "Living Room Light", DeviceType.SWITCH, SwitchState(is_on=False)
+    )
+
+    dwelling_service.get_dwelling_tree(dwelling.id)
+    dwelling_service.install_hub(dwelling.id, hub.id)
+
+    assert len(dwelling_service.get_dwelling_tree(dwelling.id).hubs) == 1
+
+    hub_service.pair_device(hub.id, device.id)
+
+    assert len(dwelling_service.get_dwelling_tree(dwelling.id).hubs[0].devices) == 1
+
+    device_service.modify_device_state(device.id, SwitchState(is_on=True))
+
+    tree = dwelling_service.get_dwelling_tree(dwelling.id)
+
+    assert tree.hubs[0].devices[0].state.is_on
+
+    hub_service.remove_device(hub.id, device.id)
+
+    assert not dwelling_service.get_dwelling_tree(dwelling.id).hubs[0].devices
+
+
+def test_get_nonexistent_dwelling_tree(tree_services) -> None:
+    dwelling_service, _, _ = tree_services
+
+    with pytest.raises(ValueError, match="Dwelling .* not found"):
+        dwelling_service.get_dwelling_tree("nonexistent-dwelling")
+
+
+def test_tree_loaded_across_a_write_is_not_cached(
+    dwelling_store, hub_store, device_store, dwelling_tree_loader, topology_cache
+) -> None:
+    hub_service = HubService(hub_store, device_store, topology_cache=topology_cache)
+    device_service = DeviceService(device_store, topology_cache=topology_cache)
+
+    class RacingLoader:
+        # reads the tree, then lets a concurrent write land before returning it
+        def load(self, dwelling_id):
+            tree = dwelling_tree_loader.load(dwelling_id)
+            device_service.modify_device_state(device.id, SwitchState(is_on=True))
+            return tree
+
+    dwelling_service = DwellingService(
+        dwelling_store,
+        hub_store,
+        tree_loader=RacingLoader(),
+        topology_cache=topology_cache,
+    )
+    dwelling = dwelling_service.create_dwelling("Test Dwelling")
+    hub = hub_service.create_hub("Living Room Hub")
+    device = device_service.create_device(
+        "Living Room Light", DeviceType.SWITCH, SwitchState(is_on=False)
+    )
+    hub_service.pair_device(hub.id, device.id)
+    dwelling_service.install_hub(dwelling.id, hub.id)
+
+    stale = dwelling_service.get_dwelling_tree(dwelling.id)
+
+    assert not stale.hubs[0].devices[0].state.is_on
+    assert topology_cache.get(dwelling.id) is None
+
+
+def test_compact_cache_serves_copies_of_cached_trees(
+    dwelling_store, hub_store, device_store, dwelling_tree_loader
+) -> None:
+    topology_cache = TopologyCache(compact=True)
+    dwelling_service = DwellingService(
+        dwelling_store,
+        hub_store,
+        tree_loader=dwelling_tree_loader,
+        topology_cache=topology_cache,
+    )
+    hub_service = HubService(hub_store, device_store, topology_cache=topology_cache)
+    device_service = DeviceService(device_store, topology_cache=topology_cache)
+    dwelling = dwelling_service.create_dwelling("Test Dwelling")
+    hub = hub_service.create_hub("Hub")
+    device = device_service.create_device("Light", DeviceType.SWITCH, SwitchState())
+    hub_service.pair_device(hub.id, device.id)
+    dwelling_service.install_hub(dwelling.id, hub.id)
+
+    tree = dwelling_service.get_dwelling_tree(dwelling.id)
+    cached = topology_cache.get(dwelling.id)
+
+    assert cached == tree
+    assert cached is not tree
+    assert cached.hubs[0].devices[0] is not tree.hubs[0].devices[0]
+
+    device_service.modify_device_state(device.id, SwitchState(is_on=True))
+
+    assert topology_cache.get(dwelling.id) is None
+
+    reloaded = dwelling_service.get_dwelling_tree(dwelling.id)
+
+    assert reloaded.hubs[0].devices[0].state == SwitchState(is_on=True)
+
+
+def test_caching_a_moved_device_evicts_its_old_tree() -> None:
+    topology_cache = TopologyCache(compact=True)
+    device = Device(id="d", name="Light", type=DeviceType.SWITCH, state=SwitchState())
+    old = DwellingTree(
+        id="a", name="A", hubs=[HubTree(id="h1", name="H1", devices=[device])]
+    )
+    new = DwellingTree(
+        id="b", name="B", hubs=[HubTree(id="h2", name="H2", devices=[device])]
+    )
+    topology_cache.put(old)
+    topology_cache.put(new)
+
+    assert topology_cache.get("a") is None
+    assert topology_cache.get("b") == new
+
+    topology_cache.invalidate_device("d")
+
+    assert topology_cache.get("b") is None
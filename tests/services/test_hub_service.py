@@ -14,6 +14,13 @@ def test_create_hub(hub_service) -> None:
     }
 
 
+def test_create_hub_with_idempotency_key(hub_service) -> None:
+    hub = hub_service.create_hub("Test Hub", idempotency_key="abc")
+    retried = hub_service.create_hub("Test Hub", idempotency_key="abc")
+
+    assert retried.id == hub.id
+
+
 def test_pair_device(hub_service, device_service) -> None:
     hub = hub_service.create_hub("Test Hub")
     device = device_service.create_device(
@@ -0,0 +1,54 @@
+import time
+from uuid import UUID
+
+from src.models.device import DeviceType, SwitchState
+from src.services.device_service import DeviceService
+from src.services.ids import uuid4_id, uuid7, uuid7_timestamp_ms
+
+
+def test_uuid7_is_version_7() -> None:
+    value = UUID(uuid7())
+
+    assert value.version == 7
+    assert value.variant == "specified in RFC 4122"
+    # version nibble 0111 and variant bits 10, read straight from the layout
+    assert (value.int >> 76) & 0xF == 0b0111
+    assert (value.int >> 62) & 0b11 == 0b10
+
+
+def test_uuid7_is_time_ordered() -> None:
+    ids = [uuid7() for _ in range(10_000)]
+
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+
+
+def test_uuid7_timestamp() -> None:
+    before = time.time_ns() // 1_000_000
+    id = uuid7()
+    after = time.time_ns() // 1_000_000
+
+    # the same-millisecond counter may carry the timestamp a few ms ahead
+    assert before <= uuid7_timestamp_ms(id) <= after + 5
+
+
+def test_create_device_uses_id_generator(device_store) -> None:
+    service = DeviceService(device_store, id_generator=uuid4_id)
+    device = service.create_device(
+        "Test Switch", DeviceType.SWITCH, SwitchState(is_on=False)
+    )
+
+    assert UUID(device.id).version == 4
+
+
+def test_idempotency_key_maps_to_generated_id(device_store) -> None:
+    service = DeviceService(device_store)
+    device = service.create_device(
+        "Test Switch", DeviceType.SWITCH, SwitchState(), idempotency_key="abc"
+    )
+    retried = service.create_device(
+        "Test Switch", DeviceType.SWITCH, SwitchState(), idempotency_key="abc"
+    )
+
+    assert UUID(device.id).version == 7
+    assert retried.id == device.id
@@ -0,0 +1,159 @@
+import json
+
+import pytest
+
+from src.models.device import DeviceType, SwitchState
+from src.services.device_service import DeviceService
+from src.services.dwelling_service import DwellingService
+from src.services.hub_service import HubService
+
+
+@pytest.fixture
+def services(sql_stores):
+    return (
+        DeviceService(sql_stores.devices),
+        HubService(sql_stores.hubs, sql_stores.devices),
+        DwellingService(
+            sql_stores.dwellings, sql_stores.hubs, tree_loader=sql_stores.dwelling_trees
+        ),
+    )
+
+
+def _switch(device_service: DeviceService):
+    return device_service.create_device("Switch", DeviceType.SWITCH, SwitchState())
+
+
+def test_create_budgets(services, query_budget) -> None:
+    device_service, hub_service, dwelling_service = services
+
+    with query_budget("create_device", statements=1, sessions=1):
+        _switch(device_service)
+
+    with query_budget("create_hub", statements=1, sessions=1):
+        hub_service.create_hub("Hub")
+
+    with query_budget("create_dwelling", statements=1, sessions=1):
+        dwelling_service.create_dwelling("Dwelling")
+
+
+def test_device_budgets(services, query_budget) -> None:
+    device_service, _, _ = services
+    device = _switch(device_service)
+
+    with query_budget("get_device", statements=1, sessions=1):
+        device_service.get_device(device.id)
+
+    with query_budget("modify_device_state", statements=2, sessions=2):
+        device_service.modify_device_state(device.id, SwitchState(is_on=True))
+
+    with query_budget("delete_device", statements=2, sessions=2):
+        device_service.delete_device(device.id)
+
+
+def test_bulk_state_write_budget(services, query_budget) -> None:
+    device_service, _, _ = services
+    changes = [(_switch(device_service).id, SwitchState(is_on=True)) for _ in range(5)]
+
+    # one read, one executemany UPDATE and one version read-back for the batch
+    with query_budget("modify_device_states", statements=3, sessions=2):
+        result = device_service.modify_device_states(changes)
+
+    assert len(result.written) == 5
+
+
+def test_pairing_budgets(services, query_budget) -> None:
+    device_service, hub_service, _ = services
+    hub = hub_service.create_hub("Hub")
+    device = _switch(device_service)
+
+    # hub (with paired device ids) and device lookups, then both writes
+    with query_budget("pair_device", statements=5, sessions=4):
+        hub_service.pair_device(hub.id, device.id)
+
+    with query_budget("get_device_state", statements=3, sessions=2):
+        hub_service.get_device_state(hub.id, device.id)
+
+    with query_budget("remove_device", statements=5, sessions=4):
+        hub_service.remove_device(hub.id, device.id)
+
+
+@pytest.mark.parametrize("paired", [1, 10])
+def test_list_devices_budget_independent_of_pairings(
+    services, query_budget, paired
+) -> None:
+    device_service, hub_service, _ = services
+    hub = hub_service.create_hub("Hub")
+
+    for _ in range(paired):
+        hub_service.pair_device(hub.id, _switch(device_service).id)
+
+    with query_budget("list_devices", statements=3, sessions=2):
+        devices = hub_service.list_devices(hub.id)
+
+    assert len(devices) == paired
+
+
+def test_dwelling_budgets(services, query_budget) -> None:
+    device_service, hub_service, dwelling_service = services
+    dwelling = dwelling_service.create_dwelling("Dwelling")
+    hub = hub_service.create_hub("Hub")
+
+    for _ in range(3):
+        hub_service.pair_device(hub.id, _switch(device_service).id)
+
+    with query_budget("install_hub", statements=6, sessions=4):
+        dwelling_service.install_hub(dwelling.id, hub.id)
+
+    with query_budget("set_occupied_status", statements=3, sessions=2):
+        dwelling_service.set_occupied_status(dwelling.id, True)
+
+    with query_budget("get_dwelling_tree", statements=1, sessions=1):
+        dwelling_service.get_dwelling_tree(dwelling.id)
+
+
+@pytest.mark.query_budget(statements=0, sessions=0)
+def test_memory_backend_runs_no_queries(device_service, hub_service) -> None:
+    hub = hub_service.create_hub("Hub")
+    hub_service.pair_device(hub.id, _switch(device_service).id)
+
+
+_OVER_BUDGET = """
+import pytest
+from sqlalchemy import create_engine, text
+
+
+def test_block(query_budget):
+    engine = create_engine("sqlite://")
+
+    with query_budget("select", statements=0):
+        with engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+
+
+@pytest.mark.query_budget(statements=0)
+def test_marked():
+    with create_engine("sqlite://").connect() as connection:
+        connection.execute(text("SELECT 1"))
+"""
+
+
+def test_exceeded_budget_fails(pytester) -> None:
+    pytester.makepyfile(test_over_budget=_OVER_BUDGET)
+
+    result = pytester.runpytest_inprocess(
+        "-p", "tests.query_budget", "--query-report", "counts.json"
+    )
+
+    result.assert_outcomes(failed=2)
+    result.stdout.fnmatch_lines(
+        [
+            "*query budget for select exceeded: statements 1 > 0*",
+            "*query budget exceeded: statements 1 > 0*",
+            "OVER *::test_block [[]select[]] statements 1/0 sessions 0/-",
+            "OVER *::test_marked [[]test[]] statements 1/0 sessions 0/-",
+        ]
+    )
+    report = json.loads((pytester.path / "counts.json").read_text())
+    budgets = report["test_over_budget.py::test_block"]["budgets"]
+
+    assert budgets[0]["exceeded"] == ["statements 1 > 0"]
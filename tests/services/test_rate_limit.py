@@ -0,0 +1,188 @@
+import pytest
+
+from src.models.device import DeviceType, LockState, Mode, ThermostatState
+from src.services.device_service import DeviceService
+from src.services.hub_service import HubService
+from src.services.rate_limit import (
+    Priority,
+    RateLimit,
+    RateLimiter,
+    RateLimitExceeded,
+)
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def limited_device_service(device_store, clock):
+    limiter = RateLimiter(RateLimit(rate=1.0, burst=4.0), clock=clock)
+
+    return DeviceService(device_store, rate_limiter=limiter)
+
+
+@pytest.fixture
+def paired(limited_device_service, hub_store, device_store):
+    hub_service = HubService(hub_store, device_store)
+    hub = hub_service.create_hub("Test Hub")
+
+    def pair(name, device_type, state):
+        device = limited_device_service.create_device(name, device_type, state)
+        hub_service.pair_device(hub.id, device.id)
+        return device
+
+    return pair
+
+
+def test_rate_limiter_leaves_reserve_for_higher_priority(clock) -> None:
+    limiter = RateLimiter(RateLimit(rate=1.0, burst=4.0), clock=clock)
+
+    assert limiter.try_acquire("hub", Priority.TELEMETRY) is None
+    assert limiter.try_acquire("hub", Priority.TELEMETRY) is None
+    assert limiter.try_acquire("hub", Priority.TELEMETRY) is not None
+    assert limiter.try_acquire("hub", Priority.CRITICAL) is None
+    assert limiter.try_acquire("hub", Priority.CRITICAL) is None
+    assert limiter.try_acquire("hub", Priority.CRITICAL) == pytest.approx(1.0)
+
+    clock.now += 1.0
+
+    assert limiter.try_acquire("hub", Priority.CRITICAL) is None
+
+
+def test_rate_limiter_shares_dwelling_limit_across_hubs(clock) -> None:
+    limiter = RateLimiter(
+        RateLimit(rate=1.0, burst=10.0),
+        dwelling_limit=RateLimit(rate=1.0, burst=2.0),
+        resolve_dwelling=lambda hub_id: "dwelling",
+        clock=clock,
+    )
+
+    assert limiter.try_acquire("hub-1", Priority.CRITICAL) is None
+    assert limiter.try_acquire("hub-2", Priority.CRITICAL) is None
+    assert limiter.try_acquire("hub-3", Priority.CRITICAL) is not None
+
+
+def test_lock_command_rejected_over_limit(limited_device_service, paired) -> None:
+    lock = paired("Front Door", DeviceType.LOCK, LockState(is_locked=True))
+
+    for _ in range(4):
+        limited_device_service.modify_device_state(lock.id, LockState(is_locked=False))
+
+    with pytest.raises(RateLimitExceeded) as error:
+        limited_device_service.modify_device_state(lock.id, LockState(is_locked=True))
+
+    assert error.value.retry_after > 0
+
+
+def test_telemetry_coalesced_over_limit(
+    limited_device_service, paired, clock
+) -> None:
+    thermostat = paired("Hallway", DeviceType.THERMOSTAT, ThermostatState())
+
+    for temperature in range(70, 76):
+        updated = limited_device_service.modify_device_state(
+            thermostat.id,
+            ThermostatState(mode=Mode.HEAT, current_temperature=temperature),
+        )
+        assert updated.state.current_temperature == temperature
+
+    stored = limited_device_service.get_device(thermostat.id)
+
+    assert stored.state.current_temperature == 71
+
+    assert limited_device_service.flush_coalesced() == 0
+
+    clock.now += 1.0
+
+    assert limited_device_service.flush_coalesced() == 1
+
+    stored = limited_device_service.get_device(thermostat.id)
+
+    assert stored.state.current_temperature == 75
+
+
+def test_lock_command_passes_telemetry_storm(limited_device_service, paired) -> None:
+    thermostat = paired("Hallway", DeviceType.THERMOSTAT, ThermostatState())
+    lock = paired("Front Door", DeviceType.LOCK, LockState(is_locked=True))
+
+    for temperature in range(100):
+        limited_device_service.modify_device_state(
+            thermostat.id, ThermostatState(current_temperature=temperature)
+        )
+
+    updated = limited_device_service.modify_device_state(
+        lock.id, LockState(is_locked=False)
+    )
+
+    assert not updated.state.is_locked
+
+
+def test_write_device_state_flags_coalesced_writes(
+    limited_device_service, paired
+) -> None:
+    thermostat = paired("Hallway", DeviceType.THERMOSTAT, ThermostatState())
+
+    written = [
+        limited_device_service.write_device_state(
+            thermostat.id,
+            ThermostatState(mode=Mode.HEAT, current_temperature=temperature),
+        )
+        for temperature in range(70, 76)
+    ]
+
+    assert [write.coalesced for write in written] == [False] * 2 + [True] * 4
+    assert all(write.device.state.current_temperature == 71 for write in written[2:])
+
+
+def test_rate_limiter_caches_hubs_without_dwelling(clock) -> None:
+    lookups = []
+    dwellings = {}
+
+    def resolve_dwelling(hub_id):
+        lookups.append(hub_id)
+        return dwellings.get(hub_id)
+
+    limiter = RateLimiter(
+        RateLimit(rate=1.0, burst=10.0),
+        dwelling_limit=RateLimit(rate=1.0, burst=10.0),
+        resolve_dwelling=resolve_dwelling,
+        clock=clock,
+        unresolved_ttl=5.0,
+    )
+
+    for _ in range(3):
+        limiter.try_acquire("hub", Priority.CRITICAL)
+
+    assert lookups == ["hub"]
+
+    dwellings["hub"] = "dwelling"
+    clock.now += 5.0
+
+    for _ in range(3):
+        limiter.try_acquire("hub", Priority.CRITICAL)
+
+    assert lookups == ["hub", "hub"]
+
+
+def test_workers_together_stay_within_split_limit(clock) -> None:
+    limit = RateLimit(rate=2.0, burst=8.0)
+    workers = [RateLimiter(limit.split(2), clock=clock) for _ in range(2)]
+
+    admitted = sum(
+        worker.try_acquire("hub", Priority.CRITICAL) is None
+        for worker in workers
+        for _ in range(8)
+    )
+
+    assert admitted == 8
+    assert limit.split(2).reserve == limit.reserve
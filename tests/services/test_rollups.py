@@ -0,0 +1,225 @@
+import pytest
+
+from src.models.device import (
+    DeviceType,
+    LockState,
+    Mode,
+    SwitchState,
+    ThermostatState,
+)
+from src.repository.invalidation import Invalidation
+from src.services.device_service import DeviceService
+from src.services.dwelling_service import DwellingService
+from src.services.hub_service import HubService
+from src.services.rollups import StatusRollups
+
+
+@pytest.fixture
+def rollups():
+    return StatusRollups()
+
+
+@pytest.fixture
+def services(device_store, hub_store, dwelling_store, rollups):
+    return (
+        DeviceService(device_store, rollups=rollups),
+        HubService(hub_store, device_store, rollups=rollups),
+        DwellingService(dwelling_store, hub_store, rollups=rollups),
+    )
+
+
+def test_rollups_follow_pairing_and_state(services) -> None:
+    device_service, hub_service, dwelling_service = services
+    dwelling = dwelling_service.create_dwelling("Test Dwelling")
+    hub = hub_service.create_hub("Test Hub")
+    light = device_service.create_device(
+        "Living Room Light", DeviceType.SWITCH, SwitchState(is_on=True)
+    )
+    lock = device_service.create_device(
+        "Front Door", DeviceType.LOCK, LockState(is_locked=False)
+    )
+    thermostat = device_service.create_device(
+        "Hallway",
+        DeviceType.THERMOSTAT,
+        ThermostatState(mode=Mode.HEAT, target_temperature=70),
+    )
+
+    # paired before the hub is installed: rolled into the dwelling on install
+    hub_service.pair_device(hub.id, light.id)
+    dwelling_service.install_hub(dwelling.id, hub.id)
+    hub_service.pair_device(hub.id, lock.id)
+    hub_service.pair_device(hub.id, thermostat.id)
+
+    status = dwelling_service.get_dwelling_status(dwelling.id)
+
+    assert status.devices == 3
+    assert status.lights_on == 1
+    assert status.unlocked_locks == 1
+    assert status.thermostats_heating == 1
+    assert status.average_target_temperature == 70
+
+    device_service.modify_device_state(lock.id, LockState(is_locked=True))
+    device_service.modify_device_state(light.id, SwitchState(is_on=False))
+    device_service.modify_device_state(
+        thermostat.id, ThermostatState(mode=Mode.COOL, target_temperature=74)
+    )
+
+    status = dwelling_service.get_dwelling_status(dwelling.id)
+
+    assert status.lights_on == 0
+    assert status.unlocked_locks == 0
+    assert status.thermostats_heating == 0
+    assert status.thermostats_cooling == 1
+    assert status.average_target_temperature == 74
+
+    hub_service.remove_device(hub.id, thermostat.id)
+
+    assert hub_service.get_hub_status(hub.id).devices == 2
+    assert dwelling_service.get_dwelling_status(dwelling.id).thermostats == 0
+
+
+def test_unknown_dwelling_status_is_empty(services) -> None:
+    _, _, dwelling_service = services
+
+    status = dwelling_service.get_dwelling_status("nonexistent-dwelling")
+
+    assert status.devices == 0
+    assert status.average_target_temperature is None
+
+
+def test_verify_corrects_drift(services, rollups, device_store, hub_store) -> None:
+    device_service, hub_service, dwelling_service = services
+    dwelling = dwelling_service.create_dwelling("Test Dwelling")
+    hub = hub_service.create_hub("Test Hub")
+    dwelling_service.install_hub(dwelling.id, hub.id)
+    light = device_service.create_device(
+        "Living Room Light", DeviceType.SWITCH, SwitchState(is_on=True)
+    )
+    hub_service.pair_device(hub.id, light.id)
+
+    assert rollups.verify(device_store.list(), hub_store.list()) == []
+
+    # a write that bypassed the services
+    light.state = SwitchState(is_on=False)
+
+    drifted = rollups.verify(device_store.list(), hub_store.list())
+
+    assert drifted == [f"dwelling:{dwelling.id}", f"hub:{hub.id}"]
+    assert dwelling_service.get_dwelling_status(dwelling.id).lights_on == 0
+
+
+def test_verify_keeps_writes_made_during_the_scan(
+    services, rollups, device_store, hub_store
+) -> None:
+    device_service, hub_service, _ = services
+    hub = hub_service.create_hub("Test Hub")
+    lights = [
+        device_service.create_device(
+            f"Light {index}", DeviceType.SWITCH, SwitchState(is_on=True)
+        )
+        for index in range(2)
+    ]
+
+    for light in lights:
+        hub_service.pair_device(hub.id, light.id)
+
+    snapshot = [device.model_copy(deep=True) for device in device_store.list()]
+
+    def scan():
+        # the scan reads a snapshot while a write lands through the services
+        for index, device in enumerate(snapshot):
+            if index == 1:
+                device_service.modify_device_state(
+                    lights[1].id, SwitchState(is_on=False)
+                )
+
+            yield device
+
+    assert rollups.verify(scan(), hub_store.list()) == []
+    assert hub_service.get_hub_status(hub.id).lights_on == 1
+
+
+def _lit_hub(device_service, hub_service, dwelling_service, lights=2):
+    dwelling = dwelling_service.create_dwelling("Test Dwelling")
+    hub = hub_service.create_hub("Test Hub")
+    dwelling_service.install_hub(dwelling.id, hub.id)
+    devices = [
+        device_service.create_device(
+            f"Light {index}", DeviceType.SWITCH, SwitchState(is_on=True)
+        )
+        for index in range(lights)
+    ]
+
+    for device in devices:
+        hub_service.pair_device(hub.id, device.id)
+
+    return dwelling, hub, devices
+
+
+def test_verify_does_not_count_a_write_the_scan_read_twice(
+    services, rollups, device_store, hub_store
+) -> None:
+    device_service, hub_service, dwelling_service = services
+    dwelling, hub, lights = _lit_hub(device_service, hub_service, dwelling_service)
+
+    def scan():
+        # the write lands after verify starts and before the scan reads the row
+        device_service.modify_device_state(lights[1].id, SwitchState(is_on=False))
+
+        for device in device_store.list():
+            yield device.model_copy(deep=True)
+
+    assert rollups.verify(scan(), hub_store.list()) == []
+    assert hub_service.get_hub_status(hub.id).lights_on == 1
+    assert dwelling_service.get_dwelling_status(dwelling.id).lights_on == 1
+
+
+def test_verify_recomputes_hubs_written_during_the_scan(
+    device_store, hub_store, dwelling_store
+) -> None:
+    rollups = StatusRollups(device_store, hub_store)
+    device_service = DeviceService(device_store, rollups=rollups)
+    hub_service = HubService(hub_store, device_store, rollups=rollups)
+    dwelling_service = DwellingService(dwelling_store, hub_store, rollups=rollups)
+    dwelling, hub, lights = _lit_hub(device_service, hub_service, dwelling_service)
+    # a write that bypassed the services
+    lights[0].state = SwitchState(is_on=False)
+
+    def scan():
+        device_service.modify_device_state(lights[1].id, SwitchState(is_on=False))
+
+        for device in device_store.list():
+            yield device.model_copy(deep=True)
+
+    drifted = rollups.verify(scan(), hub_store.list())
+
+    assert drifted == [f"dwelling:{dwelling.id}", f"hub:{hub.id}"]
+    assert hub_service.get_hub_status(hub.id).lights_on == 0
+    assert dwelling_service.get_dwelling_status(dwelling.id).lights_on == 0
+
+
+def test_rollups_follow_writes_of_other_workers(
+    services, device_store, hub_store
+) -> None:
+    device_service, hub_service, dwelling_service = services
+    dwelling, hub, lights = _lit_hub(device_service, hub_service, dwelling_service)
+    # another worker's rollups, built before the write
+    other = StatusRollups(device_store, hub_store)
+    other.verify(device_store.list(), hub_store.list())
+
+    device_service.modify_device_state(lights[0].id, SwitchState(is_on=False))
+    other.invalidate(Invalidation("device", lights[0].id, 2))
+
+    assert other.get_hub(hub.id).lights_on == 1
+    assert other.get_dwelling(dwelling.id).lights_on == 1
+
+    hub_service.remove_device(hub.id, lights[1].id)
+    other.invalidate(Invalidation("hub", hub.id, 4))
+
+    assert other.get_hub(hub.id).devices == 1
+    assert other.get_dwelling(dwelling.id).lights_on == 0
+
+
+def test_status_without_rollups(dwelling_service) -> None:
+    with pytest.raises(ValueError, match="not configured"):
+        dwelling_service.get_dwelling_status("dwelling")
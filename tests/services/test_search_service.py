@@ -0,0 +1,212 @@
+import pytest
+
+from src.models.device import DeviceType, DimmerState, LockState, SwitchState
+from src.models.search import EntityKind
+from src.repository import search
+from src.repository.memory_store import MemoryNameSearch, _SortedStrings
+from src.services.device_service import DeviceService
+from src.services.dwelling_service import DwellingService
+from src.services.hub_service import HubService
+from src.services.search_service import SearchService
+
+
+def _build_fleet(device_service, hub_service, dwelling_service):
+    home = dwelling_service.create_dwelling("Lakeside Home")
+    cabin = dwelling_service.create_dwelling("Mountain Cabin")
+    home_hub = hub_service.create_hub("Home Hub")
+    cabin_hub = hub_service.create_hub("Cabin Hub")
+    dwelling_service.install_hub(home.id, home_hub.id)
+    dwelling_service.install_hub(cabin.id, cabin_hub.id)
+
+    devices = {}
+
+    for hub, name, device_type, state in [
+        (home_hub, "Living Room Light", DeviceType.DIMMER, DimmerState()),
+        (home_hub, "Living Room Lamp", DeviceType.SWITCH, SwitchState()),
+        (home_hub, "Front Door Lock", DeviceType.LOCK, LockState()),
+        (cabin_hub, "Living Room Light", DeviceType.DIMMER, DimmerState()),
+        (cabin_hub, "Porch Light", DeviceType.SWITCH, SwitchState()),
+    ]:
+        device = device_service.create_device(name, device_type, state)
+        hub_service.pair_device(hub.id, device.id)
+        devices.setdefault(name, []).append(device)
+
+    return home, cabin, home_hub, cabin_hub, devices
+
+
+@pytest.fixture
+def search_service(dwelling_store, hub_store, device_store):
+    return SearchService(MemoryNameSearch(dwelling_store, hub_store, device_store))
+
+
+@pytest.fixture
+def fleet(device_service, hub_service, dwelling_service):
+    return _build_fleet(device_service, hub_service, dwelling_service)
+
+
+def _names(results):
+    return [hit.name for hit in results.hits]
+
+
+def test_search_ranks_exact_then_prefix_then_word_prefix(fleet, search_service):
+    results = search_service.search("living room light")
+
+    assert _names(results) == [
+        "Living Room Light",
+        "Living Room Light",
+        "Living Room Lamp",
+    ]
+    # exact tier plus full similarity, then a fuzzy-only match
+    assert [int(hit.score) for hit in results.hits] == [4, 4, 0]
+
+    results = search_service.search("living room l")
+
+    assert set(_names(results)) == {"Living Room Light", "Living Room Lamp"}
+    assert all(int(hit.score) == 2 for hit in results.hits)
+
+    results = search_service.search("light", kinds=[EntityKind.DEVICE])
+
+    # no name starts with "light"; word-prefix hits rank by similarity
+    assert _names(results) == ["Porch Light", "Living Room Light", "Living Room Light"]
+    assert all(int(hit.score) == 1 for hit in results.hits)
+
+
+def test_search_matches_misspelled_names(fleet, search_service):
+    results = search_service.search("frnt door lock")
+
+    assert _names(results) == ["Front Door Lock"]
+    assert results.hits[0].score < 1
+
+
+def test_search_covers_hubs_and_dwellings(fleet, search_service):
+    home, _, home_hub, _, _ = fleet
+
+    hub_hits = search_service.search("home", kinds=[EntityKind.HUB]).hits
+    dwelling_hits = search_service.search("lakeside").hits
+
+    assert [(hit.kind, hit.id) for hit in hub_hits] == [(EntityKind.HUB, home_hub.id)]
+    assert [(hit.kind, hit.id) for hit in dwelling_hits] == [
+        (EntityKind.DWELLING, home.id)
+    ]
+
+
+def test_search_scoped_to_dwelling_and_hub(fleet, search_service):
+    home, cabin, home_hub, cabin_hub, devices = fleet
+
+    in_cabin = search_service.search("light", dwelling_id=cabin.id)
+    in_home_hub = search_service.search("living", hub_id=home_hub.id)
+    mismatched = search_service.search("light", dwelling_id=home.id, hub_id=cabin_hub.id)
+
+    assert {hit.id for hit in in_cabin.hits} == {
+        devices["Living Room Light"][1].id,
+        devices["Porch Light"][0].id,
+    }
+    assert set(_names(in_home_hub)) == {"Living Room Light", "Living Room Lamp"}
+    assert mismatched.total == 0
+
+
+def test_search_paginates(fleet, search_service):
+    everything = search_service.search("l", limit=100)
+    pages = [search_service.search("l", limit=2, offset=offset) for offset in (0, 2, 4)]
+
+    assert [hit.id for page in pages for hit in page.hits] == [
+        hit.id for hit in everything.hits
+    ][:6]
+    assert all(page.total == everything.total for page in pages)
+
+
+def test_search_index_follows_deletes(fleet, device_service, hub_service, search_service):
+    _, _, _, cabin_hub, devices = fleet
+    porch_light = devices["Porch Light"][0]
+
+    hub_service.remove_device(cabin_hub.id, porch_light.id)
+    device_service.delete_device(porch_light.id)
+
+    assert search_service.search("porch").total == 0
+
+
+def test_search_rejects_blank_query(search_service):
+    with pytest.raises(ValueError):
+        search_service.search("  ")
+
+
+def test_search_database_prefix_and_scope(sql_stores):
+    device_service = DeviceService(sql_stores.devices)
+    hub_service = HubService(sql_stores.hubs, sql_stores.devices)
+    dwelling_service = DwellingService(sql_stores.dwellings, sql_stores.hubs)
+    search_service = SearchService(sql_stores.name_search)
+    home, cabin, home_hub, _, devices = _build_fleet(
+        device_service, hub_service, dwelling_service
+    )
+
+    assert _names(search_service.search("living room light")) == [
+        "Living Room Light",
+        "Living Room Light",
+    ]
+    assert set(_names(search_service.search("light", dwelling_id=cabin.id))) == {
+        "Living Room Light",
+        "Porch Light",
+    }
+    assert _names(search_service.search("lake", hub_id=home_hub.id)) == [
+        "Lakeside Home"
+    ]
+
+    second_page = search_service.search("l", limit=2, offset=2)
+    past_end = search_service.search("l", limit=2, offset=50)
+
+    assert len(second_page.hits) == 2
+    assert past_end.hits == [] and past_end.total == second_page.total
+
+
+def test_search_database_caps_candidates_by_tier(sql_stores, monkeypatch):
+    device_service = DeviceService(sql_stores.devices)
+    search_service = SearchService(sql_stores.name_search)
+
+    for name in ["Desk Lamp", "Lamp Shade", "Lamp", "Lamp Post", "Lamps"]:
+        device_service.create_device(name, DeviceType.SWITCH, SwitchState())
+
+    monkeypatch.setattr(search, "MAX_CANDIDATES", 3)
+
+    capped = search_service.search("lamp", limit=3)
+
+    assert _names(capped) == ["Lamp", "Lamp Post", "Lamp Shade"]
+    assert capped.truncated and capped.total == 3
+
+    uncapped = search_service.search("lamp shade", limit=3)
+
+    assert _names(uncapped) == ["Lamp Shade"]
+    assert not uncapped.truncated
+
+
+def test_search_postgres_keeps_prefix_hits_over_fuzzy_ones(
+    postgres_stores, monkeypatch
+):
+    device_service = DeviceService(postgres_stores.devices)
+    search_service = SearchService(postgres_stores.name_search)
+
+    # the fuzzy match is nearer by trigram distance than the prefix match
+    for name in ["Lampshade Outdoor Garden", "Lamp"]:
+        device_service.create_device(name, DeviceType.SWITCH, SwitchState())
+
+    monkeypatch.setattr(search, "MAX_CANDIDATES", 1)
+    results = search_service.search("lamps", limit=1)
+
+    assert _names(results) == ["Lampshade Outdoor Garden"]
+    assert results.truncated
+
+
+def test_name_index_keeps_few_runs_and_scans_prefixes_in_order() -> None:
+    index = _SortedStrings()
+    values = [f"{number * 7919 % 50000:05d}" for number in range(50000)]
+
+    for value in values:
+        index.add(value)
+
+    for value in values[::3]:
+        index.remove(value)
+
+    kept = sorted(set(values) - set(values[::3]))
+
+    assert len(index._runs) <= 5
+    assert list(index.prefixed("123")) == [v for v in kept if v.startswith("123")]
+    assert list(index.prefixed("")) == kept
@@ -0,0 +1,110 @@
+from src.models.device import (
+    DeviceType,
+    LockState,
+    Mode,
+    SwitchState,
+    ThermostatState,
+)
+from src.services.device_service import DeviceService
+from src.services.hub_service import HubService
+from src.services.rate_limit import RateLimit, RateLimiter
+from src.simulation.engine import SimulationEngine, SimulationParameters
+
+
+def test_thermostats_converge_on_target(device_service) -> None:
+    thermostat = device_service.create_device(
+        "Hallway",
+        DeviceType.THERMOSTAT,
+        ThermostatState(mode=Mode.HEAT, current_temperature=60, target_temperature=70),
+    )
+    engine = SimulationEngine(
+        device_service,
+        SimulationParameters(setpoint_probability=0.0, sensor_noise=0.0),
+    )
+    engine.load(device_service.list_devices())
+
+    reports = engine.run(ticks=6 * 60)
+
+    state = device_service.get_device(thermostat.id).state
+
+    assert sum(report.written for report in reports) > 0
+    assert abs(state.current_temperature - 70) < 1.0
+
+
+def test_switches_and_locks_are_toggled(device_service) -> None:
+    for number in range(20):
+        device_service.create_device(
+            f"Light {number}", DeviceType.SWITCH, SwitchState(is_on=False)
+        )
+        device_service.create_device(
+            f"Lock {number}", DeviceType.LOCK, LockState(is_locked=True)
+        )
+
+    engine = SimulationEngine(
+        device_service,
+        SimulationParameters(toggle_probability=0.5, lock_probability=0.5),
+    )
+    engine.load(device_service.list_devices())
+
+    report = engine.run_tick()
+    devices = device_service.list_devices()
+
+    assert report.written == report.changed > 0
+    assert any(d.type == DeviceType.SWITCH and d.state.is_on for d in devices)
+    assert any(d.type == DeviceType.LOCK and not d.state.is_locked for d in devices)
+
+
+def test_simulation_is_reproducible() -> None:
+    first = SimulationEngine(seed=7)
+    second = SimulationEngine(seed=7)
+    first.load_fleet(10_000)
+    second.load_fleet(10_000)
+
+    for _ in range(5):
+        assert first.step() == second.step()
+
+
+def test_detached_fleet_reports_only_changes() -> None:
+    engine = SimulationEngine(seed=1)
+    engine.load_fleet(100_000)
+
+    report = engine.run_tick()
+
+    assert 0 < report.changed < 100_000
+    assert report.written == 0
+
+
+def test_batches_respect_batch_size() -> None:
+    engine = SimulationEngine(batch_size=3)
+    changes = {str(i): SwitchState(is_on=True) for i in range(10)}
+
+    assert [len(batch) for batch in engine.batches(changes)] == [3, 3, 3, 1]
+
+
+def test_coalesced_telemetry_is_not_counted_as_written(device_store, hub_store) -> None:
+    limiter = RateLimiter(RateLimit(rate=0.0, burst=4.0))
+    device_service = DeviceService(device_store, rate_limiter=limiter)
+    hub_service = HubService(hub_store, device_store)
+    hub = hub_service.create_hub("Hub")
+
+    for number in range(10):
+        thermostat = device_service.create_device(
+            f"Thermostat {number}",
+            DeviceType.THERMOSTAT,
+            ThermostatState(mode=Mode.HEAT, current_temperature=50),
+        )
+        hub_service.pair_device(hub.id, thermostat.id)
+
+    engine = SimulationEngine(
+        device_service,
+        SimulationParameters(
+            tick_seconds=3600, sensor_noise=0.0, setpoint_probability=0.0
+        ),
+    )
+    engine.load(device_service.list_devices())
+
+    report = engine.run_tick()
+
+    assert report.changed == 10
+    assert report.written == 2
+    assert report.coalesced == 8
@@ -0,0 +1,85 @@
+import asyncio
+import subprocess
+import sys
+import time
+
+from sqlalchemy import inspect
+
+from src.app import create_app
+from src.config import MEMORY_URL, Settings
+from src.repository import base
+
+# generous bounds; they catch blocking I/O at startup, not micro-regressions
+MAX_IMPORT_SECONDS = 5.0
+MAX_STARTUP_SECONDS = 1.0
+
+
+def _start_and_stop(app) -> float:
+    async def run() -> float:
+        started = time.perf_counter()
+        async with app.router.lifespan_context(app):
+            elapsed = time.perf_counter() - started
+        return elapsed
+
+    return asyncio.run(run())
+
+
+def test_import_does_not_create_engine() -> None:
+    started = time.perf_counter()
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import src.app, src.repository.base as base; print(base._engine is None)",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    elapsed = time.perf_counter() - started
+
+    assert result.stdout.strip() == "True"
+    assert elapsed < MAX_IMPORT_SECONDS
+
+
+def test_create_app_does_not_connect() -> None:
+    # nothing listens on this port; creating the app must not notice
+    create_app(Settings(database_url="postgresql://user@127.0.0.1:1/none"))
+
+    assert base._engine is None
+
+
+def test_startup_time_memory_backend() -> None:
+    app = create_app(Settings(database_url=MEMORY_URL))
+
+    elapsed = _start_and_stop(app)
+
+    assert elapsed < MAX_STARTUP_SECONDS
+    assert base._engine is None
+
+
+def test_startup_time_database_backend(tmp_path) -> None:
+    url = f"sqlite:///{tmp_path / 'startup.db'}"
+    app = create_app(Settings(database_url=url))
+
+    elapsed = _start_and_stop(app)
+
+    base.configure_engine(url)
+    table_names = inspect(base.get_engine()).get_table_names()
+    base.dispose_engine()
+
+    assert elapsed < MAX_STARTUP_SECONDS
+    assert {"device", "hub", "dwelling"} <= set(table_names)
+
+
+def test_startup_without_schema_creation(tmp_path) -> None:
+    url = f"sqlite:///{tmp_path / 'empty.db'}"
+    app = create_app(Settings(database_url=url, create_schema=False, warm_up=False))
+
+    _start_and_stop(app)
+
+    base.configure_engine(url)
+    table_names = inspect(base.get_engine()).get_table_names()
+    base.dispose_engine()
+
+    assert table_names == []
@@ -0,0 +1,85 @@
+import sqlite3
+import uuid
+
+import pytest
+
+from src.app import create_stores
+from src.cli import main
+from src.config import Settings
+from src.repository import base
+
+# schema of databases created before identifiers became native UUIDs
+STRING_ID_SCHEMA = """
+CREATE TABLE dwelling (
+    id VARCHAR PRIMARY KEY, name VARCHAR NOT NULL, is_occupied BOOLEAN NOT NULL
+);
+CREATE INDEX ix_dwelling_id ON dwelling (id);
+CREATE TABLE hub (
+    id VARCHAR PRIMARY KEY, name VARCHAR NOT NULL,
+    dwelling_id VARCHAR REFERENCES dwelling (id)
+);
+CREATE INDEX ix_hub_id ON hub (id);
+CREATE TABLE device (
+    id VARCHAR PRIMARY KEY, name VARCHAR NOT NULL, type VARCHAR NOT NULL,
+    state VARCHAR, paired_hub_id VARCHAR REFERENCES hub (id)
+);
+CREATE INDEX ix_device_id ON device (id);
+"""
+
+
+@pytest.fixture
+def string_id_database(tmp_path, monkeypatch):
+    path = tmp_path / "legacy.db"
+    ids = {name: str(uuid.uuid4()).upper() for name in ("dwelling", "hub", "device")}
+
+    with sqlite3.connect(path) as connection:
+        connection.executescript(STRING_ID_SCHEMA)
+        connection.execute(
+            "INSERT INTO dwelling VALUES (?, 'Home', 0)", (ids["dwelling"],)
+        )
+        connection.execute(
+            "INSERT INTO hub VALUES (?, 'Hub', ?)", (ids["hub"], ids["dwelling"])
+        )
+        connection.execute(
+            "INSERT INTO device VALUES (?, 'Lamp', 'switch', '{\"is_on\": true}', ?)",
+            (ids["device"], ids["hub"]),
+        )
+
+    monkeypatch.setenv("DATABASE_URL", f"sqlite:///{path}")
+
+    yield path, ids
+
+    base.configure_engine(base.DATABASE_URL)
+
+
+def test_migrate_converts_string_ids(string_id_database) -> None:
+    path, ids = string_id_database
+
+    assert main(["migrate"]) == 0
+    assert main(["migrate"]) == 0
+
+    stores = create_stores(Settings(database_url=f"sqlite:///{path}"))
+    device = stores.devices.get(ids["device"].lower())
+    hub = stores.hubs.get(ids["hub"])
+
+    assert device.state.is_on
+    assert device.paired_hub_id == hub.id == ids["hub"].lower()
+    assert hub.dwelling_id == ids["dwelling"].lower()
+    assert hub.paired_device_ids == [device.id]
+
+
+def test_migrate_rejects_invalid_ids(string_id_database, capsys) -> None:
+    path, ids = string_id_database
+
+    with sqlite3.connect(path) as connection:
+        connection.execute("INSERT INTO hub VALUES ('hub-1', 'Legacy Hub', NULL)")
+
+    assert main(["migrate"]) == 1
+    assert "hub.id=hub-1" in capsys.readouterr().err
+
+    with sqlite3.connect(path) as connection:
+        stored = connection.execute("SELECT id FROM dwelling").fetchone()
+        columns = connection.execute("PRAGMA table_info(device)").fetchall()
+
+    assert stored == (ids["dwelling"],)
+    assert "version" not in {column[1] for column in columns}